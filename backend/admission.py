@@ -0,0 +1,182 @@
+# admission.py
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from metrics import registry, Counter, Histogram
+
+# Admission control for /rag: requests wait in per-priority FIFO queues (P0 first) for one of
+# RAG_MAX_CONCURRENT slots, each class capped at its own concurrency. A request whose
+# expected queue wait exceeds its class's budget, or that is still queued at that
+# deadline, is shed with a fast degraded response instead of piling onto LLM quota.
+ADMISSION_ENABLED = os.getenv("RAG_ADMISSION", "true").lower() == "true"
+MAX_CONCURRENT = int(os.getenv("RAG_MAX_CONCURRENT", "16"))
+PRIORITY_ORDER = ("P0", "P1", "P2")
+
+
+def _per_class(value, cast=float):
+    """Parse "P0:16,P1:12,P2:6" into {"P0": 16, ...}"""
+    out = {}
+    for part in value.split(","):
+        if part.strip():
+            name, number = part.split(":")
+            out[name.strip()] = cast(number)
+    return out
+
+
+CLASS_CONCURRENCY = _per_class(os.getenv("RAG_CLASS_CONCURRENCY", "P0:16,P1:12,P2:6"), int)
+CLASS_MAX_WAIT = _per_class(os.getenv("RAG_CLASS_MAX_WAIT_SECONDS", "P0:30,P1:8,P2:2"))
+
+admission_shed = registry.register(Counter(
+    "rag_admission_shed_total", "/rag requests shed by admission control", ["priority", "reason"]))
+admission_wait_seconds = registry.register(Histogram(
+    "rag_admission_wait_seconds", "Time /rag requests spent queued for admission", ["priority"]))
+
+
+class Overloaded(RuntimeError):
+    """A request was shed by admission control"""
+
+    def __init__(self, priority, reason, retry_after):
+        super().__init__(f"{priority} request shed ({reason})")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Priority queues with per-class concurrency limits and queue-wait deadlines.
+
+    Runs on the event loop: waiting requests hold no worker thread, so a queued
+    P2 question never keeps a P0 ticket from being picked up.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, class_limits=None, max_wait=None,
+                 order=PRIORITY_ORDER, enabled=ADMISSION_ENABLED):
+        self.max_concurrent = max_concurrent
+        self.order = tuple(order)
+        self.class_limits = {c: max_concurrent for c in self.order}
+        self.class_limits.update(CLASS_CONCURRENCY if class_limits is None else class_limits)
+        self.max_wait = dict(CLASS_MAX_WAIT if max_wait is None else max_wait)
+        self.enabled = enabled
+        self.active = {c: 0 for c in self.order}
+        self.queues = {c: deque() for c in self.order}
+        # Smoothed time a request holds its slot, for estimating queue waits
+        self.service_seconds = None
+        self.stats = {c: {"admitted": 0, "shed": 0, "timed_out": 0} for c in self.order}
+
+    def _class(self, priority):
+        return priority if priority in self.order else self.order[-1]
+
+    def _can_run(self, cls):
+        return sum(self.active.values()) < self.max_concurrent and self.active[cls] < self.class_limits[cls]
+
+    def _ahead(self, cls):
+        """Classes served before or together with cls"""
+        return self.order[:self.order.index(cls) + 1]
+
+    def _runnable_now(self, cls):
+        return self._can_run(cls) and not any(self.queues[c] for c in self._ahead(cls))
+
+    def estimated_wait(self, priority):
+        """Expected queue wait for a new request of this priority (0 when a slot is free)"""
+        cls = self._class(priority)
+        if self._runnable_now(cls) or self.service_seconds is None:
+            return 0.0
+        ahead = sum(len(self.queues[c]) for c in self._ahead(cls))
+        slots = max(1, min(self.max_concurrent, self.class_limits[cls]))
+        return (ahead + 1) * self.service_seconds / slots
+
+    async def acquire(self, priority):
+        """Wait for a slot; raises Overloaded when the class's wait budget would be exceeded"""
+        cls = self._class(priority)
+        budget = self.max_wait.get(cls)
+        if not self.enabled:
+            return 0.0
+        if self._runnable_now(cls):
+            self.active[cls] += 1
+            self.stats[cls]["admitted"] += 1
+            admission_wait_seconds.observe(0.0, priority=cls)
+            return 0.0
+
+        expected = self.estimated_wait(cls)
+        if budget is not None and expected > budget:
+            self.stats[cls]["shed"] += 1
+            admission_shed.inc(priority=cls, reason="slo")
+            raise Overloaded(cls, "expected wait exceeds SLO", retry_after=round(expected, 1))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues[cls].append(waiter)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=budget)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Granted in the same loop iteration as the timeout: keep the slot
+                pass
+            else:
+                self.queues[cls].remove(waiter)
+                waiter.cancel()
+                self.stats[cls]["timed_out"] += 1
+                admission_shed.inc(priority=cls, reason="deadline")
+                raise Overloaded(cls, "queue deadline exceeded", retry_after=budget)
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if waiter.done() and not waiter.cancelled():
+                self.release(cls)
+            elif waiter in self.queues[cls]:
+                self.queues[cls].remove(waiter)
+            raise
+        waited = time.monotonic() - start
+        self.stats[cls]["admitted"] += 1
+        admission_wait_seconds.observe(waited, priority=cls)
+        return waited
+
+    def release(self, priority, service_seconds=None):
+        """Free a slot and hand it to the highest-priority waiter that fits its class limit"""
+        cls = self._class(priority)
+        self.active[cls] -= 1
+        if service_seconds is not None:
+            self.service_seconds = service_seconds if self.service_seconds is None else (
+                0.8 * self.service_seconds + 0.2 * service_seconds)
+        for c in self.order:
+            if not self._can_run(c):
+                continue
+            while self.queues[c]:
+                waiter = self.queues[c].popleft()
+                if not waiter.done():
+                    self.active[c] += 1
+                    waiter.set_result(True)
+                    return
+
+    @asynccontextmanager
+    async def admit(self, priority):
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.release(priority, time.monotonic() - start)
+
+    def get_stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_concurrent": self.max_concurrent,
+            "service_seconds": round(self.service_seconds, 3) if self.service_seconds is not None else None,
+            "classes": {
+                c: {
+                    **self.stats[c],
+                    "active": self.active[c],
+                    "queued": len(self.queues[c]),
+                    "limit": self.class_limits[c],
+                    "max_wait_seconds": self.max_wait.get(c),
+                }
+                for c in self.order
+            },
+        }
+
+
+# Global instance
+admission = AdmissionController()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compare classification latency, token usage and parse failures between the
+legacy free-form JSON prompt and the compact structured-output mode.
+
+Usage (from backend/):
+    python -m benchmarks.bench_classifier --runs 3
+Set OPENAI_BASE_URL to point the benchmark at a local stand-in instead of the live
+API, e.g. `python -m benchmarks.fake_openai` (see benchmarks/README.md).
+"""
+
+import argparse
+import statistics
+import time
+
+import classifier
+from benchmarks.common import percentile
+
+SAMPLE_TICKETS = [
+    "Our Snowflake connector has been failing since last night and the whole data team is blocked!",
+    "How do I add a README to a table asset?",
+    "Is there a Python SDK method to bulk update asset owners?",
+    "SAML SSO with Okta keeps redirecting back to the login page.",
+    "Lineage for our dbt models is missing the downstream Tableau dashboards.",
+    "What is the recommended way to structure glossary terms across domains?",
+    "We need to mask PII columns automatically. Which policies should we use?",
+    "Curious whether Atlan supports column-level lineage for Databricks.",
+]
+
+
+def run_mode(mode, runs):
+    latencies = []
+    for _ in range(runs):
+        for ticket in SAMPLE_TICKETS:
+            start = time.perf_counter()
+            classifier._classify_uncached(ticket, mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="passes over the sample tickets per mode")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "compact"])
+    args = parser.parse_args()
+
+    results = {mode: run_mode(mode, args.runs) for mode in args.modes}
+    stats = classifier.classifier_stats.summary()
+
+    print(f"{'mode':<10}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}"
+          f"{'prompt tok':>12}{'compl tok':>11}{'parse fail':>12}")
+    for mode, latencies in results.items():
+        s = stats.get(mode, {})
+        print(f"{mode:<10}{len(latencies):>7}{percentile(latencies, 50):>10.1f}"
+              f"{percentile(latencies, 95):>10.1f}{statistics.mean(latencies):>10.1f}"
+              f"{s.get('avg_prompt_tokens', 0):>12}{s.get('avg_completion_tokens', 0):>11}"
+              f"{s.get('parse_failure_rate', 0):>12.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+End-to-end backend benchmark against the local fake OpenAI server.
+
+Generates a synthetic corpus in a scratch directory, then measures:
+  1. build_index throughput (documents/second)
+  2. retrieve() latency for sequential queries
+  3. /rag p50/p95/p99 latency and throughput under concurrent HTTP load
+
+Usage (from backend/):
+    python -m benchmarks.bench_e2e --pages 500 --requests 400 --concurrency 32
+    python -m benchmarks.bench_e2e --chat-latency-ms 800 --json results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.common import free_port, summarize, use_fake_openai
+from benchmarks.fake_openai import FakeOpenAIConfig, start_fake_server
+from benchmarks.synthetic_corpus import generate_corpus, sample_queries
+
+
+def bench_build(pipeline, n_pages):
+    start = time.perf_counter()
+    pipeline.build_index(force_rebuild=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(pipeline.docs or []),
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(n_pages / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def bench_retrieve(pipeline, queries):
+    latencies = []
+    for query, _ in queries:
+        start = time.perf_counter()
+        pipeline.retrieve(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies)
+
+
+def _serve(app, port):
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def bench_rag(app, queries, concurrency):
+    import httpx
+
+    port = free_port()
+    server, thread = _serve(app, port)
+    url = f"http://127.0.0.1:{port}/rag"
+    errors = [0]
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    with httpx.Client(timeout=120, limits=limits) as client:
+        def one(query):
+            start = time.perf_counter()
+            resp = client.post(url, json={"text": query})
+            if resp.status_code != 200:
+                errors[0] += 1
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, [q for q, _ in queries]))
+        wall = time.perf_counter() - start
+
+    server.should_exit = True
+    thread.join(timeout=10)
+    return {
+        **summarize(latencies),
+        "concurrency": concurrency,
+        "errors": errors[0],
+        "requests_per_second": round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300, help="synthetic pages to index")
+    parser.add_argument("--queries", type=int, default=100, help="sequential retrieve() queries")
+    parser.add_argument("--requests", type=int, default=200, help="concurrent /rag requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--chat-latency-per-token-ms", type=float, default=1.0)
+    parser.add_argument("--workdir", help="scratch directory (default: a temporary directory)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    fake = start_fake_server(config=FakeOpenAIConfig(
+        embed_latency_ms=args.embed_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        chat_latency_per_token_ms=args.chat_latency_per_token_ms
+    ))
+    use_fake_openai(fake)
+    os.environ["RAG_AUTO_BUILD"] = "false"
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="rag-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    pages = generate_corpus(workdir, args.pages)
+    # The pipeline resolves data/, scraped_data/ and vectorstore/ relative to the working directory
+    os.chdir(workdir)
+    print(f"Benchmark workspace: {workdir} ({len(pages)} pages), fake API at {fake.base_url}")
+
+    import enhanced_rag_pipeline
+    import main as backend_main
+
+    pipeline = enhanced_rag_pipeline.rag_pipeline
+    results = {"config": vars(args)}
+
+    print("Measuring build_index...")
+    results["build_index"] = bench_build(pipeline, len(pages))
+    results["upstream_after_build"] = dict(fake.stats)
+
+    print("Measuring retrieve()...")
+    results["retrieve"] = bench_retrieve(pipeline, sample_queries(pages, args.queries, seed=1))
+
+    print("Measuring /rag under concurrent load...")
+    # Distinct query texts so classification results are not simply served from cache
+    rag_queries = [(f"{q} (ticket {i})", url) for i, (q, url) in
+                   enumerate(sample_queries(pages, args.requests, seed=2))]
+    before = dict(fake.stats)
+    results["rag"] = bench_rag(backend_main.app, rag_queries, args.concurrency)
+    results["upstream_during_rag"] = {k: fake.stats[k] - before[k] for k in fake.stats}
+    results["stats"] = pipeline.get_stats()
+
+    print(json.dumps(results, indent=2, default=str))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=str)
+    fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
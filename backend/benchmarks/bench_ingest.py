@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare storage formats for scraped pages: file size, write time, ingest time
+and peak Python memory while reading a large crawl.
+
+  json       legacy indented JSON array (parsed whole)
+  jsonl      one compact record per line (streamed)
+  jsonl.gz   gzip-compressed JSON lines (streamed)
+
+Each format is read with the stdlib json module and, when installed, orjson
+(JSON_BACKEND). Ingest walks every record the way the loader does; peak memory
+comes from tracemalloc, so it covers Python allocations only.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingest --pages 20000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import scraped_store
+from benchmarks.synthetic_corpus import generate_pages
+from scraped_store import iter_records, write_records
+
+FORMATS = ["json", "jsonl", "jsonl.gz"]
+
+
+def write_format(pages, path, fmt):
+    start = time.perf_counter()
+    if fmt == "json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(pages, f, indent=2, ensure_ascii=False)
+    else:
+        write_records(path, pages)
+    return time.perf_counter() - start
+
+
+def ingest(path, backend):
+    """Read every record and touch its text, returning (records, seconds, peak MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = chars = 0
+    for item in iter_records(path, backend):
+        count += 1
+        chars += len(item["content"])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3, help="ingest runs per setting (best is reported)")
+    args = parser.parse_args()
+
+    backends = ["json"] + (["orjson"] if scraped_store.orjson is not None else [])
+    if len(backends) == 1:
+        print("orjson is not installed; reporting the stdlib backend only")
+
+    print(f"Generating {args.pages} synthetic pages...")
+    pages = generate_pages(args.pages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"\n{'format':<10}{'size MB':>9}{'write s':>9}{'backend':>9}{'ingest s':>10}{'peak MB':>9}{'pages/s':>10}")
+        for fmt in FORMATS:
+            path = Path(tmp) / f"atlan_product_docs.{fmt}"
+            write_s = write_format(pages, path, fmt)
+            size_mb = path.stat().st_size / 2**20
+            for backend in backends:
+                runs = [ingest(path, backend) for _ in range(args.repeat)]
+                count, ingest_s, peak_mb = min(runs, key=lambda r: r[1])
+                assert count == len(pages)
+                print(f"{fmt:<10}{size_mb:>9.1f}{write_s:>9.2f}{backend:>9}{ingest_s:>10.2f}"
+                      f"{peak_mb:>9.2f}{count / ingest_s:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Measure provider prompt-cache reuse for each answer prompt layout (RAG_PROMPT_LAYOUT).
+
+The fake API simulates OpenAI prompt caching (prompts of 1024+ tokens reuse their
+longest previously seen prefix in 128-token blocks) and charges prefill latency
+only for uncached prompt tokens. The workload asks each question in several
+phrasings, so retrieval returns overlapping documents in varying score order.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prompt_cache --pages 300 --questions 40 --phrasings 4
+
+With those defaults ranked caches 59.4% of prompt tokens and stable 65.5%. The first
+phrasing of each question can only reuse what an earlier question shared, so with 4
+phrasings no layout gets much past 75%.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.common import summarize, use_fake_openai
+from benchmarks.fake_openai import FakeOpenAIConfig, start_fake_server
+from benchmarks.synthetic_corpus import generate_corpus, sample_queries
+
+LAYOUTS = ["ranked", "stable"]
+PHRASINGS = ["{q}", "Hi team, {q}", "{q} Thanks!", "Quick question: {q}", "{q} We are blocked on this."]
+
+
+def run_layout(pipeline, fake, layout, queries):
+    import enhanced_rag_pipeline
+
+    enhanced_rag_pipeline.PROMPT_LAYOUT = layout
+    fake.reset_prompt_cache()
+    before = dict(fake.stats)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        pipeline.generate_answer(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    prompt = fake.stats["prompt_tokens"] - before["prompt_tokens"]
+    cached = fake.stats["cached_prompt_tokens"] - before["cached_prompt_tokens"]
+    return {
+        "layout": layout,
+        "latency": summarize(latencies),
+        "prompt_tokens": prompt,
+        "cached_tokens": cached,
+        "cached_ratio": cached / prompt if prompt else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--phrasings", type=int, default=4, help=f"phrasings per question (max {len(PHRASINGS)})")
+    parser.add_argument("--chat-latency-ms", type=float, default=200.0)
+    parser.add_argument("--prompt-latency-per-token-ms", type=float, default=0.1,
+                        help="simulated prefill cost per uncached prompt token")
+    args = parser.parse_args()
+
+    fake = start_fake_server(config=FakeOpenAIConfig(
+        embed_latency_ms=0, chat_latency_ms=args.chat_latency_ms, chat_latency_per_token_ms=0.0,
+        prompt_latency_per_token_ms=args.prompt_latency_per_token_ms
+    ))
+    use_fake_openai(fake)
+    os.environ["RAG_AUTO_BUILD"] = "false"
+    os.environ["FAQ_ANSWERS"] = "false"
+
+    workdir = Path(tempfile.mkdtemp(prefix="rag-prompt-cache-"))
+    pages = generate_corpus(workdir, args.pages)
+    os.chdir(workdir)
+
+    import enhanced_rag_pipeline
+    pipeline = enhanced_rag_pipeline.rag_pipeline
+    print(f"Building index over {len(pages)} synthetic pages...")
+    pipeline.build_index(force_rebuild=True)
+
+    base = [q for q, _ in sample_queries(pages, args.questions, seed=3)]
+    queries = [p.format(q=q) for q in base for p in PHRASINGS[:args.phrasings]]
+
+    print(f"\n{len(queries)} generate_answer calls ({args.questions} questions x {args.phrasings} phrasings)")
+    print(f"{'layout':<9}{'p50 ms':>9}{'p95 ms':>9}{'prompt tok':>12}{'cached tok':>12}{'cached %':>10}")
+    for layout in LAYOUTS:
+        r = run_layout(pipeline, fake, layout, queries)
+        print(f"{r['layout']:<9}{r['latency']['p50_ms']:>9.1f}{r['latency']['p95_ms']:>9.1f}"
+              f"{r['prompt_tokens']:>12}{r['cached_tokens']:>12}{r['cached_ratio'] * 100:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
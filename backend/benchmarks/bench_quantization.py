@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Compare compressed vector storage settings for the FAISS index: memory, query
+latency and recall@k against exact full-dimension search.
+
+Settings are written as TYPE[@DIMS][+rFACTOR], e.g. "sq8", "pq+r4", "flat@512":
+  TYPE    flat | fp16 | sq8 | pq          (RAG_INDEX_TYPE)
+  @DIMS   Matryoshka-truncated dimensions (RAG_EMBED_DIMENSIONS)
+  +rN     exact rescoring of top_k*N      (RAG_RESCORE_FACTOR)
+
+Embeddings come from the deterministic local embedder, so no API calls are made.
+That embedder is not Matryoshka-trained, so @DIMS settings understate the recall
+real text-embedding-3 vectors keep when truncated.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quantization --pages 3000 --queries 300
+    python -m benchmarks.bench_quantization --settings flat sq8 sq8+r4 pq+r8 flat@256
+"""
+
+import argparse
+import re
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.common import summarize
+from benchmarks.fake_openai import deterministic_embedding
+from benchmarks.synthetic_corpus import generate_pages, sample_queries
+from vector_index import create_faiss_index, index_nbytes, rescore_search
+
+DEFAULT_SETTINGS = ["flat", "fp16", "sq8", "pq", "sq8+r4", "pq+r8", "flat@512", "flat@256", "sq8@512+r4"]
+SETTING_RE = re.compile(r"^(flat|fp16|sq8|pq)(?:@(\d+))?(?:\+r(\d+))?$")
+
+
+def parse_setting(spec):
+    match = SETTING_RE.match(spec)
+    if not match:
+        raise SystemExit(f"Invalid setting '{spec}', expected TYPE[@DIMS][+rFACTOR]")
+    index_type, dims, factor = match.groups()
+    return index_type, int(dims) if dims else None, int(factor) if factor else 0
+
+
+def truncate(vectors, dims):
+    """Matryoshka truncation: keep the leading dimensions and renormalize"""
+    if dims is None:
+        return vectors
+    out = np.ascontiguousarray(vectors[:, :dims])
+    faiss.normalize_L2(out)
+    return out
+
+
+def run_setting(spec, doc_vecs, query_vecs, truth, top_k, pq_m):
+    index_type, dims, factor = parse_setting(spec)
+    docs = truncate(doc_vecs, dims)
+    queries = truncate(query_vecs, dims)
+
+    start = time.perf_counter()
+    index = create_faiss_index(docs, index_type, pq_m)
+    build_s = time.perf_counter() - start
+
+    latencies, found = [], []
+    for q in queries:
+        q = q.reshape(1, -1)
+        start = time.perf_counter()
+        if factor > 1:
+            _, ids = rescore_search(index, docs, q, top_k, factor)
+        else:
+            _, ids = index.search(q, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+
+    recall = np.mean([len(set(f) & set(t)) / top_k for f, t in zip(found, truth)])
+    return {
+        "setting": spec,
+        "index_mb": index_nbytes(index) / 2**20,
+        "rescore_mb": docs.nbytes / 2**20 if factor > 1 else 0.0,
+        "build_s": build_s,
+        "latency": summarize(latencies),
+        "recall": recall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--pq-m", type=int, default=64, help="PQ subquantizers (RAG_PQ_M)")
+    parser.add_argument("--settings", nargs="+", default=DEFAULT_SETTINGS)
+    args = parser.parse_args()
+
+    pages = generate_pages(args.pages)
+    print(f"Embedding {len(pages)} pages and {args.queries} queries with the local embedder...")
+    doc_vecs = np.stack([deterministic_embedding(f"{p['title']} {p['content']}") for p in pages]).astype("float32")
+    query_vecs = np.stack([deterministic_embedding(q) for q, _ in sample_queries(pages, args.queries)]).astype("float32")
+
+    # Ground truth: exact search over full-dimension float32 vectors
+    exact = faiss.IndexFlatIP(doc_vecs.shape[1])
+    exact.add(doc_vecs)
+    _, truth = exact.search(query_vecs, args.top_k)
+
+    print(f"\n{'setting':<14}{'index MB':>10}{'rescore MB':>12}{'build s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{f'recall@{args.top_k}':>11}")
+    for spec in args.settings:
+        r = run_setting(spec, doc_vecs, query_vecs, truth, args.top_k, args.pq_m)
+        print(f"{r['setting']:<14}{r['index_mb']:>10.2f}{r['rescore_mb']:>12.2f}{r['build_s']:>9.2f}"
+              f"{r['latency']['p50_ms']:>9.3f}{r['latency']['p95_ms']:>9.3f}{r['recall']:>11.3f}")
+    print("\nrescore MB is the float32 vectors.npy, memory-mapped from disk rather than held in RAM.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Helpers shared by the benchmark scripts."""
+
+import os
+import socket
+import statistics
+
+# Quotas high enough that the rate limiter never throttles the fake server
+_UNTHROTTLED_ENV = {
+    "OPENAI_CHAT_RPM": "1000000",
+    "OPENAI_CHAT_TPM": "1000000000",
+    "OPENAI_EMBEDDINGS_RPM": "1000000",
+    "OPENAI_EMBEDDINGS_TPM": "1000000000",
+}
+
+
+def use_fake_openai(server):
+    """Route every OpenAI client created afterwards to the fake server"""
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "sk-fake-benchmark"
+    for key, value in _UNTHROTTLED_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+
+def summarize(latencies_ms):
+    """p50/p95/p99/mean of a list of millisecond latencies"""
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "mean_ms": round(statistics.mean(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
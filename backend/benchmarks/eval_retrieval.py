@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval evaluation: recall@k, MRR, per-query search latency and index
+size for several vectorstore variants, side by side.
+
+Queries come from a labelled JSONL file, one {"query": ..., "relevant": [...]}
+per line, where relevant entries are document sources ("product_docs/<url>") or
+bare URLs. Without --queries, a set is synthesized from scraped_data/: page
+titles and section headings that only a few pages share (every page with the
+title or heading counts as relevant). --write-queries saves it for labelling by hand.
+
+Variants are written as TYPE[@DIMS][+rFACTOR][/cWORDS]:
+  TYPE    flat | fp16 | sq8 | pq          (RAG_INDEX_TYPE)
+  @DIMS   Matryoshka-truncated dimensions (RAG_EMBED_DIMENSIONS)
+  +rN     exact rescoring of top_k*N      (RAG_RESCORE_FACTOR)
+  /cN     N-word chunks with 20% overlap instead of one vector per document
+          (the pipeline itself only splits pages over chunking.CHUNK_TOKENS)
+--vectorstore DIR adds an existing vectorstore as a variant; it must have been
+built with the local embedder (e.g. against benchmarks.fake_openai). Its chunk
+hits are collapsed to documents like the /cN variants.
+
+Documents and queries are embedded with the deterministic local embedder, so no
+API calls are made and runs are reproducible. Recall@k is the share of a query's
+relevant documents in its top k, out of min(k, number relevant); MRR uses the
+rank of the first relevant document within the largest k. Latency covers the
+FAISS search (and rescoring) only.
+
+Usage (from backend/):
+    python -m benchmarks.eval_retrieval --variants flat sq8 sq8+r4 flat/c200
+    python -m benchmarks.eval_retrieval --synthetic 2000 --variants flat pq pq+r8
+    python -m benchmarks.eval_retrieval --queries labelled.jsonl --vectorstore vectorstore
+"""
+
+import argparse
+import json
+import os
+import pickle
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import faiss
+import numpy as np
+
+from benchmarks.bench_quantization import truncate
+from benchmarks.common import summarize
+from benchmarks.fake_openai import deterministic_embedding
+from benchmarks.synthetic_corpus import generate_corpus
+from enhanced_data_loader import EnhancedDataLoader
+from near_duplicates import NEAR_DUPLICATE_DISTANCE, collapse_near_duplicates
+from vector_index import create_faiss_index, index_nbytes, rescore_search
+
+DEFAULT_VARIANTS = ["flat", "sq8", "sq8+r4", "pq+r8", "flat@512", "flat/c200"]
+VARIANT_RE = re.compile(r"^(flat|fp16|sq8|pq)(?:@(\d+))?(?:\+r(\d+))?(?:/c(\d+))?$")
+CHUNK_OVERLAP = 0.2
+# Chunk hits are collapsed to documents, so search this many times more chunks than k
+CHUNK_OVERSAMPLE = 4
+# Headings shared by more pages than this are too generic to be a query
+MAX_SECTION_PAGES = 3
+
+
+def parse_variant(spec):
+    match = VARIANT_RE.match(spec)
+    if not match:
+        raise SystemExit(f"Invalid variant '{spec}', expected TYPE[@DIMS][+rFACTOR][/cWORDS]")
+    index_type, dims, factor, chunk = match.groups()
+    return index_type, int(dims) if dims else None, int(factor) if factor else 0, int(chunk) if chunk else None
+
+
+def load_documents(root):
+    """Documents as the pipeline indexes them: loaded from root, near-duplicates collapsed"""
+    root = Path(root)
+    loader = EnhancedDataLoader(data_dir=root / "data", scraped_dir=root / "scraped_data", uploads_dir=root / "uploads")
+    documents = list(loader.iter_documents())
+    if NEAR_DUPLICATE_DISTANCE >= 0:
+        documents, _ = collapse_near_duplicates(documents, NEAR_DUPLICATE_DISTANCE, text_key="content")
+    return documents
+
+
+def source_keys(doc):
+    """Names a labelled query may use for a document: its source, bare URL, and collapsed copies"""
+    keys = set()
+    for source in [doc.get("source", "")] + list(doc.get("duplicates", [])):
+        keys.add(source)
+        if "/" in source:
+            keys.add(source.split("/", 1)[1])
+    return keys
+
+
+def synthesize_queries(documents, n, seed=7):
+    """Title queries plus distinctive section-heading queries, sampled down to n"""
+    by_title, by_heading = defaultdict(set), defaultdict(set)
+    for doc in documents:
+        title = (doc.get("title") or "").strip()
+        if title:
+            # Pages sharing a title are equally good answers to it
+            by_title[title].add(doc["source"])
+        for section in doc.get("sections", []):
+            heading = (section.get("text") or "").strip()
+            if section.get("level", 1) >= 2 and len(heading.split()) >= 2 and heading.lower() != title.lower():
+                by_heading[heading].add(doc["source"])
+
+    queries = [{"query": f"{title}?", "relevant": sorted(sources)} for title, sources in by_title.items()]
+    queries += [{"query": heading, "relevant": sorted(sources)}
+                for heading, sources in by_heading.items() if len(sources) <= MAX_SECTION_PAGES]
+    rng = random.Random(seed)
+    return rng.sample(queries, min(n, len(queries)))
+
+
+def load_queries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chunk_words(text, size):
+    words = text.split()
+    step = max(1, int(size * (1 - CHUNK_OVERLAP)))
+    return [" ".join(words[i:i + size]) for i in range(0, max(1, len(words) - size + step), step)]
+
+
+def embed_corpus(documents, chunk):
+    """(vectors, owner doc index per vector) for one chunking setting"""
+    texts, owners = [], []
+    for i, doc in enumerate(documents):
+        pieces = chunk_words(doc["text"], chunk) if chunk else [doc["text"]]
+        texts.extend(pieces)
+        owners.extend([i] * len(pieces))
+    vectors = np.stack([deterministic_embedding(t) for t in texts]).astype("float32")
+    return vectors, np.array(owners)
+
+
+def score_queries(ranked_docs, relevant_sets, ks):
+    """recall@k for each k and MRR@max(k) over ranked document ids"""
+    max_k = max(ks)
+    recall = {k: [] for k in ks}
+    reciprocal_ranks = []
+    for ranked, relevant in zip(ranked_docs, relevant_sets):
+        hits = [doc_id in relevant for doc_id in ranked[:max_k]]
+        for k in ks:
+            recall[k].append(sum(hits[:k]) / min(k, len(relevant)))
+        reciprocal_ranks.append(1.0 / (hits.index(True) + 1) if True in hits else 0.0)
+    return {f"recall@{k}": float(np.mean(recall[k])) for k in ks}, float(np.mean(reciprocal_ranks))
+
+
+def search_ranked(search, query_vecs, owners, max_k, oversample):
+    """Per-query searches; returns (ranked distinct doc ids, latencies ms)"""
+    ranked, latencies = [], []
+    for q in query_vecs:
+        q = q.reshape(1, -1)
+        start = time.perf_counter()
+        _, ids = search(q, max_k * oversample)
+        latencies.append((time.perf_counter() - start) * 1000)
+        docs, seen = [], set()
+        for vec_id in ids[0]:
+            if vec_id < 0:
+                continue
+            doc_id = int(owners[vec_id]) if owners is not None else int(vec_id)
+            if doc_id not in seen:
+                seen.add(doc_id)
+                docs.append(doc_id)
+        ranked.append(docs[:max_k])
+    return ranked, latencies
+
+
+def run_variant(spec, documents, queries, relevant_sets, ks, pq_m, corpus_cache):
+    index_type, dims, factor, chunk = parse_variant(spec)
+    if chunk not in corpus_cache:
+        corpus_cache[chunk] = embed_corpus(documents, chunk)
+    vectors, owners = corpus_cache[chunk]
+    vectors = truncate(vectors, dims)
+    query_vecs = truncate(np.stack([deterministic_embedding(q["query"]) for q in queries]).astype("float32"), dims)
+
+    start = time.perf_counter()
+    index = create_faiss_index(vectors, index_type, pq_m)
+    build_s = time.perf_counter() - start
+
+    def search(q, k):
+        if factor > 1:
+            return rescore_search(index, vectors, q, k, factor)
+        return index.search(q, k)
+
+    ranked, latencies = search_ranked(search, query_vecs, owners if chunk else None, max(ks),
+                                      CHUNK_OVERSAMPLE if chunk else 1)
+    recall, mrr = score_queries(ranked, relevant_sets, ks)
+    return {
+        "variant": spec,
+        "vectors": len(vectors),
+        "index_mb": index_nbytes(index) / 2**20,
+        "rescore_mb": vectors.nbytes / 2**20 if factor > 1 else 0.0,
+        "build_s": build_s,
+        "latency": summarize(latencies),
+        "mrr": mrr,
+        **recall,
+    }
+
+
+def run_vectorstore(path, documents, queries, relevant_sets, ks):
+    """Evaluate an on-disk vectorstore as the serving pipeline would search it"""
+    path = Path(path)
+    index = faiss.read_index(str(path / "index.faiss"))
+    with open(path / "meta.pkl", "rb") as f:
+        docs_metadata = pickle.load(f)
+    config = {}
+    if (path / "index_config.json").exists():
+        with open(path / "index_config.json", "r", encoding="utf-8") as f:
+            config = json.load(f)
+    # Same setting the pipeline reads; vectors.npy only exists for compressed indexes
+    factor = int(os.getenv("RAG_RESCORE_FACTOR", "0"))
+    full_vectors = np.load(path / "vectors.npy", mmap_mode="r") if (path / "vectors.npy").exists() else None
+
+    # Relevance is judged against the vectorstore's own documents, mapped through their sources;
+    # every chunk of a page is owned by the page's first chunk
+    position = {}
+    for i, doc in enumerate(docs_metadata):
+        for key in source_keys(doc):
+            position.setdefault(key, i)
+    owners = np.array([position[doc["source"]] for doc in docs_metadata])
+    chunked = len(set(owners.tolist())) < len(owners)
+    store_relevant = [{position[documents[d]["source"]] for d in rel if documents[d]["source"] in position}
+                      for rel in relevant_sets]
+    kept = [i for i, rel in enumerate(store_relevant) if rel]
+
+    query_vecs = truncate(np.stack([deterministic_embedding(queries[i]["query"]) for i in kept]).astype("float32"),
+                          config.get("embedding_dimensions"))
+
+    def search(q, k):
+        if full_vectors is not None and factor > 1:
+            return rescore_search(index, full_vectors, q, k, factor)
+        return index.search(q, k)
+
+    ranked, latencies = search_ranked(search, query_vecs, owners if chunked else None, max(ks),
+                                      CHUNK_OVERSAMPLE if chunked else 1)
+    recall, mrr = score_queries(ranked, [store_relevant[i] for i in kept], ks)
+    files = ["index.faiss", "vectors.npy", "meta.pkl"]
+    return {
+        "variant": str(path),
+        "vectors": index.ntotal,
+        "index_mb": (path / "index.faiss").stat().st_size / 2**20,
+        "rescore_mb": (path / "vectors.npy").stat().st_size / 2**20 if full_vectors is not None else 0.0,
+        "disk_mb": sum((path / name).stat().st_size for name in files if (path / name).exists()) / 2**20,
+        "build_s": None,
+        "latency": summarize(latencies),
+        "mrr": mrr,
+        "queries": len(kept),
+        **recall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=".", help="directory holding scraped_data/ (default: backend/)")
+    parser.add_argument("--synthetic", type=int, default=0, help="evaluate on N synthetic pages instead of --root")
+    parser.add_argument("--queries", help="labelled query set (JSONL); synthesized when omitted")
+    parser.add_argument("--num-queries", type=int, default=300, help="size of a synthesized query set")
+    parser.add_argument("--write-queries", help="save the query set used to this JSONL file")
+    parser.add_argument("--variants", nargs="*", default=DEFAULT_VARIANTS)
+    parser.add_argument("--vectorstore", nargs="*", default=[], help="existing vectorstore directories to compare")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--pq-m", type=int, default=64, help="PQ subquantizers (RAG_PQ_M)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_corpus(tmp, args.synthetic)
+            documents = load_documents(tmp)
+    else:
+        documents = load_documents(args.root)
+    if not documents:
+        raise SystemExit(f"No documents under {Path(args.root).resolve() / 'scraped_data'}")
+
+    queries = load_queries(args.queries) if args.queries else synthesize_queries(documents, args.num_queries)
+    if args.write_queries:
+        with open(args.write_queries, "w", encoding="utf-8") as f:
+            for q in queries:
+                f.write(json.dumps(q, ensure_ascii=False) + "\n")
+
+    # Map labels onto document ids; queries whose labels match nothing cannot be scored
+    position = defaultdict(set)
+    for i, doc in enumerate(documents):
+        for key in source_keys(doc):
+            position[key].add(i)
+    relevant_sets = [set().union(*(position.get(r, set()) for r in q["relevant"])) for q in queries]
+    unmatched = sum(1 for rel in relevant_sets if not rel)
+    queries = [q for q, rel in zip(queries, relevant_sets) if rel]
+    relevant_sets = [rel for rel in relevant_sets if rel]
+    print(f"{len(documents)} documents, {len(queries)} queries"
+          + (f" ({unmatched} skipped: no labelled document found)" if unmatched else ""))
+
+    ks = sorted(set(args.top_k))
+    results, corpus_cache = [], {}
+    for spec in args.variants:
+        results.append(run_variant(spec, documents, queries, relevant_sets, ks, args.pq_m, corpus_cache))
+    for path in args.vectorstore:
+        results.append(run_vectorstore(path, documents, queries, relevant_sets, ks))
+
+    recall_cols = [f"recall@{k}" for k in ks]
+    width = max(22, max(len(r["variant"]) for r in results) + 2)
+    print(f"\n{'variant':<{width}}{'vectors':>9}{'index MB':>10}{'rescore MB':>12}{'p50 ms':>9}{'p95 ms':>9}"
+          + "".join(f"{c:>11}" for c in recall_cols) + f"{'MRR':>8}")
+    for r in results:
+        print(f"{r['variant']:<{width}}{r['vectors']:>9}{r['index_mb']:>10.2f}{r['rescore_mb']:>12.2f}"
+              f"{r['latency']['p50_ms']:>9.3f}{r['latency']['p95_ms']:>9.3f}"
+              + "".join(f"{r[c]:>11.3f}" for c in recall_cols) + f"{r['mrr']:>8.3f}")
+    if len(results) > 1:
+        base = results[0]
+        print(f"\nChange vs {base['variant']}:")
+        for r in results[1:]:
+            print(f"  {r['variant']:<{width - 2}} MRR {r['mrr'] - base['mrr']:+.3f}  "
+                  f"recall@{ks[-1]} {r[recall_cols[-1]] - base[recall_cols[-1]]:+.3f}  "
+                  f"p50 {r['latency']['p50_ms'] - base['latency']['p50_ms']:+.3f} ms  "
+                  f"index {r['index_mb'] - base['index_mb']:+.2f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"documents": len(documents), "queries": len(queries), "top_k": ks, "results": results},
+                      f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI API used by the offline benchmarks.
+
+Serves /v1/embeddings and /v1/chat/completions with deterministic output and
+configurable latency, so the backend can be exercised without network access
+or API spend. Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage (from backend/):
+    python -m benchmarks.fake_openai --port 8765 --chat-latency-ms 400
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIM = 1536
+# Provider prompt caching: prompts of 1024+ tokens reuse their longest previously seen
+# prefix, counted in 128-token blocks
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK_TOKENS = 128
+DEFAULT_CLASSIFICATION = {"topic": "How-to", "sentiment": "Neutral", "priority": "P1"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_token_cache = {}
+_token_lock = threading.Lock()
+
+
+def _token_vector(token, dim):
+    """Stable pseudo-random unit direction for a token (independent of PYTHONHASHSEED)"""
+    key = (token, dim)
+    vec = _token_cache.get(key)
+    if vec is None:
+        seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        vec = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+        with _token_lock:
+            _token_cache[key] = vec
+    return vec
+
+
+def deterministic_embedding(text, dim=EMBEDDING_DIM):
+    """Bag-of-words embedding: texts sharing vocabulary get high cosine similarity"""
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    vec = np.zeros(dim, dtype="float32")
+    for token in tokens:
+        vec += _token_vector(token, dim)
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        vec[0] = 1.0
+        return vec
+    return vec / norm
+
+
+def count_tokens(text):
+    return max(1, len(text or "") // 4)
+
+
+class FakeOpenAIConfig:
+    """Latency and response settings; mutable while the server runs"""
+
+    def __init__(self, embed_latency_ms=20.0, embed_latency_per_input_ms=0.5,
+                 chat_latency_ms=300.0, chat_latency_per_token_ms=5.0,
+                 answer_tokens=120, classification=None, prompt_latency_per_token_ms=0.0):
+        self.embed_latency_ms = embed_latency_ms
+        self.embed_latency_per_input_ms = embed_latency_per_input_ms
+        self.chat_latency_ms = chat_latency_ms
+        self.chat_latency_per_token_ms = chat_latency_per_token_ms
+        # Prefill cost, charged only for prompt tokens not served from the prompt cache
+        self.prompt_latency_per_token_ms = prompt_latency_per_token_ms
+        self.answer_tokens = answer_tokens
+        self.classification = dict(classification or DEFAULT_CLASSIFICATION)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per call
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.rstrip("/")
+        if path.endswith("/embeddings"):
+            self._send_json(self.server.handle_embeddings(payload))
+        elif path.endswith("/chat/completions"):
+            self._send_json(self.server.handle_chat(payload))
+        else:
+            self._send_json({"error": {"message": f"Unknown path {self.path}"}}, status=404)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeOpenAIConfig()
+        self._stats_lock = threading.Lock()
+        self.stats = {"embedding_requests": 0, "embedding_inputs": 0, "chat_requests": 0,
+                      "prompt_tokens": 0, "cached_prompt_tokens": 0}
+        self._prompt_prefixes = set()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def handle_embeddings(self, payload):
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dim = int(payload.get("dimensions") or EMBEDDING_DIM)
+        self._count("embedding_requests")
+        self._count("embedding_inputs", len(inputs))
+        time.sleep((self.config.embed_latency_ms + self.config.embed_latency_per_input_ms * len(inputs)) / 1000)
+
+        data = []
+        for i, text in enumerate(inputs):
+            vec = deterministic_embedding(text, dim)
+            if payload.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vec.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vec.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(count_tokens(t) for t in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": payload.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    def reset_prompt_cache(self):
+        with self._stats_lock:
+            self._prompt_prefixes.clear()
+
+    def _cached_prompt_tokens(self, messages):
+        """Tokens of the longest 128-token-block prefix seen before (0 below 1024 tokens)"""
+        prompt = "".join(f"{m.get('role')}:{m.get('content')}\n" for m in messages)
+        block_chars = PROMPT_CACHE_BLOCK_TOKENS * 4
+        blocks = len(prompt) // block_chars
+        digest = hashlib.blake2b(digest_size=16)
+        cached = 0
+        with self._stats_lock:
+            for i in range(blocks):
+                digest.update(prompt[i * block_chars:(i + 1) * block_chars].encode("utf-8"))
+                key = digest.copy().hexdigest()
+                if key in self._prompt_prefixes and cached == i:
+                    cached = i + 1
+                self._prompt_prefixes.add(key)
+        cached_tokens = cached * PROMPT_CACHE_BLOCK_TOKENS
+        return cached_tokens if cached_tokens >= PROMPT_CACHE_MIN_TOKENS else 0
+
+    def handle_chat(self, payload):
+        self._count("chat_requests")
+        messages = payload.get("messages", [])
+        prompt_tokens = sum(count_tokens(m.get("content")) for m in messages)
+        cached_tokens = self._cached_prompt_tokens(messages) if prompt_tokens >= PROMPT_CACHE_MIN_TOKENS else 0
+        self._count("prompt_tokens", prompt_tokens)
+        self._count("cached_prompt_tokens", cached_tokens)
+
+        if payload.get("response_format", {}).get("type") in ("json_schema", "json_object"):
+            content = json.dumps(self.config.classification)
+        elif messages and "classifier" in (messages[0].get("content") or "").lower():
+            content = json.dumps(self.config.classification)
+        else:
+            words = ["Based", "on", "the", "provided", "context"] + ["detail"] * self.config.answer_tokens
+            limit = payload.get("max_tokens") or payload.get("max_completion_tokens") or len(words)
+            content = " ".join(words[:limit])
+        completion_tokens = count_tokens(content)
+
+        time.sleep((
+            self.config.chat_latency_ms
+            + self.config.chat_latency_per_token_ms * completion_tokens
+            + self.config.prompt_latency_per_token_ms * (prompt_tokens - cached_tokens)
+        ) / 1000)
+        return {
+            "id": f"chatcmpl-fake-{self.stats['chat_requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+
+def start_fake_server(port=0, config=None):
+    """Start the fake API on a background thread; returns the server (see .base_url)"""
+    server = FakeOpenAIServer(port=port, config=config)
+    thread = threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--chat-latency-per-token-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(
+        embed_latency_ms=args.embed_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        chat_latency_per_token_ms=args.chat_latency_per_token_ms
+    )
+    server = FakeOpenAIServer(port=args.port, config=config)
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic scraped-docs corpus in the same layout and schema the
+web scraper writes, so indexing and retrieval can be benchmarked at any size.
+
+Usage (from backend/):
+    python -m benchmarks.synthetic_corpus --pages 2000 --out /tmp/corpus
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+
+CONNECTORS = ["Snowflake", "Databricks", "BigQuery", "Redshift", "Tableau", "Looker", "dbt", "Postgres",
+              "MySQL", "Power BI", "Fivetran", "Airflow", "Kafka", "S3", "Glue", "Salesforce"]
+FEATURES = ["lineage", "glossary", "classification", "tags", "custom metadata", "README", "announcements",
+            "personas", "purposes", "policies", "SSO", "SAML", "SCIM", "webhooks", "search", "workflows"]
+ACTIONS = ["set up", "configure", "troubleshoot", "crawl", "mine query history for", "manage", "automate",
+           "govern", "certify", "export", "update", "secure"]
+FILLER = ("Atlan connects to your data estate and keeps metadata fresh. Administrators can schedule "
+          "crawlers, review run history and grant access through personas. Users browse assets, "
+          "follow lineage upstream and downstream, and collaborate on documentation. The SDK and "
+          "REST API expose the same operations for automation.").split()
+
+
+def _page(rng, section, i):
+    connector = rng.choice(CONNECTORS)
+    feature = rng.choice(FEATURES)
+    action = rng.choice(ACTIONS)
+    title = f"How to {action} {feature} for {connector}"
+    url = f"https://{section}.atlan.com/{feature.replace(' ', '-').lower()}/{connector.replace(' ', '-').lower()}/{i}"
+    body = [f"This guide explains how to {action} {feature} for {connector} in Atlan."]
+    for _ in range(rng.randint(8, 30)):
+        body.append(" ".join(rng.choices(FILLER, k=rng.randint(8, 20))) + ".")
+        if rng.random() < 0.3:
+            body.append(f"{connector} {feature} settings are available under the {action} tab.")
+    sections = [
+        {"level": 1, "text": title},
+        {"level": 2, "text": "Prerequisites"},
+        {"level": 2, "text": f"{action.capitalize()} {feature}"},
+        {"level": 2, "text": "Troubleshooting"},
+    ]
+    code_blocks = []
+    if section == "developer":
+        code_blocks.append(
+            f"client.asset.update_{feature.replace(' ', '_').lower()}(connector='{connector.lower()}', page={i})"
+        )
+    return {
+        "url": url,
+        "title": title,
+        "content": " ".join(body),
+        "sections": sections,
+        "code_blocks": code_blocks,
+        "links": []
+    }
+
+
+def generate_pages(n_pages, seed=42, section="docs"):
+    rng = random.Random(seed)
+    return [_page(rng, section, i) for i in range(n_pages)]
+
+
+def generate_corpus(out_dir, n_pages=500, seed=42, api_fraction=0.3):
+    """Write scraped_data/{product_docs,api_docs}/*.json under out_dir; returns all pages"""
+    out_dir = Path(out_dir)
+    n_api = int(n_pages * api_fraction)
+    product = generate_pages(n_pages - n_api, seed, "docs")
+    api = generate_pages(n_api, seed + 1, "developer")
+
+    for folder, name, pages in [
+        ("product_docs", "atlan_product_docs.json", product),
+        ("api_docs", "atlan_api_docs.json", api),
+    ]:
+        target = out_dir / "scraped_data" / folder
+        target.mkdir(parents=True, exist_ok=True)
+        with open(target / name, "w", encoding="utf-8") as f:
+            json.dump(pages, f, indent=2, ensure_ascii=False)
+    (out_dir / "data").mkdir(parents=True, exist_ok=True)
+    return product + api
+
+
+def sample_queries(pages, n, seed=7):
+    """Questions phrased from page titles; the page they came from is the expected answer"""
+    rng = random.Random(seed)
+    picked = [rng.choice(pages) for _ in range(n)]
+    return [(f"{p['title']}?", p["url"]) for p in picked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    pages = generate_corpus(args.out, args.pages, args.seed)
+    print(f"Wrote {len(pages)} synthetic pages under {args.out}/scraped_data")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Resumable bulk indexing for large knowledge bases.
+
+  1. Parse: sources are cut into batches of records (raw JSON lines for scraped
+     crawls) that a process pool decodes, turns into embedding text and splits
+     into chunks below the embedding model's input limit.
+  2. Embed: chunks are split into fixed-size shards that are embedded
+     concurrently through the shared rate limiter, in requests sized by
+     estimated tokens. Each finished shard is checkpointed to
+     vectorstore/.bulk_index/ and named after a hash of its contents, model
+     and dimensions.
+  3. Merge: shards are concatenated in order into the final FAISS index, which
+     is published like any other build (workers reload it).
+
+If a run dies part-way, rerunning the same command re-embeds only the shards
+that have no checkpoint yet. Embedding runs on threads in this process so that
+every call shares one rate limiter; parsing, the CPU-bound part, uses processes.
+
+Usage:
+    python bulk_index.py --parse-workers 8 --embed-workers 4
+    python bulk_index.py --restart          # discard checkpoints first
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+# Add current directory to path
+sys.path.append(str(Path(__file__).parent))
+
+# This process builds explicitly; importing the pipeline must not start a build of its own
+os.environ.setdefault("RAG_AUTO_BUILD", "false")
+
+import numpy as np
+
+from chunking import (CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, EMBED_BATCH_TOKENS, chunk_document,
+                      chunk_records, embedding_batches)
+from enhanced_rag_pipeline import rag_pipeline, EMBEDDING_MODEL
+from near_duplicates import NEAR_DUPLICATE_DISTANCE, collapse_near_duplicates
+from rate_limiter import BACKGROUND
+from scraped_store import iter_lines, loads
+
+PARSE_BATCH_RECORDS = 256
+SCRAPED_TYPES = ("product_docs", "api_docs")
+
+
+def parse_tasks(loader, batch_size=PARSE_BATCH_RECORDS):
+    """Batches of (doc_type, records) to parse; scraped JSON lines are left for the workers to decode"""
+    for path, doc_type in loader.list_sources():
+        if doc_type in SCRAPED_TYPES and not path.name.endswith(".json"):
+            records = iter_lines(path)
+        else:
+            # Single-document text sources, and legacy JSON arrays that can only be parsed whole
+            records = iter(loader.load_source((path, doc_type)))
+        while True:
+            batch = [record for _, record in zip(range(batch_size), records)]
+            if not batch:
+                break
+            yield doc_type, batch
+
+
+def parse_batch(loader, task, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Worker task: decode records, build their embedding text and split it into chunks"""
+    doc_type, records = task
+    documents = []
+    for record in records:
+        doc = loader.scraped_document(loads(record), doc_type) if isinstance(record, bytes) else record
+        text = loader.process_document(doc)
+        if text.strip():
+            doc["text"] = text
+            doc["chunks"] = chunk_document(doc, chunk_tokens, overlap_tokens)
+            documents.append(doc)
+    return documents
+
+
+def ordered_map(pool, fn, tasks, window):
+    """``pool.map`` that keeps at most ``window`` tasks in flight, so sources are read as parsing progresses"""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(fn, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def parse_documents(loader, workers=None, batch_size=PARSE_BATCH_RECORDS,
+                    chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """All documents in source order, each with its embedding ``text`` and ``chunks``"""
+    worker = partial(parse_batch, loader, chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    documents = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = 4 * (workers or os.cpu_count() or 1)
+        for batch in ordered_map(pool, worker, parse_tasks(loader, batch_size), window):
+            documents.extend(batch)
+    return documents
+
+
+def shard_key(chunks, dimensions):
+    """Content hash of a shard: a checkpoint is reused only for identical input"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{EMBEDDING_MODEL}:{dimensions}".encode("utf-8"))
+    for chunk in chunks:
+        digest.update(chunk["text"].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def embed_shard(chunks, dimensions, batch_tokens=EMBED_BATCH_TOKENS):
+    vectors = []
+    for batch in embedding_batches([chunk["text"] for chunk in chunks], batch_tokens):
+        vectors.extend(rag_pipeline.embed_texts(batch, priority=BACKGROUND, dimensions=dimensions))
+    return np.array(vectors, dtype="float32")
+
+
+def write_checkpoint(path, vectors, metadata):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"vectors": vectors, "docs": metadata}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shard-size", type=int, default=256, help="chunks per checkpointed shard")
+    parser.add_argument("--parse-workers", type=int, default=None, help="processes for parsing (default: CPU count)")
+    parser.add_argument("--embed-workers", type=int, default=4, help="shards embedded concurrently")
+    parser.add_argument("--chunk-tokens", type=int, default=CHUNK_TOKENS,
+                        help="estimated tokens per embedding input; longer documents are split")
+    parser.add_argument("--batch-tokens", type=int, default=EMBED_BATCH_TOKENS,
+                        help="estimated tokens per embeddings request")
+    parser.add_argument("--checkpoint-dir", default=None, help="default: <vectorstore>/.bulk_index")
+    parser.add_argument("--restart", action="store_true", help="discard existing checkpoints")
+    parser.add_argument("--keep-checkpoints", action="store_true", help="keep shards after publishing")
+    parser.add_argument("--no-faq", action="store_true", help="skip FAQ answer precomputation")
+    args = parser.parse_args()
+
+    checkpoint_dir = Path(args.checkpoint_dir or rag_pipeline.vectorstore_dir / ".bulk_index")
+    if args.restart and checkpoint_dir.exists():
+        shutil.rmtree(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    dimensions = rag_pipeline.embedding_dimensions
+
+    # Step 1: parse
+    start = time.perf_counter()
+    documents = parse_documents(rag_pipeline.data_loader, args.parse_workers, chunk_tokens=args.chunk_tokens)
+    if NEAR_DUPLICATE_DISTANCE >= 0:
+        documents, collapsed = collapse_near_duplicates(documents, NEAR_DUPLICATE_DISTANCE, text_key="content")
+        print(f"Collapsed {collapsed} near-duplicate documents")
+    if not documents:
+        print("❌ No documents found to index")
+        return False
+    chunks = chunk_records(documents)
+    print(f"Parsed {len(documents)} documents into {len(chunks)} chunks in {time.perf_counter() - start:.1f}s")
+
+    # Step 2: embed shards, reusing checkpoints
+    shards = [chunks[i:i + args.shard_size] for i in range(0, len(chunks), args.shard_size)]
+    paths = [checkpoint_dir / f"shard_{n:05d}_{shard_key(shard, dimensions)}.pkl" for n, shard in enumerate(shards)]
+    pending = [n for n, path in enumerate(paths) if not path.exists()]
+    print(f"{len(shards)} shards: {len(shards) - len(pending)} checkpointed, {len(pending)} to embed")
+
+    def run(n):
+        vectors = embed_shard(shards[n], dimensions, args.batch_tokens)
+        write_checkpoint(paths[n], vectors, shards[n])
+        return n
+
+    start = time.perf_counter()
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.embed_workers) as pool:
+        futures = {pool.submit(run, n): n for n in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            n = futures[future]
+            try:
+                future.result()
+                print(f"  shard {n + 1}/{len(shards)} embedded ({done}/{len(pending)})")
+            except Exception as e:
+                failed.append(n)
+                print(f"  ❌ shard {n + 1}/{len(shards)} failed: {e}")
+    if failed:
+        print(f"❌ {len(failed)} shards failed; rerun the same command to resume from the checkpoints")
+        return False
+    print(f"Embedded {len(pending)} shards in {time.perf_counter() - start:.1f}s")
+
+    # Step 3: merge into the final index and publish it
+    vectors, docs_metadata = [], []
+    for path in paths:
+        with open(path, "rb") as f:
+            shard = pickle.load(f)
+        vectors.append(shard["vectors"])
+        docs_metadata.extend(shard["docs"])
+    for i, doc in enumerate(docs_metadata):
+        doc["index"] = i
+    with rag_pipeline.build_lock():
+        rag_pipeline.install_index(documents, docs_metadata, np.concatenate(vectors))
+    print(f"✅ Published index version {rag_pipeline.index_version} with {len(docs_metadata)} chunks "
+          f"from {len(documents)} documents")
+
+    if not args.keep_checkpoints:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    if not args.no_faq:
+        from faq_answers import precompute_faq_answers
+        precompute_faq_answers(rag_pipeline)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,82 @@
+# chunking.py
+from rate_limiter import estimate_tokens
+
+# text-embedding-3 models take at most 8191 tokens per input. estimate_tokens assumes ~4
+# characters per token, and code or non-English text runs denser, hence the wide margin.
+CHUNK_TOKENS = 2000
+CHUNK_OVERLAP_TOKENS = 200
+# Per embeddings request: the API takes at most 2048 inputs and 300k tokens
+EMBED_BATCH_TOKENS = 100_000
+EMBED_BATCH_INPUTS = 2048
+
+
+def split_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Split text into pieces of at most ``max_tokens`` estimated tokens.
+
+    Pieces end at a paragraph, line or word break where there is one in the second half
+    of the window, and each piece repeats the last ``overlap_tokens`` of the previous one.
+    """
+    max_chars = max(4 * (max_tokens - 1), 1)
+    overlap_chars = min(4 * overlap_tokens, max_chars // 4)
+    pieces = []
+    start = 0
+    while True:
+        end = start + max_chars
+        if end >= len(text):
+            pieces.append(text[start:])
+            return pieces
+        for sep in ("\n\n", "\n", " "):
+            cut = text.rfind(sep, start + max_chars // 2, end)
+            if cut != -1:
+                end = cut + len(sep)
+                break
+        pieces.append(text[start:end])
+        start = end - overlap_chars
+        # Start the overlap on a word boundary too
+        space = text.find(" ", start, end)
+        if space != -1:
+            start = space + 1
+
+
+def chunk_document(doc, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Embedding inputs for one document: its text, split when longer than ``max_tokens``.
+
+    Pieces after the first repeat the title so they still say what they are about.
+    """
+    text = doc["text"]
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    header = f"Title: {doc['title']}\n\n" if doc.get("title") else ""
+    pieces = split_text(text, max_tokens - estimate_tokens(header), overlap_tokens)
+    return pieces[:1] + [header + piece for piece in pieces[1:]]
+
+
+def chunk_records(documents):
+    """One metadata record per embedding input; a chunk's text is what retrieval returns"""
+    chunks = []
+    for doc in documents:
+        for n, text in enumerate(doc.pop("chunks")):
+            chunks.append({
+                "text": text,
+                "source": doc.get("source", ""),
+                "title": doc.get("title", ""),
+                "type": doc.get("type", "unknown"),
+                "chunk": n,
+                # Listed once per document, not once per chunk
+                "duplicates": doc.get("duplicates", []) if n == 0 else []
+            })
+    return chunks
+
+
+def embedding_batches(texts, max_tokens=EMBED_BATCH_TOKENS, max_inputs=EMBED_BATCH_INPUTS):
+    """Group texts into embeddings requests of at most ``max_tokens`` estimated tokens"""
+    batch, batch_tokens = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
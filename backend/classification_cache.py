@@ -0,0 +1,104 @@
+# classification_cache.py
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def normalize_ticket(text: str) -> str:
+    """Normalize ticket text so trivially different resubmissions share a cache key"""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+class ClassificationCache:
+    """LRU + TTL cache for classification results with single-flight dedup.
+
+    Identical tickets that arrive while a classification is already running
+    wait for that call instead of issuing their own LLM request.
+    """
+
+    def __init__(self, max_size=2048, ttl_seconds=3600):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._in_flight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "errors": 0}
+
+    def get_or_compute(self, text: str, compute, cacheable=None):
+        """Return the cached result for text, or run compute(text) exactly once per key.
+
+        ``cacheable(result)`` can veto storing a result (e.g. a parse-failure fallback);
+        coalesced waiters still share it.
+        """
+        key = normalize_ticket(text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return dict(result)
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                owner = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self.stats["misses"] += 1
+                owner = True
+
+        if not owner:
+            return dict(future.result())
+
+        try:
+            result = compute(text)
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                self.stats["errors"] += 1
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if cacheable is None or cacheable(result):
+                self._entries[key] = (time.monotonic() + self.ttl, dict(result))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+            self._in_flight.pop(key, None)
+        future.set_result(result)
+        return dict(result)
+
+    def peek(self, text: str):
+        """Cached result for text without computing or counting a lookup, if any"""
+        key = normalize_ticket(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return dict(entry[1])
+        return None
+
+    def clear(self):
+        """Drop all cached results (in-flight calls are left to finish)"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Cache size and hit/miss/coalesced counters"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "in_flight": len(self._in_flight),
+                "hit_rate": round((self.stats["hits"] + self.stats["coalesced"]) / lookups, 3) if lookups else 0.0,
+            }
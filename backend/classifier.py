@@ -1,12 +1,95 @@
 # classifier.py
-import os, json
-from openai import OpenAI
+import os, json, re, threading, time
+from openai_client import get_client
+from classification_cache import ClassificationCache
+from rate_limiter import scheduler, estimate_tokens
+from metrics import record_usage
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+TOPICS = ["How-to", "Product", "API/SDK", "SSO", "Connector", "Lineage", "Glossary", "Best practices", "Sensitive data"]
+SENTIMENTS = ["Frustrated", "Curious", "Angry", "Neutral"]
+PRIORITIES = ["P0", "P1", "P2"]
+# Topics /rag answers from the knowledge base; other topics are routed to a team
+RAG_TOPICS = ["How-to", "Product", "API/SDK", "SSO", "Best practices"]
 
-def classify_ticket(text: str):
-    """Classify ticket into topic, sentiment, and priority."""
-    messages = [
+# Cheap pre-classification for admission control, before the LLM classification has run.
+# Only explicit urgency counts: words like "prod", "down" or "blocked" also appear in everyday
+# how-to questions ("connect to prod", "downstream", "blocked domains") and would hand them P0 slots.
+URGENT_PATTERN = re.compile(
+    r"\b(urgent(ly)?|asap|emergency|outage|sev ?[01]|p0|data loss|immediately"
+    r"|(production|prod|atlan|everything|site|service|instance)( is| are)? (down|broken|unavailable)"
+    r"|(is|are|went|has gone|have gone) down|completely (blocked|broken)|critical (issue|bug|incident))\b",
+    re.IGNORECASE)
+QUESTION_PATTERN = re.compile(r"^\s*(how (do|can|to)|what|where|is there|can i|does)\b", re.IGNORECASE)
+
+FALLBACK_CLASSIFICATION = {"topic": "Unknown", "sentiment": "Neutral", "priority": "P2"}
+
+# "compact" uses structured outputs constrained to the label enums; "legacy" is the free-form JSON prompt
+CLASSIFIER_MODE = os.getenv("CLASSIFIER_MODE", "compact")
+COMPACT_MAX_TOKENS = int(os.getenv("CLASSIFIER_MAX_TOKENS", "40"))
+
+CLASSIFICATION_SCHEMA = {
+    "name": "ticket_classification",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "topic": {"type": "string", "enum": TOPICS},
+            "sentiment": {"type": "string", "enum": SENTIMENTS},
+            "priority": {"type": "string", "enum": PRIORITIES}
+        },
+        "required": ["topic", "sentiment", "priority"],
+        "additionalProperties": False
+    }
+}
+
+# Resubmitted tickets (and the same ticket hitting /classify and /rag) reuse one result
+classification_cache = ClassificationCache(
+    max_size=int(os.getenv("CLASSIFIER_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("CLASSIFIER_CACHE_TTL", "3600"))
+)
+
+
+class ClassifierStats:
+    """Per-mode counters for parse failures, token usage and latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = {}
+
+    def record(self, mode, latency, usage=None, parse_failed=False):
+        with self._lock:
+            m = self._modes.setdefault(mode, {
+                "calls": 0, "parse_failures": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "total_latency": 0.0
+            })
+            m["calls"] += 1
+            m["total_latency"] += latency
+            if parse_failed:
+                m["parse_failures"] += 1
+            if usage is not None:
+                m["prompt_tokens"] += usage.prompt_tokens or 0
+                m["completion_tokens"] += usage.completion_tokens or 0
+
+    def summary(self):
+        with self._lock:
+            out = {}
+            for mode, m in self._modes.items():
+                calls = m["calls"] or 1
+                out[mode] = {
+                    "calls": m["calls"],
+                    "parse_failures": m["parse_failures"],
+                    "parse_failure_rate": round(m["parse_failures"] / calls, 4),
+                    "avg_prompt_tokens": round(m["prompt_tokens"] / calls, 1),
+                    "avg_completion_tokens": round(m["completion_tokens"] / calls, 1),
+                    "avg_latency_ms": round(1000 * m["total_latency"] / calls, 1)
+                }
+            return out
+
+classifier_stats = ClassifierStats()
+
+
+def _legacy_messages(text: str):
+    return [
         {
             "role": "system",
             "content": (
@@ -20,14 +103,86 @@ def classify_ticket(text: str):
         {"role": "user", "content": f"Ticket: {text}"}
     ]
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.0
-    )
+def _compact_messages(text: str):
+    # The label sets live in the JSON schema, so the prompt only needs the priority meaning
+    return [
+        {
+            "role": "system",
+            "content": "Classify the support ticket. Priority: P0=urgent/blocking, P1=important, P2=low."
+        },
+        {"role": "user", "content": text}
+    ]
 
+def _parse_classification(content: str, mode: str):
+    """Parse the model output; returns None when it is not a usable classification."""
     try:
-        parsed = json.loads(resp.choices[0].message.content)
-    except:
-        parsed = {"topic": "Unknown", "sentiment": "Neutral", "priority": "P2"}
+        parsed = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(parsed, dict):
+        return None
+    if mode == "compact" and (
+        parsed.get("topic") not in TOPICS
+        or parsed.get("sentiment") not in SENTIMENTS
+        or parsed.get("priority") not in PRIORITIES
+    ):
+        return None
     return parsed
+
+def _classify_uncached(text: str, mode=None):
+    """Call the LLM to classify a single ticket."""
+    mode = mode or CLASSIFIER_MODE
+    if mode == "compact":
+        request = {
+            "messages": _compact_messages(text),
+            "response_format": {"type": "json_schema", "json_schema": CLASSIFICATION_SCHEMA},
+            "max_tokens": COMPACT_MAX_TOKENS
+        }
+    else:
+        request = {"messages": _legacy_messages(text)}
+
+    start = time.perf_counter()
+    resp = scheduler.call(
+        "chat",
+        lambda: get_client().chat.completions.create(
+            model="gpt-4o-mini",
+            temperature=0.0,
+            **request
+        ),
+        estimated_tokens=estimate_tokens([m["content"] for m in request["messages"]]) + request.get("max_tokens", 100)
+    )
+    latency = time.perf_counter() - start
+    record_usage("chat", getattr(resp, "usage", None))
+
+    parsed = _parse_classification(resp.choices[0].message.content, mode)
+    classifier_stats.record(mode, latency, getattr(resp, "usage", None), parse_failed=parsed is None)
+    if parsed is None:
+        parsed = dict(FALLBACK_CLASSIFICATION)
+    return parsed
+
+def classify_ticket(text: str):
+    """Classify ticket into topic, sentiment, and priority."""
+    return classification_cache.get_or_compute(
+        text,
+        _classify_uncached,
+        cacheable=lambda result: result != FALLBACK_CLASSIFICATION
+    )
+
+def pre_classify_priority(text: str) -> str:
+    """Priority guess without an LLM call: the cached classification if any, else keywords"""
+    cached = classification_cache.peek(text)
+    if cached is not None:
+        return cached["priority"]
+    if URGENT_PATTERN.search(text or ""):
+        return "P0"
+    if QUESTION_PATTERN.search(text or ""):
+        return "P2"
+    return "P1"
+
+def get_classifier_stats():
+    """Cache counters plus per-mode parse-failure rate and token usage"""
+    return {
+        "mode": CLASSIFIER_MODE,
+        "cache": classification_cache.get_stats(),
+        "calls": classifier_stats.summary()
+    }
@@ -0,0 +1,229 @@
+# conversation_state.py
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from classifier import URGENT_PATTERN
+from faq_answers import normalize_question, question_tokens
+from metrics import record_usage, stage_timer
+from openai_client import get_client
+from rate_limiter import scheduler, estimate_tokens
+
+# Server-side state for multi-turn chat, keyed by the client's session_id: recent turns,
+# the last classification and the last retrieved chunks, so follow-ups are rewritten into
+# standalone questions, and turns that name nothing new skip classification, embedding and search.
+SESSIONS_ENABLED = os.getenv("RAG_SESSIONS", "true").lower() == "true"
+SESSION_IDLE_SECONDS = float(os.getenv("RAG_SESSION_IDLE_SECONDS", "1800"))
+SESSION_MAX_MB = float(os.getenv("RAG_SESSION_MAX_MB", "64"))  # per process, all sessions together
+SESSION_MAX_TURNS = int(os.getenv("RAG_SESSION_MAX_TURNS", "6"))
+FOLLOWUP_REWRITE = os.getenv("RAG_FOLLOWUP_REWRITE", "heuristic")  # heuristic | llm | off
+
+# Openers that only make sense relative to an earlier turn. Pronouns and short messages are
+# not enough: "How do I grant the Snowflake connector the permissions it needs?" is a new question.
+FOLLOWUP_PATTERN = re.compile(
+    r"^\s*(and|also|what about|how about|then|so|but|same|why|ok(ay)?)\b", re.IGNORECASE)
+# Words that ask for more of the same answer without naming anything new
+CONTINUATION_WORDS = {
+    "more", "detail", "details", "detailed", "explain", "elaborate", "tell", "again", "example",
+    "examples", "else", "further", "expand", "continue", "go", "thanks", "thank", "clarify",
+    "about", "why", "so", "also", "then", "but", "ok", "okay", "same", "those", "these",
+    "they", "them", "its", "above", "previous", "step", "steps", "mean",
+}
+
+REWRITE_PROMPT = """Rewrite the user's last message as a single standalone question about Atlan that can be understood without the conversation. Keep product names and technical terms. Respond with the question only."""
+
+
+class Session:
+    """One conversation: recent turns plus the retrieval of the latest answered turn"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.turns = deque(maxlen=SESSION_MAX_TURNS)  # {"query", "standalone", "answer"}
+        self.topic = None  # last question that stood on its own; follow-ups are read against it
+        self.analysis = None
+        self.index_version = None
+        self.retrieved = None
+        self.distances = None
+        self.updated = time.monotonic()
+        self.nbytes = 0
+
+    def estimate_bytes(self):
+        size = 512
+        for doc in self.retrieved or []:
+            size += len(doc.get("text", "")) + 128
+        for turn in self.turns:
+            size += sum(len(v or "") for v in turn.values())
+        size += len(self.topic or "")
+        return size
+
+
+class ConversationStore:
+    """Sessions in LRU order, evicted when idle too long or when over the memory cap"""
+
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS, max_bytes=int(SESSION_MAX_MB * 1024 * 1024)):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "created": 0, "turns": 0, "follow_ups": 0, "rewritten": 0, "classification_reused": 0,
+            "retrieval_reused": 0, "evicted_idle": 0, "evicted_memory": 0,
+        }
+
+    def _evict(self, now):
+        # Oldest first: stop at the first session that is neither idle nor over the cap
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.updated > self.idle_seconds:
+                self.stats["evicted_idle"] += 1
+            elif self._bytes > self.max_bytes:
+                self.stats["evicted_memory"] += 1
+            else:
+                break
+            del self._sessions[session_id]
+            self._bytes -= session.nbytes
+
+    def get(self, session_id):
+        """The live session for session_id, created on first use"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id)
+                self.stats["created"] += 1
+            self._sessions.move_to_end(session_id)
+            session.updated = now
+            return session
+
+    def update(self, session, query, standalone, answer, analysis=None, index_version=None, retrieval=None):
+        """Record a finished turn; a turn answered without retrieval (FAQ) clears the cached chunks"""
+        session.turns.append({"query": query, "standalone": standalone, "answer": answer})
+        if standalone == query or session.topic is None:
+            session.topic = standalone
+        if analysis is not None:
+            session.analysis = analysis
+        session.index_version = index_version
+        session.retrieved, session.distances = retrieval if retrieval is not None else (None, None)
+        with self._lock:
+            self.stats["turns"] += 1
+            size = session.estimate_bytes()
+            if session.session_id in self._sessions:
+                self._bytes += size - session.nbytes
+            session.nbytes = size
+            self._evict(time.monotonic())
+
+    def is_continuation(self, session, query):
+        """A turn that names nothing new: "explain that in more detail", or the same question again"""
+        if not session.turns:
+            return False
+        if normalize_question(query) == normalize_question(session.turns[-1]["query"]):
+            return True
+        return not (question_tokens(query) - CONTINUATION_WORDS)
+
+    def is_follow_up(self, session, query):
+        """A turn that refers back to the conversation rather than standing on its own"""
+        if not session.turns:
+            return False
+        return self.is_continuation(session, query) or bool(FOLLOWUP_PATTERN.search(query))
+
+    def rewrite(self, session, query):
+        """(standalone query, is_follow_up) for a new turn"""
+        if not self.is_follow_up(session, query):
+            return query, False
+        with self._lock:
+            self.stats["follow_ups"] += 1
+        if FOLLOWUP_REWRITE == "off":
+            return query, True
+        if FOLLOWUP_REWRITE == "llm":
+            try:
+                standalone = llm_rewrite(session, query)
+                with self._lock:
+                    self.stats["rewritten"] += 1
+                return standalone, True
+            except Exception as e:
+                print(f"Follow-up rewrite failed, using heuristic: {e}")
+        # A turn naming something new ("what about Snowflake?") is searched on its own terms;
+        # appending the old topic would pull the search back to the previous subject
+        if not self.is_continuation(session, query):
+            return query, True
+        with self._lock:
+            self.stats["rewritten"] += 1
+        return f"{query} (context: {session.topic})", True
+
+    def reusable_retrieval(self, session, text, index_version):
+        """The previous turn's retrieval when the new turn names nothing new, else None"""
+        if session.retrieved is None or session.index_version != index_version:
+            return None
+        if not self.is_continuation(session, text):
+            return None
+        with self._lock:
+            self.stats["retrieval_reused"] += 1
+        return session.retrieved, session.distances
+
+    def retrieve(self, pipeline, session, text, query, top_k=3):
+        """(retrieved, distances) for a turn: the session's chunks for continuations, else a fresh search.
+
+        ``text`` is the message as typed, ``query`` its standalone rewrite.
+        """
+        reused = self.reusable_retrieval(session, text, pipeline.index_version)
+        if reused is not None:
+            return reused
+        return pipeline.retrieve(query, top_k)
+
+    def reuse_classification(self, session, text):
+        """Continuations inherit the conversation's classification unless they sound urgent.
+
+        Any turn naming something new is classified again, follow-up or not.
+        """
+        if session.analysis is None or not self.is_continuation(session, text) or URGENT_PATTERN.search(text):
+            return None
+        with self._lock:
+            self.stats["classification_reused"] += 1
+        return dict(session.analysis)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "enabled": SESSIONS_ENABLED,
+                "active": len(self._sessions),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "idle_seconds": self.idle_seconds,
+                "rewrite": FOLLOWUP_REWRITE,
+            }
+
+
+def llm_rewrite(session, query):
+    """Condense the recent turns plus a follow-up into one standalone question"""
+    history = "\n".join(
+        f"User: {turn['query']}\nAssistant: {(turn['answer'] or '')[:500]}" for turn in session.turns)
+    messages = [
+        {"role": "system", "content": REWRITE_PROMPT},
+        {"role": "user", "content": f"Conversation:\n{history}\n\nLast message: {query}"},
+    ]
+    start = time.perf_counter()
+    with stage_timer("rewrite"):
+        resp = scheduler.call(
+            "chat",
+            lambda: get_client().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0,
+                max_tokens=100
+            ),
+            estimated_tokens=estimate_tokens([m["content"] for m in messages]) + 100
+        )
+    record_usage("chat", resp.usage, seconds=time.perf_counter() - start)
+    return resp.choices[0].message.content.strip() or query
+
+
+# Global instance
+conversations = ConversationStore()
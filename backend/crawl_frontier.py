@@ -0,0 +1,115 @@
+# crawl_frontier.py
+import heapq
+import itertools
+import math
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Score weights: a page budget goes to deep, recently changed, sitemap-listed content first
+SITEMAP_BONUS = 0.5       # listed in sitemap.xml (the site's own list of canonical pages)
+CHANGED_BONUS = 1.0       # never crawled, or sitemap lastmod newer than our last fetch
+UNCHANGED_PENALTY = -1.0  # lastmod not newer than our last fetch: previous copy is still good
+FRESHNESS_HALF_LIFE_DAYS = 180
+MAX_DEPTH_BONUS = 4       # path segments beyond this stop adding priority
+NAV_PENALTY = -1.5        # listing/navigation pages: tags, categories, pagination, search
+VERSIONED_PENALTY = -1.0  # versioned copies (/v2/, /1.4/) are usually near-duplicates of the current page
+
+NAV_PATTERNS = re.compile(r"/(tags?|categor(y|ies)|page/\d+|search|archive|authors?)(/|$)", re.IGNORECASE)
+VERSIONED_PATTERNS = re.compile(r"/(v\d+(\.\d+)*|\d+\.\d+(\.\d+)?)(/|$)", re.IGNORECASE)
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a sitemap W3C datetime ("2024-05-01" or full ISO 8601) as aware UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_sitemap(xml_bytes: bytes) -> Tuple[List[Dict[str, Optional[str]]], List[str]]:
+    """Return (pages, child sitemaps) from a <urlset> or <sitemapindex> document"""
+    root = ET.fromstring(xml_bytes)
+    pages, children = [], []
+    for node in root:
+        # Drop the sitemap namespace: {http://www.sitemaps.org/schemas/sitemap/0.9}url -> url
+        tag = node.tag.rsplit("}", 1)[-1]
+        fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in node}
+        if not fields.get("loc"):
+            continue
+        if tag == "sitemap":
+            children.append(fields["loc"])
+        elif tag == "url":
+            pages.append({"url": fields["loc"], "lastmod": fields.get("lastmod") or None})
+    return pages, children
+
+
+def url_depth(url: str) -> int:
+    return len([part for part in urlparse(url).path.split("/") if part])
+
+
+class CrawlFrontier:
+    """Priority queue of URLs to fetch, highest score first.
+
+    ``state`` maps URL -> {"lastmod": ...} from the previous crawl, so pages whose
+    sitemap lastmod has not moved since then sink below new and changed ones.
+    """
+
+    def __init__(self, state: Optional[Dict[str, Dict]] = None, now: Optional[datetime] = None):
+        self.state = state or {}
+        self.now = now or datetime.now(timezone.utc)
+        self._heap = []
+        self._counter = itertools.count()
+        self.seen = set()
+        self.lastmod = {}
+        self.sitemap_urls = set()
+
+    def score(self, url: str, lastmod: Optional[str] = None, in_sitemap=False) -> float:
+        parsed = urlparse(url)
+        score = min(url_depth(url), MAX_DEPTH_BONUS) / MAX_DEPTH_BONUS
+        if NAV_PATTERNS.search(parsed.path) or parsed.query:
+            score += NAV_PENALTY
+        if VERSIONED_PATTERNS.search(parsed.path):
+            score += VERSIONED_PENALTY
+        if in_sitemap:
+            score += SITEMAP_BONUS
+
+        modified = parse_lastmod(lastmod)
+        if modified is not None:
+            age_days = max((self.now - modified).total_seconds() / 86400, 0.0)
+            score += math.exp(-age_days * math.log(2) / FRESHNESS_HALF_LIFE_DAYS)
+
+        previous = self.state.get(url)
+        if previous is None:
+            score += CHANGED_BONUS
+        elif modified is not None:
+            last_seen = parse_lastmod(previous.get("lastmod"))
+            score += CHANGED_BONUS if last_seen is None or modified > last_seen else UNCHANGED_PENALTY
+        return score
+
+    def push(self, url: str, lastmod: Optional[str] = None, in_sitemap=False, boost=0.0) -> bool:
+        """Queue a URL once; returns False if it was already queued"""
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        if lastmod:
+            self.lastmod[url] = lastmod
+        if in_sitemap:
+            self.sitemap_urls.add(url)
+        score = self.score(url, lastmod, in_sitemap) + boost
+        # Counter keeps FIFO order among equal scores (discovery order, like the old BFS)
+        heapq.heappush(self._heap, (-score, next(self._counter), url))
+        return True
+
+    def pop(self) -> str:
+        return heapq.heappop(self._heap)[2]
+
+    def __len__(self):
+        return len(self._heap)
@@ -1,13 +1,10 @@
 # data_loader.py
 import os, pickle, faiss, numpy as np
-from openai import OpenAI
+from openai_client import get_client
+from rate_limiter import scheduler, estimate_tokens, BACKGROUND
 from dotenv import load_dotenv
 load_dotenv()
 
-# Initialize OpenAI client
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI()
-
 # 1. Chunk text into smaller parts
 def chunk_text(text, chunk_size=40, overlap=10):
     words = text.split()
@@ -35,9 +32,14 @@ def load_txt_files(folder="./data"):
 
 # 3. Create embeddings with OpenAI
 def embed_text(text: str):
-    resp = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
+    resp = scheduler.call(
+        "embeddings",
+        lambda: get_client().embeddings.create(
+            model="text-embedding-3-small",
+            input=text
+        ),
+        estimated_tokens=estimate_tokens(text),
+        priority=BACKGROUND
     )
     return resp.data[0].embedding
 
@@ -1,88 +1,110 @@
 import os
 import json
+import tempfile
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import re
 
+from scraped_store import find_scraped_file, iter_records
+
+# Parallel loading: "thread" suits I/O-bound corpora, "process" spreads JSON parsing across cores
+LOADER_EXECUTOR = os.getenv("LOADER_EXECUTOR", "thread")
+LOADER_WORKERS = int(os.getenv("LOADER_WORKERS", "0")) or None
+
 class EnhancedDataLoader:
-    def __init__(self, data_dir="data", scraped_dir="scraped_data"):
+    def __init__(self, data_dir="data", scraped_dir="scraped_data", uploads_dir="uploads", catalog_path=None):
         self.data_dir = Path(data_dir)
         self.scraped_dir = Path(scraped_dir)
+        self.uploads_dir = Path(uploads_dir)
         self.data_dir.mkdir(exist_ok=True)
         self.scraped_dir.mkdir(exist_ok=True)
+        # Optional per-source stats keyed by file signature, so stats never re-parse unchanged
+        # files. Without a catalog_path nothing is written next to the source data.
+        self.catalog_path = Path(catalog_path) if catalog_path else None
         
     def load_existing_data(self) -> List[Dict[str, Any]]:
         """Load existing data from data directory"""
         documents = []
-        
-        # Load snowflake.txt
-        snowflake_file = self.data_dir / "snowflake.txt"
-        if snowflake_file.exists():
-            with open(snowflake_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                documents.append({
-                    'source': 'snowflake.txt',
-                    'content': content,
-                    'type': 'existing_data'
-                })
-        
+        for task in self._existing_sources():
+            documents.extend(self.load_source(task))
         return documents
     
     def load_scraped_data(self) -> List[Dict[str, Any]]:
         """Load scraped data from scraped_data directory"""
         documents = []
-        
-        # Load product docs
-        product_file = self.scraped_dir / "product_docs" / "atlan_product_docs.json"
-        if product_file.exists():
-            with open(product_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data:
-                    documents.append({
-                        'source': f"product_docs/{item['url']}",
-                        'content': item['content'],
-                        'title': item['title'],
-                        'sections': item.get('sections', []),
-                        'code_blocks': item.get('code_blocks', []),
-                        'type': 'product_docs'
-                    })
-        
-        # Load API docs
-        api_file = self.scraped_dir / "api_docs" / "atlan_api_docs.json"
-        if api_file.exists():
-            with open(api_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data:
-                    documents.append({
-                        'source': f"api_docs/{item['url']}",
-                        'content': item['content'],
-                        'title': item['title'],
-                        'sections': item.get('sections', []),
-                        'code_blocks': item.get('code_blocks', []),
-                        'type': 'api_docs'
-                    })
-        
+        for task in self._scraped_sources():
+            documents.extend(self.load_source(task))
         return documents
     
-    def load_uploaded_files(self, uploads_dir="uploads") -> List[Dict[str, Any]]:
+    def load_uploaded_files(self, uploads_dir=None) -> List[Dict[str, Any]]:
         """Load uploaded files from uploads directory"""
         documents = []
-        uploads_path = Path(uploads_dir)
-        
-        if uploads_path.exists():
-            for file_path in uploads_path.glob("*"):
-                if file_path.is_file():
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            documents.append({
-                                'source': f"uploaded/{file_path.name}",
-                                'content': content,
-                                'type': 'uploaded_file'
-                            })
-                    except Exception as e:
-                        print(f"Error loading uploaded file {file_path}: {e}")
-        
+        for task in self._uploaded_sources(uploads_dir):
+            documents.extend(self.load_source(task))
+        return documents
+
+    # ---- Source discovery: each source is (path, type) and is loaded independently ----
+
+    def _existing_sources(self) -> List[Tuple[Path, str]]:
+        snowflake_file = self.data_dir / "snowflake.txt"
+        return [(snowflake_file, 'existing_data')] if snowflake_file.exists() else []
+
+    def _scraped_sources(self) -> List[Tuple[Path, str]]:
+        sources = []
+        for doc_type, name in [('product_docs', 'atlan_product_docs'), ('api_docs', 'atlan_api_docs')]:
+            path = find_scraped_file(self.scraped_dir / doc_type, name)
+            if path is not None:
+                sources.append((path, doc_type))
+        return sources
+
+    def _uploaded_sources(self, uploads_dir=None) -> List[Tuple[Path, str]]:
+        uploads_path = Path(uploads_dir) if uploads_dir else self.uploads_dir
+        if not uploads_path.exists():
+            return []
+        return [(p, 'uploaded_file') for p in sorted(uploads_path.glob("*")) if p.is_file()]
+
+    def list_sources(self) -> List[Tuple[Path, str]]:
+        """All source files in load order"""
+        return self._existing_sources() + self._scraped_sources() + self._uploaded_sources()
+
+    def load_source(self, task: Tuple[Path, str]) -> List[Dict[str, Any]]:
+        """Load the raw documents contained in one source file"""
+        path, doc_type = task
+        if doc_type == 'existing_data':
+            with open(path, 'r', encoding='utf-8') as f:
+                return [{'source': path.name, 'content': f.read(), 'type': doc_type}]
+
+        if doc_type == 'uploaded_file':
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return [{'source': f"uploaded/{path.name}", 'content': f.read(), 'type': doc_type}]
+            except Exception as e:
+                print(f"Error loading uploaded file {path}: {e}")
+                return []
+
+        return [self.scraped_document(item, doc_type) for item in iter_records(path)]
+
+    @staticmethod
+    def scraped_document(item: Dict[str, Any], doc_type: str) -> Dict[str, Any]:
+        """Raw document for one scraped page record"""
+        return {
+            'source': f"{doc_type}/{item['url']}",
+            'content': item['content'],
+            'title': item['title'],
+            'sections': item.get('sections', []),
+            'code_blocks': item.get('code_blocks', []),
+            'type': doc_type
+        }
+
+    def _load_and_process(self, task: Tuple[Path, str]) -> List[Dict[str, Any]]:
+        """Worker task: load one source and attach the embedding text to each document"""
+        documents = []
+        for doc in self.load_source(task):
+            text = self.process_document(doc)
+            if text.strip():
+                doc['text'] = text
+                documents.append(doc)
         return documents
     
     def process_document(self, doc: Dict[str, Any]) -> str:
@@ -124,54 +146,102 @@ class EnhancedDataLoader:
         
         return "\n\n".join(content_parts)
     
+    def iter_documents(self, max_workers=LOADER_WORKERS, executor=LOADER_EXECUTOR) -> Iterator[Dict[str, Any]]:
+        """Yield processed documents (raw fields plus 'text'), loading sources in parallel.
+
+        Sources are read and processed on a thread or process pool and yielded in source
+        order as they complete. The document catalog, if any, is refreshed along the way.
+        """
+        tasks = self.list_sources()
+        if not tasks:
+            return
+        pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        seen = {}
+        with pool_cls(max_workers=max_workers) as pool:
+            for task, documents in zip(tasks, pool.map(self._load_and_process, tasks)):
+                seen[str(task[0])] = self._catalog_entry(task, documents)
+                yield from documents
+        self._write_catalog(seen)
+
     def get_all_documents(self) -> List[str]:
         """Get all documents as processed text for embedding"""
-        all_docs = []
-        
-        # Load existing data
-        existing_docs = self.load_existing_data()
-        all_docs.extend(existing_docs)
-        
-        # Load scraped data
-        scraped_docs = self.load_scraped_data()
-        all_docs.extend(scraped_docs)
-        
-        # Load uploaded files
-        uploaded_docs = self.load_uploaded_files()
-        all_docs.extend(uploaded_docs)
-        
-        # Process all documents
-        processed_docs = []
-        for doc in all_docs:
-            processed_text = self.process_document(doc)
-            if processed_text.strip():
-                processed_docs.append(processed_text)
-        
-        return processed_docs
-    
+        return [doc['text'] for doc in self.iter_documents()]
+
+    # ---- Document catalog ----
+
+    @staticmethod
+    def _signature(path: Path) -> List[int]:
+        stat = path.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _catalog_entry(self, task: Tuple[Path, str], documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        path, doc_type = task
+        return {
+            'signature': self._signature(path),
+            'type': doc_type,
+            'count': len(documents),
+            'content_length': sum(len(d.get('content', '')) for d in documents),
+            'sources': [d['source'] for d in documents if d.get('source')]
+        }
+
+    def _read_catalog(self) -> Dict[str, Any]:
+        if self.catalog_path is None:
+            return {}
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_catalog(self, catalog: Dict[str, Any]):
+        if self.catalog_path is None:
+            return
+        # A temp file of our own: several loaders (workers, benchmarks) may write at once
+        self.catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.catalog_path.parent,
+                                         prefix=self.catalog_path.name, suffix='.tmp', delete=False) as f:
+            json.dump(catalog, f)
+        try:
+            os.replace(f.name, self.catalog_path)
+        except OSError:
+            os.unlink(f.name)
+            raise
+
     def get_document_stats(self) -> Dict[str, Any]:
-        """Get statistics about loaded documents"""
-        all_docs = []
-        all_docs.extend(self.load_existing_data())
-        all_docs.extend(self.load_scraped_data())
-        all_docs.extend(self.load_uploaded_files())
+        """Get statistics about loaded documents (from the catalog; only changed files are re-read)"""
+        tasks = self.list_sources()
+        catalog = self._read_catalog()
+        entries = {}
+        stale = []
+        for task in tasks:
+            entry = catalog.get(str(task[0]))
+            if entry and entry['signature'] == self._signature(task[0]):
+                entries[str(task[0])] = entry
+            else:
+                stale.append(task)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=LOADER_WORKERS) as pool:
+                for task, documents in zip(stale, pool.map(self.load_source, stale)):
+                    entries[str(task[0])] = self._catalog_entry(task, documents)
+        if stale or set(catalog) != set(entries):
+            self._write_catalog(entries)
         
         stats = {
-            'total_documents': len(all_docs),
+            'total_documents': 0,
             'by_type': {},
             'total_content_length': 0,
             'sources': []
         }
         
-        for doc in all_docs:
-            doc_type = doc.get('type', 'unknown')
-            stats['by_type'][doc_type] = stats['by_type'].get(doc_type, 0) + 1
-            
-            content_length = len(doc.get('content', ''))
-            stats['total_content_length'] += content_length
-            
-            if doc.get('source'):
-                stats['sources'].append(doc['source'])
+        for task in tasks:
+            entry = entries[str(task[0])]
+            if not entry['count']:
+                continue
+            stats['total_documents'] += entry['count']
+            stats['by_type'][entry['type']] = stats['by_type'].get(entry['type'], 0) + entry['count']
+            stats['total_content_length'] += entry['content_length']
+            stats['sources'].extend(entry['sources'])
         
         return stats
 
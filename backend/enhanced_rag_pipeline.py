@@ -1,134 +1,508 @@
 # enhanced_rag_pipeline.py
 import numpy as np
 import pickle
+import json
 import faiss
 import os
-from openai import OpenAI
+import socket
+import time
+import threading
+from contextlib import contextmanager
+from openai_client import get_client
 from pathlib import Path
 from enhanced_data_loader import EnhancedDataLoader
+from query_batcher import QueryBatcher
+from score_gate import (
+    SCORE_GATING, SCORE_THRESHOLD, OFF_TOPIC_QUERIES, calibration_probes, calibrate_threshold, score_gate_decisions
+)
+from near_duplicates import NEAR_DUPLICATE_DISTANCE, collapse_near_duplicates
+from chunking import chunk_document, chunk_records, embedding_batches
+from vector_index import create_faiss_index, rescore_search, describe_index_type
+from index_snapshot import SNAPSHOT_PATH, SnapshotError, import_snapshot
+from model_router import (
+    choose_route, fallback_route, primary_budget, with_deadline, estimate_cost, estimate_abandoned_cost,
+    route_stats, DeadlineExceeded
+)
+from rate_limiter import scheduler, estimate_tokens, INTERACTIVE, BACKGROUND
+from metrics import stage_timer, observe_stage, record_usage, current_trace, index_stage_seconds
 
 # Load API key from environment
 from dotenv import load_dotenv
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
 
-# Initialize OpenAI client
-client = OpenAI(api_key=api_key)
+# Query micro-batching: concurrent /rag requests share one embeddings call + one FAISS search
+QUERY_BATCHING = os.getenv("RAG_QUERY_BATCHING", "true").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("RAG_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("RAG_BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_IN_FLIGHT = int(os.getenv("RAG_BATCH_MAX_IN_FLIGHT", "4"))  # batches embedded concurrently
+
+# Build the index on import when none exists (disable for benchmarks or externally managed indexes)
+AUTO_BUILD = os.getenv("RAG_AUTO_BUILD", "true").lower() == "true"
+
+# Multi-process serving: "standalone" loads and builds in-process (default), "indexer" owns
+# building, "worker" opens the published index read-only through mmap and never builds on startup
+ROLE = os.getenv("RAG_ROLE", "standalone")
+MMAP_INDEX = os.getenv("RAG_MMAP_INDEX", "true" if ROLE == "worker" else "false").lower() == "true"
+VERSION_CHECK_SECONDS = float(os.getenv("RAG_VERSION_CHECK_SECONDS", "2"))
+BUILD_LOCK_STALE_SECONDS = float(os.getenv("RAG_BUILD_LOCK_STALE_SECONDS", "3600"))
+
+# Compressed storage: index type (flat | fp16 | sq8 | pq), Matryoshka-truncated embedding
+# dimensions, and exact rescoring of top_k * RAG_RESCORE_FACTOR candidates from vectors.npy
+EMBEDDING_MODEL = "text-embedding-3-small"
+INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+EMBED_DIMENSIONS = int(os.getenv("RAG_EMBED_DIMENSIONS", "0")) or None
+RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "0"))
+PQ_SUBQUANTIZERS = int(os.getenv("RAG_PQ_M", "64"))
+
+# Answer prompt layout: "ranked" keeps context chunks in retrieval-score order; "stable"
+# reorders them by document for provider prompt-cache reuse, which changes what the model
+# reads first, so deployments opt in after checking answer quality
+PROMPT_LAYOUT = os.getenv("RAG_PROMPT_LAYOUT", "ranked")
+
+ANSWER_SYSTEM_PROMPT = """You are Atlan's AI support assistant. Your role is to help users with questions about Atlan's products, APIs, and services.
+
+Guidelines:
+- Use ONLY the context provided to answer questions
+- Always cite sources when providing information
+- If the context doesn't contain enough information, say so clearly
+- Be helpful, accurate, and professional
+- For technical questions, provide specific details and examples when available
+- If asked about features not in the context, suggest contacting Atlan support
+
+Context information may include:
+- Product documentation
+- API/SDK documentation  
+- User guides and tutorials
+- Code examples
+- Configuration instructions"""
+
+# IO_FLAG_MMAP alone still copies flat codes into RAM; IO_FLAG_MMAP_IFC (faiss >= 1.10) maps them too
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+
+
+LOW_CONFIDENCE_ANSWER = ("I couldn't find documentation relevant to this question, "
+                         "so it has been routed to the support team.")
+TRUNCATED_ANSWER = "I couldn't put together a full answer in time. These documents cover your question:"
+
+
+class IndexBuildInProgress(RuntimeError):
+    """Another process holds the vectorstore build lock"""
+
+
+class IndexReadOnly(RuntimeError):
+    """This process serves a shared read-only index and must not build one"""
+
 
 class EnhancedRAGPipeline:
-    def __init__(self, vectorstore_dir="vectorstore"):
+    def __init__(self, vectorstore_dir="vectorstore", query_batching=QUERY_BATCHING):
         self.vectorstore_dir = Path(vectorstore_dir)
         self.vectorstore_dir.mkdir(exist_ok=True)
         self.index_path = self.vectorstore_dir / "index.faiss"
         self.meta_path = self.vectorstore_dir / "meta.pkl"
-        self.data_loader = EnhancedDataLoader()
+        self.vectors_path = self.vectorstore_dir / "vectors.npy"
+        self.config_path = self.vectorstore_dir / "index_config.json"
+        self.version_path = self.vectorstore_dir / "VERSION"
+        self.lock_path = self.vectorstore_dir / ".build.lock"
+        # The document catalog is generated state, so it lives with the index, not the sources
+        self.data_loader = EnhancedDataLoader(catalog_path=self.vectorstore_dir / ".doc_catalog.json")
         self.index = None
         self.docs = None
+        self.index_version = None
+        self.index_config = {}
+        # Settings used for the next build; queries follow the loaded index's index_config
+        self.index_type = INDEX_TYPE
+        self.embedding_dimensions = EMBED_DIMENSIONS
+        self.rescore_factor = RESCORE_FACTOR
+        self.full_vectors = None
+        self.mmap_index = MMAP_INDEX
+        self.gate_stats = {"answered": 0, "skipped": 0}
+        self._gate_lock = threading.Lock()
+        self._last_version_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.batcher = None
+        if query_batching:
+            self.batcher = QueryBatcher(
+                self.embed_queries,
+                self.search_vectors,
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait_ms=BATCH_MAX_WAIT_MS,
+                max_in_flight=BATCH_MAX_IN_FLIGHT
+            )
         
-    def embed_text(self, text: str):
+    @property
+    def query_dimensions(self):
+        """Embedding dimensions queries must use to match the loaded index"""
+        return self.index_config.get("embedding_dimensions", self.embedding_dimensions)
+
+    def embed_text(self, text: str, priority=INTERACTIVE, dimensions=None):
         """Generate embedding for text using OpenAI"""
-        resp = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
+        return self.embed_texts([text], priority, dimensions)[0]
+
+    def embed_texts(self, texts, priority=INTERACTIVE, dimensions=None):
+        """Generate embeddings for several texts with a single OpenAI call.
+
+        ``dimensions`` truncates text-embedding-3 output (Matryoshka); None keeps the full size.
+        """
+        texts = list(texts)
+        resp = scheduler.call(
+            "embeddings",
+            lambda: get_client().embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=texts,
+                **({"dimensions": dimensions} if dimensions else {})
+            ),
+            estimated_tokens=estimate_tokens(texts),
+            priority=priority
         )
-        return resp.data[0].embedding
+        record_usage("embeddings", resp.usage)
+        # The API may return items out of order; sort by their input index
+        return [item.embedding for item in sorted(resp.data, key=lambda d: d.index)]
+
+    def embed_queries(self, queries):
+        """Embed queries into a normalized float32 matrix ready for search"""
+        qvecs = np.array(self.embed_texts(queries, dimensions=self.query_dimensions)).astype("float32")
+        faiss.normalize_L2(qvecs)
+        return qvecs
+
+    def search_vectors(self, qvecs, top_k=3):
+        """Run one FAISS search over a matrix of normalized query vectors"""
+        if self.full_vectors is not None and self.rescore_factor > 1:
+            return rescore_search(self.index, self.full_vectors, qvecs, top_k, self.rescore_factor)
+        return self.index.search(qvecs, top_k)
     
-    def load_index(self):
-        """Load existing FAISS index and metadata"""
+    def load_index(self, mmap=None):
+        """Load existing FAISS index and metadata (memory-mapped read-only when mmap is set)"""
+        mmap = self.mmap_index if mmap is None else mmap
+        self._last_version_check = time.monotonic()
         if self.index_path.exists() and self.meta_path.exists():
-            self.index = faiss.read_index(str(self.index_path))
+            # Read the version first: if a publish races with us we load newer files
+            # under an older version and simply reload once more on the next check
+            version = self.read_version()
+            index = faiss.read_index(str(self.index_path), MMAP_FLAGS if mmap else 0)
             with open(self.meta_path, "rb") as f:
-                self.docs = pickle.load(f)
-            print(f"Loaded existing index with {len(self.docs)} documents")
+                docs = pickle.load(f)
+            config = self.read_index_config()
+            # Full-precision vectors for rescoring stay on disk; only candidate rows are paged in
+            full_vectors = np.load(self.vectors_path, mmap_mode="r") if self.vectors_path.exists() else None
+            self.index, self.docs, self.full_vectors = index, docs, full_vectors
+            self.index_config = config
+            self.index_version = version
+            print(f"Loaded existing index with {len(self.docs)} documents"
+                  f" (version {version}{', mmap' if mmap else ''})")
         else:
             print("No existing index found, will create new one")
             self.index = None
             self.docs = []
+
+    def read_index_config(self):
+        """Settings the stored index was built with (empty for indexes that predate the file)"""
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def read_version(self):
+        """Version string of the most recently published index, if any"""
+        try:
+            return self.version_path.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish_version(self, version=None):
+        """Atomically bump the version file so other processes reload the new index"""
+        version = version or str(time.time_ns())
+        tmp_path = self.version_path.with_name(self.version_path.name + ".tmp")
+        tmp_path.write_text(version, encoding="utf-8")
+        os.replace(tmp_path, self.version_path)
+        self.index_version = version
+        return version
+
+    def maybe_reload(self):
+        """Reload the index when another process published a new version (checked at most every few seconds)"""
+        now = time.monotonic()
+        if now - self._last_version_check < VERSION_CHECK_SECONDS:
+            return False
+        self._last_version_check = now
+        version = self.read_version()
+        if version is None or version == self.index_version:
+            return False
+        with self._reload_lock:
+            if version == self.index_version:
+                return False
+            print(f"Index version changed ({self.index_version} -> {version}), reloading")
+            self.load_index()
+            return True
+
+    def _lock_is_stale(self):
+        """(stale, reason) for an existing build lock.
+
+        A lock is stale when its owner was a process on this host that no longer runs
+        (a crashed builder), or when it is older than RAG_BUILD_LOCK_STALE_SECONDS.
+        """
+        try:
+            age = time.time() - self.lock_path.stat().st_mtime
+            owner = self.lock_path.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return True, "already removed"
+        pid, _, host = owner.partition("@")
+        if host == socket.gethostname() and pid.isdigit():
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return True, f"owner pid {pid} is gone"
+            except PermissionError:
+                pass  # alive, owned by another user
+        if age >= BUILD_LOCK_STALE_SECONDS:
+            return True, f"{age:.0f}s old"
+        return False, None
+
+    @contextmanager
+    def build_lock(self):
+        """Cross-process lock so only one process builds the index at a time"""
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            stale, reason = self._lock_is_stale()
+            if not stale:
+                raise IndexBuildInProgress("Another process is already building the index")
+            print(f"Removing stale build lock ({reason})")
+            self.lock_path.unlink(missing_ok=True)
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        try:
+            os.write(fd, f"{os.getpid()}@{socket.gethostname()}".encode())
+            os.close(fd)
+            yield
+        finally:
+            self.lock_path.unlink(missing_ok=True)
+
+    def save_index(self, index, docs_metadata, vectors=None, extra_config=None):
+        """Write index + metadata via temp files and atomic renames, then publish a new version.
+
+        ``vectors`` (full precision) are kept alongside compressed indexes for exact rescoring.
+        Processes that memory-mapped the previous files keep reading them until they reload.
+        """
+        def tmp(path):
+            return path.with_name(path.name + ".tmp")
+
+        faiss.write_index(index, str(tmp(self.index_path)))
+        with open(tmp(self.meta_path), "wb") as f:
+            pickle.dump(docs_metadata, f)
+        config = {
+            "index_type": describe_index_type(index),
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_dimensions": self.embedding_dimensions,
+            "dimension": index.d,
+            "count": index.ntotal,
+            "has_full_vectors": vectors is not None,
+            "duplicates_collapsed": sum(len(doc.get("duplicates", [])) for doc in docs_metadata),
+            **(extra_config or {})
+        }
+        with open(tmp(self.config_path), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        if vectors is not None:
+            with open(tmp(self.vectors_path), "wb") as f:
+                np.save(f, np.ascontiguousarray(vectors, dtype="float32"))
+
+        os.replace(tmp(self.index_path), self.index_path)
+        os.replace(tmp(self.meta_path), self.meta_path)
+        os.replace(tmp(self.config_path), self.config_path)
+        self.index_config = config
+        if vectors is not None:
+            os.replace(tmp(self.vectors_path), self.vectors_path)
+            self.full_vectors = np.load(self.vectors_path, mmap_mode="r")
+        else:
+            self.vectors_path.unlink(missing_ok=True)
+            self.full_vectors = None
+        return self.publish_version()
     
     def build_index(self, force_rebuild=False):
         """Build or rebuild the FAISS index with all available data"""
         if not force_rebuild and self.index is not None:
             print("Index already exists, skipping rebuild")
             return
+        if ROLE == "worker":
+            # A build here would leave this worker on a private in-RAM copy instead of the shared mapping
+            raise IndexReadOnly("Workers serve the shared index read-only; rebuild it from the indexer "
+                                "(python bulk_index.py or python serve.py --rebuild)")
         
+        with self.build_lock():
+            self._build_index()
+
+    def _build_index(self):
         print("Building FAISS index...")
         
         # Get all documents
-        documents = self.data_loader.get_all_documents()
+        with stage_timer("load_documents", index_stage_seconds):
+            documents = list(self.data_loader.iter_documents())
         print(f"Found {len(documents)} documents to index")
         
+        if NEAR_DUPLICATE_DISTANCE >= 0:
+            # Near-identical pages would waste embeddings and crowd top-k with copies
+            with stage_timer("dedup", index_stage_seconds):
+                # Compare page bodies: the embedding text also carries the (always unique) source
+                documents, collapsed = collapse_near_duplicates(documents, NEAR_DUPLICATE_DISTANCE, text_key="content")
+            if collapsed:
+                print(f"Collapsed {collapsed} near-duplicate documents, {len(documents)} left")
+        
         if not documents:
             print("No documents found to index")
             return
         
-        # Generate embeddings
-        print("Generating embeddings...")
+        # Pages over the embedding model's input limit are split into chunks
+        for doc in documents:
+            doc["chunks"] = chunk_document(doc)
+        chunks = chunk_records(documents)
+        
+        # Generate embeddings, in requests sized by estimated tokens
+        print(f"Generating embeddings for {len(chunks)} chunks...")
         embeddings = []
         docs_metadata = []
+        embed_start = time.perf_counter()
         
-        for i, doc_text in enumerate(documents):
-            if i % 10 == 0:
-                print(f"Processing document {i+1}/{len(documents)}")
-            
+        start = 0
+        for batch in embedding_batches([chunk["text"] for chunk in chunks]):
+            batch_chunks = chunks[start:start + len(batch)]
+            start += len(batch)
+            print(f"Processing chunks {start - len(batch) + 1}-{start}/{len(chunks)}")
             try:
-                embedding = self.embed_text(doc_text)
-                embeddings.append(embedding)
-                
-                # Create metadata for this document
-                doc_metadata = {
-                    'text': doc_text,
-                    'source': f'document_{i}',
-                    'index': i
-                }
-                docs_metadata.append(doc_metadata)
-                
-            except Exception as e:
-                print(f"Error processing document {i}: {e}")
+                embeddings.extend(self.embed_texts(batch, priority=BACKGROUND, dimensions=self.embedding_dimensions))
+                docs_metadata.extend(batch_chunks)
                 continue
+            except Exception as e:
+                print(f"Error embedding chunks {start - len(batch) + 1}-{start}: {e}; retrying one by one")
+            # Skip only the chunks that fail on their own
+            for chunk in batch_chunks:
+                try:
+                    embeddings.append(self.embed_text(chunk["text"], priority=BACKGROUND,
+                                                      dimensions=self.embedding_dimensions))
+                    docs_metadata.append(chunk)
+                except Exception as e:
+                    print(f"Error processing {chunk['source']} chunk {chunk['chunk']}: {e}")
+        
+        for i, chunk in enumerate(docs_metadata):
+            chunk["index"] = i
+        
+        index_stage_seconds.observe(time.perf_counter() - embed_start, stage="embed")
         
         if not embeddings:
             print("No valid embeddings generated")
             return
         
-        # Create FAISS index
+        self.install_index(documents, docs_metadata, embeddings)
+    
+    def install_index(self, documents, docs_metadata, embeddings):
+        """Build the FAISS index over embedded documents, calibrate score gating, save and publish.
+
+        Callers hold ``build_lock``; ``documents`` are the raw loaded documents (used for calibration).
+        """
         print("Creating FAISS index...")
-        dimension = len(embeddings[0])
-        self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-        
-        # Normalize embeddings for cosine similarity
-        embeddings_array = np.array(embeddings).astype("float32")
-        faiss.normalize_L2(embeddings_array)
+        with stage_timer("build", index_stage_seconds):
+            # Normalize embeddings for cosine similarity
+            embeddings_array = np.array(embeddings).astype("float32")
+            faiss.normalize_L2(embeddings_array)
+            
+            # Inner product index, optionally compressed (RAG_INDEX_TYPE)
+            self.index = create_faiss_index(embeddings_array, self.index_type, PQ_SUBQUANTIZERS)
+            # Compressed indexes are rescored against the full vectors (save_index maps the saved copy)
+            compressed = self.index_type != "flat"
+            self.full_vectors = embeddings_array if compressed else None
         
-        # Add embeddings to index
-        self.index.add(embeddings_array)
+        extra_config = {}
+        if SCORE_GATING and SCORE_THRESHOLD is None:
+            with stage_timer("calibrate", index_stage_seconds):
+                extra_config = self._calibrate_score_gate(documents)
         
         # Save index and metadata
-        faiss.write_index(self.index, str(self.index_path))
-        with open(self.meta_path, "wb") as f:
-            pickle.dump(docs_metadata, f)
+        with stage_timer("persist", index_stage_seconds):
+            self.save_index(self.index, docs_metadata, embeddings_array if compressed else None, extra_config)
         
         self.docs = docs_metadata
         print(f"Index built successfully with {len(docs_metadata)} documents")
     
+    def _calibrate_score_gate(self, documents):
+        """Gating threshold for this build from in-domain vs off-topic probe score distributions.
+
+        Probes are scored through ``search_vectors``, the path serving uses, so compressed
+        indexes are calibrated on the same (approximate or rescored) scores the gate will see.
+        """
+        probes = calibration_probes(documents)
+        if not probes:
+            return {}
+        try:
+            qvecs = np.array(self.embed_texts(
+                probes + OFF_TOPIC_QUERIES, priority=BACKGROUND, dimensions=self.embedding_dimensions
+            )).astype("float32")
+        except Exception as e:
+            print(f"Score gate calibration failed, gating disabled for this index: {e}")
+            return {}
+        faiss.normalize_L2(qvecs)
+        top_scores = self.search_vectors(qvecs, 1)[0][:, 0]
+        calibration = calibrate_threshold(top_scores[:len(probes)], top_scores[len(probes):])
+        print(f"Score gate threshold {calibration['score_threshold']} ({calibration['score_calibration']})")
+        return calibration
+    
+    @property
+    def score_threshold(self):
+        """Minimum top retrieval score to call the chat model (None: always call it)"""
+        if not SCORE_GATING:
+            return None
+        if SCORE_THRESHOLD is not None:
+            return SCORE_THRESHOLD
+        return self.index_config.get("score_threshold")
+    
     def retrieve(self, query: str, top_k=3):
         """Retrieve top-k similar docs from FAISS index"""
+        self.maybe_reload()
         if self.index is None or self.docs is None:
             raise ValueError("Index not loaded. Call load_index() first.")
         
-        qvec = np.array([self.embed_text(query)]).astype("float32")
-        faiss.normalize_L2(qvec)  # Normalize query vector
-        
-        distances, indices = self.index.search(qvec, top_k)
+        if self.batcher is not None:
+            start = time.perf_counter()
+            future = self.batcher.submit(query, top_k)
+            _, distances, indices = future.result()
+            elapsed = time.perf_counter() - start
+            # The batcher observed the shared embed/search once; only this request's trace gets them
+            trace = current_trace()
+            if trace is not None:
+                trace.merge(future.timings, future.tokens)
+            observe_stage("batch_wait", max(0.0, elapsed - sum(future.timings.values())))
+        else:
+            with stage_timer("embed"):
+                qvecs = self.embed_queries([query])
+            with stage_timer("search"):
+                distances, indices = self.search_vectors(qvecs, top_k)
+            distances, indices = distances[0], indices[0]
         
-        results = []
-        for idx in indices[0]:
-            if idx < len(self.docs):
-                results.append(self.docs[idx])
+        return [self.docs[idx] for idx in indices if 0 <= idx < len(self.docs)], distances
+    
+    def build_answer_messages(self, query: str, retrieved):
+        """Chat messages for an answer, laid out according to RAG_PROMPT_LAYOUT"""
+        if PROMPT_LAYOUT == "stable":
+            # Fixed system prompt, then chunks in document order, question last: queries that
+            # retrieve overlapping documents share a byte-identical prefix the provider can cache
+            chunks = sorted(retrieved, key=lambda r: r.get("index", 0))
+            context = "\n\n".join(f"{r['text']}\n[source: {r['source']}]" for r in chunks)
+            return [
+                {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Context:\n{context}"},
+                {"role": "user", "content": f"Question: {query}"}
+            ]
         
-        return results, distances[0]
+        # "ranked": chunks in retrieval-score order inside one user message
+        context = "\n\n".join(f"{r['text']}\n[source: {r['source']}]" for r in retrieved)
+        return [
+            {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"}
+        ]
     
-    def generate_answer(self, query: str, top_k=3):
-        """Full RAG pipeline: retrieve docs + generate grounded answer"""
+    def generate_answer(self, query: str, top_k=3, priority=INTERACTIVE, retrieval=None, analysis=None):
+        """Full RAG pipeline: retrieve docs + generate grounded answer.
+
+        ``retrieval`` is an already computed (retrieved, distances) pair, e.g. reused by a conversation;
+        ``analysis`` (the ticket classification) feeds model routing.
+        """
+        self.maybe_reload()
         if self.index is None or self.docs is None:
             return {
                 "query": query,
@@ -139,7 +513,8 @@ class EnhancedRAGPipeline:
             }
         
         try:
-            retrieved, distances = self.retrieve(query, top_k)
+            retrieved, distances = retrieval if retrieval is not None else self.retrieve(query, top_k)
+            distances = np.asarray(distances)
             
             if not retrieved:
                 return {
@@ -150,56 +525,42 @@ class EnhancedRAGPipeline:
                     "distances": []
                 }
             
-            # Build context string for LLM
-            context = "\n\n".join(
-                [f"{r['text']}\n[source: {r['source']}]" for r in retrieved]
-            )
+            # Nothing relevant retrieved: skip the chat completion and route to support
+            threshold = self.score_threshold
+            if threshold is not None:
+                confident = float(distances[0]) >= threshold
+                score_gate_decisions.inc(decision="answer" if confident else "skip")
+                with self._gate_lock:
+                    self.gate_stats["answered" if confident else "skipped"] += 1
+                if not confident:
+                    return {
+                        "query": query,
+                        "answer": LOW_CONFIDENCE_ANSWER,
+                        "sources": [],
+                        "retrieved": retrieved,
+                        "distances": distances.tolist(),
+                        "low_confidence": True
+                    }
             
-            # Enhanced prompt template
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are Atlan's AI support assistant. Your role is to help users with questions about Atlan's products, APIs, and services.
-
-Guidelines:
-- Use ONLY the context provided to answer questions
-- Always cite sources when providing information
-- If the context doesn't contain enough information, say so clearly
-- Be helpful, accurate, and professional
-- For technical questions, provide specific details and examples when available
-- If asked about features not in the context, suggest contacting Atlan support
-
-Context information may include:
-- Product documentation
-- API/SDK documentation  
-- User guides and tutorials
-- Code examples
-- Configuration instructions"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Context:\n{context}\n\nQuestion: {query}"
-                }
-            ]
-            
-            # Call OpenAI chat model
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.1,
-                max_tokens=1000
-            )
-            
-            answer = resp.choices[0].message.content
+            messages = self.build_answer_messages(query, retrieved)
+            route = choose_route(query, analysis, float(distances[0]), threshold)
+            answer, outcome = self._generate_routed(messages, route, priority)
             sources = list({r["source"] for r in retrieved})  # deduplicate sources
+            if answer is None:
+                # Out of time even for the fallback: point at the documents instead
+                answer = TRUNCATED_ANSWER + "\n" + "\n".join(f"- {source}" for source in sources)
             
-            return {
+            result = {
                 "query": query,
                 "answer": answer,
                 "sources": sources,
                 "retrieved": retrieved,
-                "distances": distances.tolist()
+                "distances": distances.tolist(),
+                "route": route["name"]
             }
+            if outcome != "ok":
+                result["degraded"] = outcome
+            return result
             
         except Exception as e:
             print(f"Error in RAG pipeline: {e}")
@@ -211,6 +572,87 @@ Context information may include:
                 "distances": []
             }
     
+    def _generate_routed(self, messages, route, priority):
+        """(answer, outcome) from the route's model within its deadline.
+
+        Outcome is "ok", "fallback" (primary missed its share of the deadline, a faster
+        model answered) or "truncated" (no answer in time; answer is None).
+        """
+        start = time.monotonic()
+        # Background work (FAQ precomputation) has no user waiting on it. The deadline starts
+        # now, not when the call leaves the rate-limit queue: the user is already waiting.
+        deadline = route["deadline"] if priority == INTERACTIVE else None
+        deadline_at = start + deadline if deadline else None
+        prompt_tokens = estimate_tokens([m["content"] for m in messages])
+        cost = 0.0
+
+        def abandoned(e, call_route):
+            # A request that reached the API is billed even though we stopped waiting for it
+            if not e.sent:
+                return 0.0
+            return estimate_abandoned_cost(call_route["model"], prompt_tokens, call_route["max_tokens"]) or 0.0
+
+        try:
+            try:
+                primary_at = start + primary_budget(deadline) if deadline else None
+                resp = self._chat(messages, route, primary_at, priority)
+                outcome = "ok"
+            except DeadlineExceeded as e:
+                print(f"Route {route['name']} missed its deadline, falling back")
+                cost += abandoned(e, route)
+                fallback = fallback_route(route)
+                try:
+                    resp = self._chat(messages, fallback, deadline_at, priority)
+                    outcome = "fallback"
+                except DeadlineExceeded as e:
+                    cost += abandoned(e, fallback)
+                    resp, outcome = None, "truncated"
+                else:
+                    route = {**route, "model": fallback["model"]}
+        except Exception:
+            route_stats.record(route["name"], "error", time.monotonic() - start, cost)
+            raise
+        if resp is not None:
+            cost += estimate_cost(route["model"], resp.usage) or 0.0
+        route_stats.record(route["name"], outcome, time.monotonic() - start, cost)
+        return (resp.choices[0].message.content if resp is not None else None), outcome
+    
+    def _chat(self, messages, route, deadline_at, priority):
+        """One answer call (queued behind the shared rate limiter rather than failing on 429)"""
+        start = time.perf_counter()
+        with stage_timer("generate"):
+            resp = scheduler.call(
+                "chat",
+                with_deadline(
+                    lambda timeout: get_client().chat.completions.create(
+                        model=route["model"],
+                        messages=messages,
+                        temperature=0.1,
+                        max_tokens=route["max_tokens"],
+                        **({"timeout": timeout} if timeout is not None else {})
+                    ),
+                    deadline_at,
+                    time.monotonic
+                ),
+                estimated_tokens=estimate_tokens([m["content"] for m in messages]) + route["max_tokens"],
+                priority=priority,
+                deadline_at=deadline_at
+            )
+        record_usage("chat", resp.usage, seconds=time.perf_counter() - start)
+        return resp
+    
+    def get_gate_stats(self):
+        """Score gating threshold and how often it skipped the chat model"""
+        with self._gate_lock:
+            gate_stats = dict(self.gate_stats)
+        checked = gate_stats["answered"] + gate_stats["skipped"]
+        return {
+            "threshold": self.score_threshold,
+            **gate_stats,
+            "skip_rate": round(gate_stats["skipped"] / checked, 3) if checked else 0.0,
+            "calibration": self.index_config.get("score_calibration")
+        }
+    
     def get_stats(self):
         """Get statistics about the current index"""
         if self.docs is None:
@@ -219,7 +661,16 @@ Context information may include:
         return {
             "total_documents": len(self.docs),
             "index_loaded": self.index is not None,
-            "vectorstore_dir": str(self.vectorstore_dir)
+            "vectorstore_dir": str(self.vectorstore_dir),
+            "index_version": self.index_version,
+            "index_type": self.index_config.get("index_type", "flat"),
+            "embedding_dimensions": self.query_dimensions,
+            "rescoring": self.full_vectors is not None and self.rescore_factor > 1,
+            "duplicates_collapsed": self.index_config.get("duplicates_collapsed", 0),
+            "score_gate": self.get_gate_stats(),
+            "role": ROLE,
+            "mmap": self.mmap_index,
+            "query_batching": self.batcher.get_stats() if self.batcher else None
         }
 
 # Global instance
@@ -230,8 +681,10 @@ def generate_answer(query: str, top_k=3):
     return rag_pipeline.generate_answer(query, top_k)
 
 def rebuild_index():
-    """Rebuild the index with all available data"""
+    """Rebuild the index with all available data, then refresh precomputed FAQ answers"""
     rag_pipeline.build_index(force_rebuild=True)
+    from faq_answers import schedule_precompute
+    schedule_precompute(rag_pipeline)
 
 def load_index():
     """Load the existing index"""
@@ -259,6 +712,17 @@ if __name__ == "__main__":
 else:
     # Auto-load index when module is imported
     rag_pipeline.load_index()
-    if rag_pipeline.index is None:
+    if SNAPSHOT_PATH and ROLE != "worker":
+        # A prebuilt snapshot replaces rebuilding (and re-embedding) on a fresh replica
+        try:
+            import_snapshot(rag_pipeline, SNAPSHOT_PATH)
+        except (SnapshotError, IndexBuildInProgress) as e:
+            print(f"Could not import snapshot {SNAPSHOT_PATH}: {e}")
+    if rag_pipeline.index is None and ROLE == "worker":
+        print("Worker started without an index; it will load one once the indexer publishes it")
+    elif rag_pipeline.index is None and AUTO_BUILD:
         print("No existing index found, building new one...")
-        rag_pipeline.build_index()
+        try:
+            rag_pipeline.build_index()
+        except IndexBuildInProgress:
+            print("Another process is building the index; it will be loaded once published")
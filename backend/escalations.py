@@ -0,0 +1,76 @@
+# escalations.py
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from metrics import registry, Counter
+
+# Tickets handed to a human: P0 tickets classified by the LLM, and tickets that looked urgent
+# when admission control shed them under load. The log is shared by every worker process and
+# read back by GET /escalations; it is rotated at RAG_ESCALATION_LOG_MAX_MB (one previous file kept).
+ESCALATION_LOG_PATH = os.getenv("RAG_ESCALATION_LOG", "vectorstore/escalations.jsonl")
+ESCALATION_LOG_MAX_BYTES = int(float(os.getenv("RAG_ESCALATION_LOG_MAX_MB", "16")) * 1024 * 1024)
+
+escalations_total = registry.register(Counter(
+    "rag_escalations_total", "Tickets escalated to a human support agent", ["reason"]))
+
+
+class EscalationLog:
+    """Append-only JSON lines record of escalated tickets"""
+
+    def __init__(self, path=ESCALATION_LOG_PATH, max_bytes=ESCALATION_LOG_MAX_BYTES):
+        self.path = Path(path)
+        self.rotated_path = self.path.with_name(self.path.name + ".1")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "failed": 0}
+
+    def record(self, text, reason, analysis=None):
+        """Log one escalated ticket; returns False when it could not be written"""
+        escalations_total.inc(reason=reason)
+        entry = {"ts": int(time.time()), "reason": reason, "text": text, "analysis": analysis}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if self.path.stat().st_size >= self.max_bytes:
+                    os.replace(self.path, self.rotated_path)
+            except FileNotFoundError:
+                pass
+            # Single small O_APPEND writes stay whole when several workers log at once
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"⚠️ Could not record escalation ({reason}): {e} -- ticket: {text[:200]}")
+            with self._lock:
+                self.stats["failed"] += 1
+            return False
+        with self._lock:
+            self.stats["recorded"] += 1
+        return True
+
+    def recent(self, limit=50):
+        """Most recent escalations, newest first"""
+        entries = deque(maxlen=limit)
+        for path in (self.rotated_path, self.path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entries.append(json.loads(line))
+                        except ValueError:
+                            continue
+            except FileNotFoundError:
+                continue
+        return list(reversed(entries))
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+# Global instance
+escalation_log = EscalationLog()
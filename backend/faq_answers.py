@@ -0,0 +1,287 @@
+# faq_answers.py
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+from classification_cache import ClassificationCache
+from classifier import classify_ticket, RAG_TOPICS
+from rate_limiter import BACKGROUND
+
+# Precomputed answers for the head of the question distribution, served by /rag without
+# classification, retrieval or generation. A table is only served for the index version
+# it was generated against.
+FAQ_ANSWERS = os.getenv("FAQ_ANSWERS", "true").lower() == "true"
+FAQ_QUESTIONS_PATH = os.getenv("FAQ_QUESTIONS_PATH", "data/faq_questions.txt")
+FAQ_MIN_COUNT = int(os.getenv("FAQ_MIN_COUNT", "3"))            # asks before a logged question is mined
+FAQ_MAX_ENTRIES = int(os.getenv("FAQ_MAX_ENTRIES", "200"))
+FAQ_LOG_WINDOW = int(os.getenv("FAQ_LOG_WINDOW", "50000"))      # most recent logged questions mined
+# Logging /rag questions for mining is opt-in: ticket text may contain customer data. The log
+# is rotated once it reaches FAQ_LOG_MAX_MB, keeping one previous file, so at most twice that.
+FAQ_QUESTION_LOG = os.getenv("FAQ_QUESTION_LOG", "false").lower() == "true"
+FAQ_LOG_MAX_BYTES = int(float(os.getenv("FAQ_LOG_MAX_MB", "16")) * 1024 * 1024)
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.85"))  # token-set Jaccard for near matches
+FAQ_CHECK_SECONDS = float(os.getenv("FAQ_CHECK_SECONDS", "2"))
+
+# Identical questions in flight at the same time share one generate_answer call;
+# a positive TTL also reuses finished answers for that long (per index version)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "0"))
+
+# Words dropped for near-exact matching ("how does atlan connect with snowflake" ==
+# "how does atlan connect to snowflake"). Negations are deliberately kept.
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "i", "we", "you", "my", "our",
+    "me", "it", "to", "with", "in", "on", "for", "of", "from", "into", "and", "or", "can", "please",
+    "how", "what", "there", "way", "any", "some", "this", "that",
+}
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def question_tokens(text: str) -> frozenset:
+    return frozenset(t for t in _WORD_RE.findall((text or "").lower()) if t not in STOPWORDS)
+
+
+def load_configured_questions(path=FAQ_QUESTIONS_PATH):
+    """Questions from the FAQ file, one per line (blank lines and # comments skipped)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+class FAQStore:
+    """Precomputed answer table plus the question log it is mined from.
+
+    The table is a JSON file next to the index, so every worker process serves
+    the same answers and picks up a new table when the file changes.
+    """
+
+    def __init__(self, vectorstore_dir="vectorstore", log_questions=FAQ_QUESTION_LOG, log_max_bytes=FAQ_LOG_MAX_BYTES):
+        self.table_path = Path(vectorstore_dir) / "faq_answers.json"
+        self.log_path = Path(vectorstore_dir) / "question_log.jsonl"
+        self.rotated_log_path = Path(vectorstore_dir) / "question_log.jsonl.1"
+        self.log_questions = log_questions
+        self.log_max_bytes = log_max_bytes
+        self.index_version = None
+        self._exact = {}     # normalized question -> entry
+        self._by_tokens = {}  # token set -> entry
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "near_hits": 0, "misses": 0, "logged": 0, "rotations": 0}
+
+    def _maybe_load(self):
+        now = time.monotonic()
+        if now - self._last_check < FAQ_CHECK_SECONDS:
+            return
+        self._last_check = now
+        try:
+            mtime = self.table_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        table = {"index_version": None, "entries": []}
+        if mtime is not None:
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        self._install(table)
+        self._mtime = mtime
+
+    def _install(self, table):
+        exact, by_tokens = {}, {}
+        for entry in table["entries"]:
+            exact.setdefault(normalize_question(entry["question"]), entry)
+            by_tokens.setdefault(question_tokens(entry["question"]), entry)
+        with self._lock:
+            self._exact, self._by_tokens = exact, by_tokens
+            self.index_version = table["index_version"]
+
+    def lookup(self, question: str, index_version):
+        """Precomputed entry for an exact or near-exact match of question, if any"""
+        self._maybe_load()
+        if not FAQ_ANSWERS or index_version is None or index_version != self.index_version:
+            return None
+        entry = self._exact.get(normalize_question(question))
+        if entry is not None:
+            self._count("exact_hits")
+            return entry
+        tokens = question_tokens(question)
+        entry = self._by_tokens.get(tokens)
+        if entry is None and tokens:
+            # Small table: a linear Jaccard scan stays well under a millisecond
+            best = 0.0
+            for candidate_tokens, candidate in self._by_tokens.items():
+                score = len(tokens & candidate_tokens) / len(tokens | candidate_tokens)
+                if score > best:
+                    best, entry = score, candidate
+            if best < FAQ_MATCH_THRESHOLD:
+                entry = None
+        self._count("near_hits" if entry is not None else "misses")
+        return entry
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def record_question(self, question: str):
+        """Append an answered question (FAQ hits included) to the log that FAQ mining reads.
+
+        Questions that are already FAQ entries have to keep being logged, or they would
+        drop out of the mining window and off the table at the next rebuild.
+        """
+        if not self.log_questions:
+            return
+        line = json.dumps({"q": question, "ts": int(time.time())}, ensure_ascii=False) + "\n"
+        try:
+            self._maybe_rotate()
+            # Single small O_APPEND writes stay whole when several workers log at once
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._count("logged")
+        except OSError as e:
+            print(f"Could not log question: {e}")
+
+    def _maybe_rotate(self):
+        try:
+            size = self.log_path.stat().st_size
+        except FileNotFoundError:
+            return
+        if size >= self.log_max_bytes:
+            # Workers racing here at worst rotate twice and drop one generation early
+            os.replace(self.log_path, self.rotated_log_path)
+            self._count("rotations")
+
+    def mine_questions(self, min_count=FAQ_MIN_COUNT, limit=FAQ_MAX_ENTRIES):
+        """Most frequently asked questions in the recent log (one phrasing per question)"""
+        recent = deque(maxlen=FAQ_LOG_WINDOW)
+        for path in (self.rotated_log_path, self.log_path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    recent.extend(f)
+            except FileNotFoundError:
+                continue
+        counts, phrasing = Counter(), {}
+        for line in recent:
+            try:
+                question = json.loads(line)["q"]
+            except (ValueError, KeyError):
+                continue
+            key = normalize_question(question)
+            counts[key] += 1
+            phrasing.setdefault(key, question)
+        return [phrasing[key] for key, count in counts.most_common(limit) if count >= min_count]
+
+    def save(self, entries, index_version):
+        table = {
+            "index_version": index_version,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "entries": entries,
+        }
+        tmp_path = self.table_path.with_name(self.table_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(table, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.table_path)
+        self._install(table)
+        self._mtime = self.table_path.stat().st_mtime_ns
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["exact_hits"] + stats["near_hits"] + stats["misses"]
+        hits = lookups - stats["misses"]
+        return {
+            **stats,
+            "enabled": FAQ_ANSWERS,
+            "question_log": self.log_questions,
+            "entries": len(self._exact),
+            "index_version": self.index_version,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def precompute_faq_answers(pipeline, questions=None, store=None):
+    """Answer the configured + mined FAQ list against the pipeline's current index.
+
+    Only questions /rag would answer from the knowledge base are kept (not P0, RAG
+    topic, answer with sources). Returns the number of stored entries.
+    """
+    store = store or faq_store
+    version = pipeline.index_version
+    if pipeline.index is None or version is None:
+        print("No published index; skipping FAQ precomputation")
+        return 0
+    if questions is None:
+        questions = load_configured_questions() + store.mine_questions()
+
+    entries, seen = [], set()
+    for question in questions:
+        key = normalize_question(question)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        try:
+            cls = classify_ticket(question)
+            if cls["priority"] == "P0" or cls["topic"] not in RAG_TOPICS:
+                continue
+            result = pipeline.generate_answer(question, priority=BACKGROUND, analysis=cls)
+        except Exception as e:
+            print(f"FAQ precomputation failed for '{question}': {e}")
+            continue
+        if result["sources"]:
+            entries.append({
+                "question": question,
+                "analysis": cls,
+                "answer": result["answer"],
+                "sources": result["sources"],
+            })
+        if len(entries) >= FAQ_MAX_ENTRIES:
+            break
+
+    if pipeline.index_version != version:
+        # The index changed underneath us; the next rebuild precomputes against it
+        print("Index version changed during FAQ precomputation; discarding results")
+        return 0
+    store.save(entries, version)
+    print(f"Precomputed {len(entries)} FAQ answers for index version {version}")
+    return len(entries)
+
+
+def schedule_precompute(pipeline):
+    """Run precompute_faq_answers in a background thread (after a rebuild)"""
+    if not FAQ_ANSWERS:
+        return None
+    thread = threading.Thread(target=precompute_faq_answers, args=(pipeline,), name="faq-precompute", daemon=True)
+    thread.start()
+    return thread
+
+
+def generate_answer_once(pipeline, question: str, analysis=None):
+    """generate_answer with identical concurrent questions coalesced into one call"""
+    return answer_dedup.get_or_compute(
+        f"{pipeline.index_version}\n{question}",
+        lambda _: pipeline.generate_answer(question, analysis=analysis),
+        cacheable=lambda result: ANSWER_CACHE_TTL > 0 and bool(result["sources"]) and not result.get("degraded"),
+    )
+
+
+# Global instances
+faq_store = FAQStore()
+answer_dedup = ClassificationCache(max_size=1024, ttl_seconds=ANSWER_CACHE_TTL)
+
+
+if __name__ == "__main__":
+    from enhanced_rag_pipeline import rag_pipeline
+    precompute_faq_answers(rag_pipeline)
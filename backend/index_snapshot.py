@@ -0,0 +1,243 @@
+# index_snapshot.py
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Portable prebuilt index: a gzip'd tar of the vectorstore files plus a manifest with
+# their SHA-256 checksums and the embedding settings. A replica started with
+# RAG_SNAPSHOT_PATH installs it and serves without a single embeddings call.
+SNAPSHOT_PATH = os.getenv("RAG_SNAPSHOT_PATH")
+SNAPSHOT_DIR = os.getenv("RAG_SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_COMPRESSLEVEL = int(os.getenv("RAG_SNAPSHOT_COMPRESSLEVEL", "6"))
+SNAPSHOT_FORMAT = 1
+
+MANIFEST_NAME = "manifest.json"
+# Vectorstore files a snapshot may carry; index.faiss, meta.pkl and index_config.json are required
+SNAPSHOT_FILES = ("index.faiss", "meta.pkl", "index_config.json", "vectors.npy", "faq_answers.json")
+REQUIRED_FILES = ("index.faiss", "meta.pkl", "index_config.json")
+CHUNK_SIZE = 1 << 20
+
+
+class SnapshotError(RuntimeError):
+    """A snapshot is missing, corrupt or incompatible with this build"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def checksum_path(snapshot_path):
+    """Sidecar holding the archive's own digest (sha256sum format)"""
+    snapshot_path = Path(snapshot_path)
+    return snapshot_path.with_name(snapshot_path.name + ".sha256")
+
+
+def _snapshot_files(vectorstore_dir, index_version):
+    files = [name for name in SNAPSHOT_FILES if (vectorstore_dir / name).exists()]
+    if "faq_answers.json" in files:
+        # Ship precomputed answers only when they belong to this index
+        with open(vectorstore_dir / "faq_answers.json", "r", encoding="utf-8") as f:
+            if json.load(f).get("index_version") != index_version:
+                files.remove("faq_answers.json")
+    return files
+
+
+def export_snapshot(pipeline, output=None):
+    """Write the pipeline's published index to a snapshot archive and return its manifest"""
+    vectorstore_dir = pipeline.vectorstore_dir
+    with pipeline.build_lock():
+        # Holding the build lock keeps a concurrent rebuild from swapping files mid-export
+        index_version = pipeline.read_version()
+        if index_version is None or not all((vectorstore_dir / name).exists() for name in REQUIRED_FILES):
+            raise SnapshotError("No published index to export")
+        config = pipeline.read_index_config()
+        output = Path(output or Path(SNAPSHOT_DIR) / f"index-{index_version}.tar.gz")
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        files = _snapshot_files(vectorstore_dir, index_version)
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "index_version": index_version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "embedding_model": config.get("embedding_model"),
+            "embedding_dimensions": config.get("embedding_dimensions"),
+            "dimension": config.get("dimension"),
+            "count": config.get("count"),
+            "index_type": config.get("index_type", "flat"),
+            "files": {
+                name: {"sha256": file_sha256(vectorstore_dir / name), "bytes": (vectorstore_dir / name).stat().st_size}
+                for name in files
+            },
+        }
+
+        tmp_path = output.with_name(output.name + ".tmp")
+        with tarfile.open(tmp_path, "w:gz", compresslevel=SNAPSHOT_COMPRESSLEVEL) as tar:
+            # Manifest first, so read_manifest only decompresses a few bytes
+            data = json.dumps(manifest, indent=2).encode("utf-8")
+            info = tarfile.TarInfo(MANIFEST_NAME)
+            info.size, info.mtime = len(data), int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+            for name in files:
+                tar.add(vectorstore_dir / name, arcname=name)
+    os.replace(tmp_path, output)
+    checksum_path(output).write_text(f"{file_sha256(output)}  {output.name}\n", encoding="utf-8")
+    print(f"Exported index version {index_version} ({manifest['count']} documents) to {output}"
+          f" ({output.stat().st_size / 1e6:.1f} MB)")
+    return manifest
+
+
+def read_manifest(snapshot_path):
+    try:
+        with tarfile.open(snapshot_path, "r:gz") as tar:
+            member = tar.next()
+            if member is None or member.name != MANIFEST_NAME:
+                raise SnapshotError(f"{snapshot_path} has no manifest")
+            return json.load(tar.extractfile(member))
+    except (OSError, tarfile.TarError, ValueError) as e:
+        raise SnapshotError(f"Cannot read snapshot {snapshot_path}: {e}") from e
+
+
+def check_compatible(manifest, embedding_model):
+    """Queries are embedded with embedding_model; a snapshot built with another model is useless"""
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Unsupported snapshot format {manifest.get('format')}")
+    if manifest.get("embedding_model") != embedding_model:
+        raise SnapshotError(f"Snapshot was built with {manifest.get('embedding_model')}, "
+                            f"this build embeds queries with {embedding_model}")
+    missing = [name for name in REQUIRED_FILES if name not in manifest.get("files", {})]
+    if missing:
+        raise SnapshotError(f"Snapshot is missing {', '.join(missing)}")
+
+
+def _verify_archive_checksum(snapshot_path):
+    sidecar = checksum_path(snapshot_path)
+    if not sidecar.exists():
+        return
+    expected = sidecar.read_text(encoding="utf-8").split()[0]
+    if file_sha256(snapshot_path) != expected:
+        raise SnapshotError(f"{snapshot_path} does not match its checksum file")
+
+
+def _extract_verified(snapshot_path, manifest, staging_dir):
+    """Stream every listed member into staging_dir, checking SHA-256 on the way"""
+    expected = manifest["files"]
+    found = set()
+    try:
+        with tarfile.open(snapshot_path, "r:gz") as tar:
+            for member in tar:
+                if member.name == MANIFEST_NAME:
+                    continue
+                if member.name not in expected or not member.isfile():
+                    raise SnapshotError(f"Unexpected member {member.name} in snapshot")
+                digest = hashlib.sha256()
+                with tar.extractfile(member) as src, open(staging_dir / member.name, "wb") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                        dst.write(chunk)
+                if digest.hexdigest() != expected[member.name]["sha256"]:
+                    raise SnapshotError(f"Checksum mismatch for {member.name}")
+                found.add(member.name)
+    except (OSError, EOFError, zlib.error, tarfile.TarError) as e:
+        raise SnapshotError(f"Corrupt snapshot {snapshot_path}: {e}") from e
+    missing = set(expected) - found
+    if missing:
+        raise SnapshotError(f"Snapshot is truncated: {', '.join(sorted(missing))} not found")
+
+
+def verify_snapshot(snapshot_path, embedding_model):
+    """Full check without installing anything; returns the manifest"""
+    manifest = read_manifest(snapshot_path)
+    check_compatible(manifest, embedding_model)
+    _verify_archive_checksum(snapshot_path)
+    with tempfile.TemporaryDirectory() as staging_dir:
+        _extract_verified(snapshot_path, manifest, Path(staging_dir))
+    return manifest
+
+
+def import_snapshot(pipeline, snapshot_path, force=False):
+    """Verify a snapshot, install its files into the vectorstore and load it.
+
+    The snapshot's index version is kept, so its precomputed FAQ answers stay valid and
+    replicas started from the same artifact report the same version. Returns False when
+    that version is already installed (unless ``force``).
+    """
+    from enhanced_rag_pipeline import EMBEDDING_MODEL
+
+    snapshot_path = Path(snapshot_path)
+    if not snapshot_path.exists():
+        raise SnapshotError(f"Snapshot {snapshot_path} not found")
+    start = time.perf_counter()
+    manifest = read_manifest(snapshot_path)
+    check_compatible(manifest, EMBEDDING_MODEL)
+    if not force and manifest["index_version"] == pipeline.read_version():
+        print(f"Snapshot version {manifest['index_version']} is already installed")
+        return False
+    _verify_archive_checksum(snapshot_path)
+
+    vectorstore_dir = pipeline.vectorstore_dir
+    with pipeline.build_lock():
+        # Staging lives inside the vectorstore so the final renames stay on one filesystem
+        staging_dir = vectorstore_dir / ".snapshot_import"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir()
+        try:
+            _extract_verified(snapshot_path, manifest, staging_dir)
+            for name in SNAPSHOT_FILES:
+                if name in manifest["files"]:
+                    os.replace(staging_dir / name, vectorstore_dir / name)
+                elif name == "vectors.npy":
+                    # Stale full-precision vectors would be used to rescore the new index
+                    (vectorstore_dir / name).unlink(missing_ok=True)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        pipeline.publish_version(manifest["index_version"])
+    pipeline.load_index()
+    print(f"Imported snapshot version {manifest['index_version']} ({manifest['count']} documents)"
+          f" in {time.perf_counter() - start:.2f}s")
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Export, verify or import vectorstore snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="write the published index to a snapshot")
+    export_cmd.add_argument("output", nargs="?", help=f"default: {SNAPSHOT_DIR}/index-<version>.tar.gz")
+    verify_cmd = sub.add_parser("verify", help="check a snapshot's checksums and compatibility")
+    verify_cmd.add_argument("snapshot")
+    import_cmd = sub.add_parser("import", help="install a snapshot into the vectorstore")
+    import_cmd.add_argument("snapshot")
+    import_cmd.add_argument("--force", action="store_true", help="reinstall even if the version matches")
+    args = parser.parse_args()
+
+    # Never build (and embed) on import: this CLI only moves prebuilt indexes around
+    os.environ["RAG_AUTO_BUILD"] = "false"
+    os.environ.pop("RAG_SNAPSHOT_PATH", None)
+    from enhanced_rag_pipeline import rag_pipeline, EMBEDDING_MODEL
+
+    try:
+        if args.command == "export":
+            export_snapshot(rag_pipeline, args.output)
+        elif args.command == "verify":
+            manifest = verify_snapshot(args.snapshot, EMBEDDING_MODEL)
+            print(f"✅ Snapshot OK: version {manifest['index_version']}, {manifest['count']} documents,"
+                  f" {manifest['embedding_model']} ({manifest['dimension']} dims)")
+        else:
+            import_snapshot(rag_pipeline, args.snapshot, force=args.force)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
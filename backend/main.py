@@ -1,9 +1,22 @@
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from enhanced_rag_pipeline import generate_answer, rebuild_index, load_index
-from classifier import classify_ticket
+from enhanced_rag_pipeline import rebuild_index, rag_pipeline, IndexBuildInProgress, IndexReadOnly, ROLE
+from classifier import classify_ticket, get_classifier_stats, classification_cache, pre_classify_priority, RAG_TOPICS
+from admission import admission, Overloaded
+from escalations import escalation_log
+from faq_answers import faq_store, answer_dedup, generate_answer_once
+from conversation_state import conversations, SESSIONS_ENABLED
+from model_router import route_stats
+from openai_client import get_client, close_clients
+from rate_limiter import scheduler
+from metrics import request_trace, stage_timer, rag_request_seconds, render_metrics, registry, Gauge, CallbackCounter
+import time
+from typing import Optional
+from contextlib import asynccontextmanager
 import os
 import uuid
 import aiofiles
@@ -11,7 +24,16 @@ from pathlib import Path
 import mimetypes
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared OpenAI connection pool up front, close it cleanly on shutdown
+    get_client()
+    yield
+    if rag_pipeline.batcher is not None:
+        rag_pipeline.batcher.close()
+    close_clients()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow frontend requests
 app.add_middleware(
@@ -24,6 +46,8 @@ app.add_middleware(
 
 class QueryRequest(BaseModel):
     text: str
+    include_timings: bool = False  # add a per-stage latency/token breakdown to the /rag response
+    session_id: Optional[str] = None  # multi-turn chat: follow-ups reuse this conversation's state
 
 # Create uploads directory
 UPLOAD_DIR = Path("uploads")
@@ -125,43 +149,149 @@ def classify(req: QueryRequest):
 
 # ---- RAG Endpoint with escalation ----
 @app.post("/rag")
-def rag_endpoint(req: QueryRequest):
-    # Step 1: classify the ticket
-    cls = classify_ticket(req.text)
+async def rag_endpoint(req: QueryRequest):
+    start = time.perf_counter()
+    with request_trace() as trace:
+        outcome, response = await _handle_ticket(req)
+        rag_request_seconds.observe(time.perf_counter() - start, outcome=outcome)
+        if req.session_id:
+            response["session_id"] = req.session_id
+        if req.include_timings:
+            response["timings"] = trace.summary()
+    return response
+
+async def _handle_ticket(req: QueryRequest):
+    """Admission control on the event loop; FAQ lookup and everything else on worker threads"""
+    # Step 0: frequently asked questions are served from the precomputed table
+    faq = await run_in_threadpool(_faq_answer, req)
+    if faq is not None:
+        return "faq", faq
+
+    # Queue by (pre-classified) priority; shed low-priority work when queues are over budget
+    priority = pre_classify_priority(req.text)
+    try:
+        async with admission.admit(priority):
+            return await run_in_threadpool(_answer_ticket, req)
+    except Overloaded as e:
+        analysis = {"topic": "Unknown", "sentiment": "Neutral", "priority": e.priority}
+        response = {
+            "query": req.text,
+            "analysis": analysis,
+            "sources": [],
+            "degraded": True,
+            "retry_after": e.retry_after
+        }
+        if e.priority == "P0" and await run_in_threadpool(escalation_log.record, req.text, "shed", analysis):
+            response["answer"] = "⚠️ We're under heavy load. This ticket looks urgent and has been flagged for a human support agent."
+            response["escalated"] = True
+        else:
+            response["answer"] = ("We're handling an unusually high volume of requests right now. "
+                                  "Please try again shortly, or contact Atlan support if this is urgent.")
+        return "shed", response
+
+def _faq_answer(req: QueryRequest):
+    """Response from the precomputed FAQ table, if the question is in it (reads files)"""
+    faq = faq_store.lookup(req.text, rag_pipeline.index_version)
+    if faq is None:
+        return None
+    # Keep counting served FAQs, or they fall out of the mining window and off the table
+    faq_store.record_question(req.text)
+    session = _session(req)
+    if session is not None:
+        conversations.update(session, req.text, req.text, faq["answer"], faq["analysis"])
+    return {
+        "query": req.text,
+        "analysis": faq["analysis"],
+        "answer": faq["answer"],
+        "sources": faq["sources"]
+    }
+
+def _session(req: QueryRequest):
+    return conversations.get(req.session_id) if req.session_id and SESSIONS_ENABLED else None
+
+def _answer_ticket(req: QueryRequest):
+    """Classify, escalate/route, or answer a ticket; returns (outcome, response)"""
+    outcome, response, state = _answer_turn(req, _session(req))
+    if state is not None:
+        conversations.update(state["session"], req.text, state["query"], response["answer"],
+                             response["analysis"], rag_pipeline.index_version, state.get("retrieval"))
+    return outcome, response
+
+def _answer_turn(req: QueryRequest, session):
+    """(outcome, response, conversation state to record or None)"""
+    # Step 0: follow-ups in a conversation become standalone questions
+    query, follow_up = conversations.rewrite(session, req.text) if session else (req.text, False)
+    state = {"session": session, "query": query} if session else None
+
+    # Step 1: classify the ticket (turns that name nothing new inherit the conversation's classification)
+    cls = conversations.reuse_classification(session, req.text) if session else None
+    if cls is None:
+        with stage_timer("classify"):
+            cls = classify_ticket(req.text)
 
     # Step 2: if priority is P0 → escalate to human
     if cls["priority"] == "P0":
-        return {
+        escalation_log.record(req.text, "p0", cls)
+        return "escalated", {
             "query": req.text,
             "analysis": cls,
             "answer": "⚠️ This ticket has been marked HIGH PRIORITY (P0). Redirecting to a human support agent immediately.",
-            "sources": []
-        }
+            "sources": [],
+            "escalated": True
+        }, state
 
     # Step 3: if topic is not eligible for RAG → just route
-    if cls["topic"] not in ["How-to", "Product", "API/SDK", "SSO", "Best practices"]:
-        return {
+    if cls["topic"] not in RAG_TOPICS:
+        return "routed", {
             "query": req.text,
             "analysis": cls,
             "answer": f"This ticket has been classified as '{cls['topic']}' and routed to the appropriate team.",
             "sources": []
-        }
+        }, state
     if cls["topic"] == "unknown":
-        return{
+        return "unknown", {
             "query": req.text,
             "analysis" : cls,
             "answer" : "❌ Sorry, I couldn’t understand your request. Please refine your question.",    
             "sources" : []
-        }
+        }, state
 
-    # Step 4: run normal RAG pipeline
-    result = generate_answer(req.text)
-    return {
+    # Step 4: run normal RAG pipeline (identical concurrent questions share one call;
+    # conversation turns that name nothing new reuse the session's chunks)
+    result = None
+    if session is not None:
+        rag_pipeline.maybe_reload()
+        if rag_pipeline.index is not None:
+            try:
+                retrieved, distances = conversations.retrieve(rag_pipeline, session, req.text, query)
+                state.update(retrieval=(retrieved, distances))
+                result = rag_pipeline.generate_answer(query, retrieval=(retrieved, distances), analysis=cls)
+            except Exception as e:
+                print(f"Conversation retrieval failed, answering without session state: {e}")
+    if result is None:
+        result = generate_answer_once(rag_pipeline, query, analysis=cls)
+    if result.get("low_confidence"):
+        # Retrieval found nothing relevant enough; no chat completion was made
+        return "low_confidence", {
+            "query": req.text,
+            "analysis": cls,
+            "answer": result["answer"],
+            "sources": []
+        }, state
+    if not follow_up:
+        faq_store.record_question(req.text)
+    response = {
         "query": req.text,
         "analysis": cls,
         "answer": result["answer"],
         "sources": result["sources"]
     }
+    if query != req.text:
+        response["standalone_query"] = query
+    if result.get("degraded"):
+        # Deadline hit: a faster model's shorter answer, or only the sources
+        response["degraded"] = True
+    return "answered", response, state
 
 # ---- Index Management Endpoints ----
 @app.post("/rebuild-index")
@@ -170,12 +300,18 @@ def rebuild_knowledge_index():
     try:
         rebuild_index()
         return {"message": "Knowledge base index rebuilt successfully"}
+    except (IndexBuildInProgress, IndexReadOnly) as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/scrape-docs")
 def scrape_documentation():
     """Scrape Atlan documentation and rebuild index"""
+    if ROLE == "worker":
+        # Scraping is only useful together with the rebuild, which workers cannot run
+        raise HTTPException(status_code=409, detail="Workers serve the shared index read-only; "
+                                                    "scrape and rebuild from the indexer")
     try:
         from web_scraper import scrape_atlan_docs
         result = scrape_atlan_docs()
@@ -196,3 +332,72 @@ def get_index_stats():
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/classifier-stats")
+def classifier_stats():
+    """Get classification cache statistics (hits, misses, coalesced calls)"""
+    return get_classifier_stats()
+
+
+@app.get("/faq-stats")
+def faq_stats():
+    """Get precomputed FAQ answer hits and answer-level dedup statistics"""
+    return {"faq": faq_store.get_stats(), "answer_dedup": answer_dedup.get_stats()}
+
+
+@app.get("/session-stats")
+def session_stats():
+    """Get conversation state statistics: active sessions, follow-ups, reused retrievals"""
+    return conversations.get_stats()
+
+
+@app.get("/routing-stats")
+def routing_stats():
+    """Get answer model routes and their request, fallback, latency and cost totals"""
+    return route_stats.get_stats()
+
+
+@app.get("/escalations")
+def escalations(limit: int = 50):
+    """Most recent tickets escalated to a human (P0, or urgent and shed under load), newest first"""
+    return {"escalations": escalation_log.recent(limit), **escalation_log.get_stats()}
+
+
+@app.get("/admission-stats")
+def admission_stats():
+    """Get /rag admission control state: active, queued and shed requests per priority"""
+    return admission.get_stats()
+
+
+@app.get("/rate-limit-stats")
+def rate_limit_stats():
+    """Get OpenAI scheduler statistics (queueing, 429s, retries) per API"""
+    return scheduler.get_stats()
+
+
+# Totals kept by other components, read at scrape time
+for _name, _help, _read in [
+    ("classifier_cache_hits_total", "Classification cache hits", lambda: classification_cache.stats["hits"]),
+    ("classifier_cache_misses_total", "Classification cache misses", lambda: classification_cache.stats["misses"]),
+    ("classifier_cache_coalesced_total", "Classifications served by an identical in-flight call", lambda: classification_cache.stats["coalesced"]),
+    ("openai_chat_throttled_total", "429 responses from the chat API", lambda: scheduler.lanes["chat"].stats["throttled"]),
+    ("openai_embeddings_throttled_total", "429 responses from the embeddings API", lambda: scheduler.lanes["embeddings"].stats["throttled"]),
+    ("openai_chat_deadline_expired_total", "Chat calls given up in the rate-limit queue or backoff at their deadline", lambda: scheduler.lanes["chat"].stats["expired"]),
+    ("faq_answer_hits_total", "/rag requests served from precomputed FAQ answers", lambda: faq_store.stats["exact_hits"] + faq_store.stats["near_hits"]),
+    ("rag_answers_coalesced_total", "Answers shared with an identical in-flight question", lambda: answer_dedup.stats["coalesced"]),
+    ("rag_session_retrievals_reused_total", "Follow-up turns answered from a conversation's cached retrieval", lambda: conversations.stats["retrieval_reused"]),
+]:
+    registry.register(CallbackCounter(_name, _help, _read))
+
+# Current values
+for _name, _help, _read in [
+    ("rag_sessions_active", "Conversations with server-side state in this process", lambda: len(conversations)),
+    ("rag_index_documents", "Documents in the loaded index", lambda: len(rag_pipeline.docs or [])),
+]:
+    registry.register(Gauge(_name, _help, _read))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus metrics: per-stage latency histograms and token usage"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,232 @@
+# metrics.py
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets (seconds) spanning FAISS searches (sub-ms) to slow chat completions
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', bound))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}", f"{self.name} {value}"]
+
+
+class CallbackCounter(Gauge):
+    """Monotonic total kept by another component, read from a callback at scrape time"""
+
+    metric_type = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+rag_stage_seconds = registry.register(Histogram(
+    "rag_stage_seconds", "Time spent in each /rag query-path stage", ["stage"]))
+rag_request_seconds = registry.register(Histogram(
+    "rag_request_seconds", "End-to-end /rag handler latency", ["outcome"]))
+index_stage_seconds = registry.register(Histogram(
+    "index_build_stage_seconds", "Time spent in each build_index stage", ["stage"]))
+openai_tokens = registry.register(Histogram(
+    "openai_call_tokens", "Tokens used per OpenAI call", ["api", "type"], buckets=TOKEN_BUCKETS))
+openai_tokens_total = registry.register(Counter(
+    "openai_tokens_total", "Total tokens used by OpenAI calls", ["api", "type"]))
+openai_call_seconds = registry.register(Histogram(
+    "openai_call_seconds", "OpenAI call latency by whether the provider prompt cache was hit",
+    ["api", "prompt_cache"]))
+
+
+# ---- Per-request tracing ----
+
+_current_trace = contextvars.ContextVar("rag_request_trace", default=None)
+
+
+class RequestTrace:
+    """Per-request stage timings and token counts, returned when a client asks for them"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.tokens = {}
+
+    def add_stage(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_tokens(self, api, kind, count):
+        key = f"{api}_{kind}"
+        self.tokens[key] = self.tokens.get(key, 0) + count
+
+    def merge(self, stages=None, tokens=None):
+        """Add work done on this request's behalf in another thread (e.g. a shared batch)"""
+        for stage, seconds in (stages or {}).items():
+            self.add_stage(stage, seconds)
+        for key, count in (tokens or {}).items():
+            self.tokens[key] = self.tokens.get(key, 0) + count
+
+    def summary(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 2),
+            "stages_ms": {stage: round(s * 1000, 2) for stage, s in self.stages.items()},
+            "tokens": dict(self.tokens)
+        }
+
+
+@contextmanager
+def request_trace():
+    """Start a trace for the current request (must run in the thread handling it)"""
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def observe_stage(stage, seconds, histogram=rag_stage_seconds):
+    """Record a stage duration in the histogram and in the current request's trace"""
+    histogram.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_stage(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage, histogram=rag_stage_seconds):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, histogram)
+
+
+def record_usage(api, usage, seconds=None):
+    """Record token usage from an OpenAI response's ``usage`` object.
+
+    Prompt tokens served from the provider's prompt cache are recorded as type
+    "cached_prompt" (a subset of "prompt"); with ``seconds``, the call latency is
+    recorded split by prompt-cache hit/miss.
+    """
+    if usage is None:
+        return
+    trace = _current_trace.get()
+    details = getattr(usage, "prompt_tokens_details", None)
+    counts = {
+        "prompt": getattr(usage, "prompt_tokens", None),
+        "completion": getattr(usage, "completion_tokens", None),
+        "cached_prompt": getattr(details, "cached_tokens", None),
+    }
+    for kind, count in counts.items():
+        if count is None:
+            continue
+        openai_tokens.observe(count, api=api, type=kind)
+        openai_tokens_total.inc(count, api=api, type=kind)
+        if trace is not None:
+            trace.add_tokens(api, kind, count)
+    if seconds is not None:
+        openai_call_seconds.observe(seconds, api=api, prompt_cache="hit" if counts["cached_prompt"] else "miss")
+
+
+def render_metrics():
+    """Prometheus text exposition of every registered metric"""
+    return registry.render()
@@ -0,0 +1,181 @@
+# model_router.py
+import os
+import threading
+
+import openai
+
+from metrics import registry, Counter, Histogram
+from rate_limiter import DeadlineExceeded
+
+# Per-request choice of answer model, output budget and latency deadline. Short, confidently
+# retrieved P2 questions go to a small budget; long or complex P1 questions to a stronger model.
+# A call still running at its deadline is abandoned for a fast fallback, and when there is no
+# time left for that either the caller returns a truncated answer (just the sources).
+# Off by default: the deep route sends some questions to gpt-4o, at several times the cost.
+ROUTING_ENABLED = os.getenv("RAG_MODEL_ROUTING", "false").lower() == "true"
+
+
+def _env_route(name, model, max_tokens, deadline):
+    prefix = f"RAG_ROUTE_{name.upper()}"
+    deadline = float(os.getenv(f"{prefix}_DEADLINE_SECONDS", str(deadline)))
+    return {
+        "name": name,
+        "model": os.getenv(f"{prefix}_MODEL", model),
+        "max_tokens": int(os.getenv(f"{prefix}_MAX_TOKENS", str(max_tokens))),
+        "deadline": deadline if deadline > 0 else None,
+    }
+
+
+ROUTES = {
+    "fast": _env_route("fast", "gpt-4o-mini", 400, 6),
+    "standard": _env_route("standard", "gpt-4o-mini", 1000, 15),
+    "deep": _env_route("deep", "gpt-4o", 1500, 25),
+}
+# Used when routing is off: the previous fixed behaviour, no deadline
+DEFAULT_ROUTE = {"name": "default", "model": "gpt-4o-mini", "max_tokens": 1000, "deadline": None}
+FALLBACK_MAX_TOKENS = int(os.getenv("RAG_FALLBACK_MAX_TOKENS", "300"))
+# Share of the deadline held back so the fallback call still fits
+FALLBACK_RESERVE = float(os.getenv("RAG_FALLBACK_RESERVE", "0.35"))
+MIN_FALLBACK_SECONDS = 1.0
+
+FAST_MAX_WORDS = int(os.getenv("RAG_ROUTE_FAST_MAX_WORDS", "12"))
+DEEP_MIN_WORDS = int(os.getenv("RAG_ROUTE_DEEP_MIN_WORDS", "50"))
+# Retrieval score above the gating threshold (or absolute score when gating is off)
+# from which a short question counts as confidently answered by its top chunk
+CONFIDENT_MARGIN = float(os.getenv("RAG_ROUTE_CONFIDENT_MARGIN", "0.1"))
+CONFIDENT_SCORE = float(os.getenv("RAG_ROUTE_CONFIDENT_SCORE", "0.5"))
+# Topics whose P1 questions usually need multi-step reasoning over code or configuration
+DEEP_TOPICS = {"API/SDK", "Best practices"}
+
+# USD per 1M tokens: (uncached prompt, cached prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+
+route_requests = registry.register(Counter(
+    "rag_route_requests_total", "Answers generated per model route and outcome", ["route", "outcome"]))
+route_seconds = registry.register(Histogram(
+    "rag_route_seconds", "Answer generation latency per model route (fallback included)", ["route"]))
+route_cost = registry.register(Counter(
+    "rag_route_cost_usd_total", "Estimated answer generation cost per model route", ["route"]))
+
+
+def choose_route(query: str, analysis=None, top_score=None, threshold=None):
+    """Route for one answer from ticket classification, query length and retrieval confidence"""
+    if not ROUTING_ENABLED:
+        return DEFAULT_ROUTE
+    analysis = analysis or {}
+    words = len(query.split())
+    priority = analysis.get("priority")
+    if words >= DEEP_MIN_WORDS or (priority == "P1" and analysis.get("topic") in DEEP_TOPICS):
+        return ROUTES["deep"]
+    if top_score is not None:
+        confident = (top_score - threshold >= CONFIDENT_MARGIN) if threshold is not None else top_score >= CONFIDENT_SCORE
+    else:
+        confident = False
+    if words <= FAST_MAX_WORDS and priority != "P1" and confident:
+        return ROUTES["fast"]
+    return ROUTES["standard"]
+
+
+def fallback_route(route):
+    """Faster, shorter route to retry with when ``route`` misses its deadline"""
+    fast = ROUTES["fast"]
+    return {"name": f"{route['name']}_fallback", "model": fast["model"],
+            "max_tokens": min(FALLBACK_MAX_TOKENS, route["max_tokens"]), "deadline": None}
+
+
+def primary_budget(deadline):
+    """Seconds the primary call may take, keeping a reserve for the fallback"""
+    if deadline is None:
+        return None
+    return deadline - min(deadline / 2, max(MIN_FALLBACK_SECONDS, deadline * FALLBACK_RESERVE))
+
+
+def estimate_cost(model, usage):
+    """USD cost of one call from its usage, or None for models without a known price"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None or usage is None:
+        return None
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    return ((prompt - cached) * prices[0] + cached * prices[1] + completion * prices[2]) / 1e6
+
+
+def estimate_abandoned_cost(model, prompt_tokens, max_tokens):
+    """Upper-bound USD cost of a call abandoned at its deadline: no usage comes back, but the
+    prompt is billed and so is whatever output was generated, at most ``max_tokens``"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + max_tokens * prices[2]) / 1e6
+
+
+def with_deadline(create, deadline_at, clock):
+    """Wrap an SDK call so it finishes by ``deadline_at``, a ``clock()`` time fixed before queueing.
+
+    Time spent waiting in the rate-limit queue counts against the deadline, since the user
+    waits for it all the same: the call gets whatever is left when it leaves the queue as its
+    timeout. A timeout raises DeadlineExceeded, which the scheduler does not retry. Pass the
+    same ``deadline_at`` to ``scheduler.call`` so queueing and retry backoff stop at it too.
+    """
+    def call():
+        if deadline_at is None:
+            return create(None)
+        remaining = deadline_at - clock()
+        if remaining <= 0:
+            raise DeadlineExceeded("deadline passed while queued")
+        try:
+            return create(remaining)
+        except openai.APITimeoutError as e:
+            raise DeadlineExceeded(str(e), sent=True) from e
+    return call
+
+
+class RouteStats:
+    """Per-route request, fallback, latency and cost totals for /routing-stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, outcome, seconds, cost=None):
+        route_requests.inc(route=route, outcome=outcome)
+        route_seconds.observe(seconds, route=route)
+        if cost:
+            route_cost.inc(cost, route=route)
+        with self._lock:
+            stats = self.routes.setdefault(route, {
+                "requests": 0, "ok": 0, "fallback": 0, "truncated": 0, "error": 0,
+                "seconds": 0.0, "max_seconds": 0.0, "cost_usd": 0.0})
+            stats["requests"] += 1
+            stats[outcome] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["cost_usd"] += cost or 0.0
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "enabled": ROUTING_ENABLED,
+                "routes": {name: {k: v for k, v in route.items() if k != "name"} for name, route in ROUTES.items()},
+                "stats": {
+                    name: {
+                        **{k: v for k, v in stats.items() if k not in ("seconds", "cost_usd")},
+                        "avg_seconds": round(stats["seconds"] / stats["requests"], 3),
+                        "max_seconds": round(stats["max_seconds"], 3),
+                        "cost_usd": round(stats["cost_usd"], 6),
+                        "avg_cost_usd": round(stats["cost_usd"] / stats["requests"], 6),
+                    }
+                    for name, stats in self.routes.items()
+                },
+            }
+
+
+# Global instance
+route_stats = RouteStats()
@@ -0,0 +1,104 @@
+# near_duplicates.py
+import os
+import re
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# SimHash over word 3-gram shingles. Unrelated pages differ in ~32 of 64 bits; versioned
+# copies and pages that differ only in navigation land within a few bits of each other.
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+NEAR_DUPLICATE_DISTANCE = int(os.getenv("NEAR_DUPLICATE_DISTANCE", "3"))
+
+_TOKEN_RE = re.compile(r"\w+")
+_BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+
+def _shingles(text: str) -> List[str]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) <= SHINGLE_SIZE:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash fingerprint of a text, or None when it has no words to fingerprint"""
+    shingles = _shingles(text)
+    if not shingles:
+        # A constant fingerprint would make every empty page a "copy" of every other one
+        return None
+    hashes = np.array(
+        [int.from_bytes(blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)
+    # Each bit of the fingerprint is the majority vote of that bit across shingles
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return int(sum(1 << int(i) for i in np.nonzero(votes > 0)[0]))
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex:
+    """Find fingerprints within ``max_distance`` bits of each other without pairwise scans.
+
+    Fingerprints are split into ``max_distance + 1`` bands; by pigeonhole, two fingerprints
+    within the distance agree exactly on at least one band, so only same-band entries
+    are compared.
+    """
+
+    def __init__(self, max_distance=NEAR_DUPLICATE_DISTANCE):
+        self.max_distance = max_distance
+        self.band_count = max_distance + 1
+        self.band_width = -(-SIMHASH_BITS // self.band_count)
+        self._bands = [dict() for _ in range(self.band_count)]
+        self._fingerprints = {}
+
+    def _band_keys(self, fingerprint: int):
+        mask = (1 << self.band_width) - 1
+        return [(fingerprint >> (band * self.band_width)) & mask for band in range(self.band_count)]
+
+    def find(self, fingerprint: int) -> Optional[Any]:
+        """Key of the first indexed fingerprint within max_distance, if any"""
+        for band, value in zip(self._bands, self._band_keys(fingerprint)):
+            for key in band.get(value, ()):
+                if hamming(fingerprint, self._fingerprints[key]) <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, key: Any, fingerprint: int):
+        self._fingerprints[key] = fingerprint
+        for band, value in zip(self._bands, self._band_keys(fingerprint)):
+            band.setdefault(value, []).append(key)
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+
+def collapse_near_duplicates(
+    documents: List[Dict[str, Any]], max_distance=NEAR_DUPLICATE_DISTANCE, text_key="text"
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Keep the first document of each near-duplicate cluster.
+
+    Kept documents list the sources they absorbed under ``duplicates``. Documents
+    without any words are never fingerprinted, so never merged. Returns
+    (kept documents, number collapsed).
+    """
+    index = SimHashIndex(max_distance)
+    kept = []
+    for doc in documents:
+        fingerprint = simhash(doc.get(text_key, ""))
+        if fingerprint is None:
+            kept.append(doc)
+            continue
+        match = index.find(fingerprint)
+        if match is None:
+            index.add(len(kept), fingerprint)
+            kept.append(doc)
+        else:
+            kept[match].setdefault("duplicates", []).append(doc.get("source", ""))
+    return kept, len(documents) - len(kept)
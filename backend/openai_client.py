@@ -0,0 +1,72 @@
+# openai_client.py
+import os
+import threading
+
+import httpx
+from openai import OpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool sizing: FastAPI runs sync endpoints on a 40-thread pool, so keep at least that many connections
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "40"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "90"))
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+# Retries are handled by rate_limiter.scheduler, so the SDK's own retry loop is off by default
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0"))
+HTTP2 = os.getenv("OPENAI_HTTP2", "auto").lower()
+
+_lock = threading.Lock()
+_client = None
+
+
+def _http2_enabled():
+    """Use HTTP/2 when requested and the optional h2 package is installed"""
+    if HTTP2 in ("0", "false", "no", "off"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        if HTTP2 not in ("auto", ""):
+            print("OPENAI_HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+
+
+def _http_settings():
+    """Connection pool, timeout and protocol settings for the shared client"""
+    return {
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+        "http2": _http2_enabled()
+    }
+
+
+def get_client() -> OpenAI:
+    """Return the process-wide OpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    max_retries=MAX_RETRIES,
+                    http_client=httpx.Client(**_http_settings())
+                )
+    return _client
+
+
+def close_clients():
+    """Close the client's connection pool; called from the FastAPI lifespan on shutdown"""
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
@@ -0,0 +1,157 @@
+# query_batcher.py
+import threading
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from metrics import rag_stage_seconds, request_trace
+from rate_limiter import estimate_tokens
+
+
+class QueryBatcher:
+    """Coalesce concurrent retrieval queries into one embeddings call and one FAISS search.
+
+    Callers block on ``search(query, top_k)``. A background worker collects every
+    query that arrives within ``max_wait_ms`` of the first one (or until
+    ``max_batch_size`` is reached) and hands the batch to a small pool, which embeds
+    it with a single request, runs a single search over the stacked query matrix and
+    fans the rows back out. Up to ``max_in_flight`` batches run at once. When a batch
+    fails, its queries are retried one by one so only the bad one fails.
+    """
+
+    def __init__(self, embed_batch, search_batch, max_batch_size=16, max_wait_ms=5, max_in_flight=4):
+        # embed_batch(list[str]) -> np.ndarray of shape (n, d), already normalized
+        # search_batch(np.ndarray, k) -> (distances, indices)
+        self.embed_batch = embed_batch
+        self.search_batch = search_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="query-batch")
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.stats = {"queries": 0, "batches": 0, "max_batch": 0, "split": 0}
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(
+                    target=self._run, name="query-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, query: str, top_k=3) -> Future:
+        """Queue a query and return a future resolving to (qvec, distances, indices).
+
+        Once resolved, ``future.timings`` holds the batch's embed/search seconds and
+        ``future.tokens`` this query's share of the batch's embedding tokens, for the
+        caller's request trace (the stage histograms are observed once per batch).
+        """
+        future = Future()
+        future.timings = {}
+        future.tokens = {}
+        self._ensure_worker()
+        self._queue.put((query, top_k, future))
+        return future
+
+    def search(self, query: str, top_k=3):
+        """Blocking helper around submit()"""
+        return self.submit(query, top_k).result()
+
+    def close(self):
+        """Stop the worker thread after it drains pending work"""
+        with self._lock:
+            self._stopped = True
+            worker = self._worker
+        if worker is not None and worker.is_alive():
+            self._queue.put(None)
+            worker.join(timeout=5)
+        self._executor.shutdown(wait=True)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown sentinel: finish this batch, then exit
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                if self._stopped:
+                    return
+                continue
+            batch = self._collect(first)
+            self._executor.submit(self._process, batch)
+
+    def _embed_and_search(self, texts, top_k):
+        # Token usage recorded by embed_batch lands in this batch-wide trace
+        with request_trace() as trace:
+            start = time.perf_counter()
+            qvecs = self.embed_batch(texts)
+            embedded = time.perf_counter()
+            distances, indices = self.search_batch(qvecs, top_k)
+            timings = {"embed": embedded - start, "search": time.perf_counter() - embedded}
+        return qvecs, distances, indices, timings, trace.tokens
+
+    def _process(self, batch):
+        texts = [query for query, _, _ in batch]
+        top_k = max(k for _, k, _ in batch)
+        try:
+            qvecs, distances, indices, timings, tokens = self._embed_and_search(texts, top_k)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            # One bad (e.g. oversized) query must not fail everyone batched with it
+            print(f"Query batch of {len(batch)} failed, retrying queries one by one: {e}")
+            with self._lock:
+                self.stats["split"] += 1
+            for item in batch:
+                self._process([item])
+            return
+        for stage, seconds in timings.items():
+            rag_stage_seconds.observe(seconds, stage=stage)
+
+        with self._lock:
+            self.stats["queries"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+        # Split the batch's tokens by each query's share of the estimated input
+        estimates = [estimate_tokens(text) for text in texts]
+        total = sum(estimates)
+        for row, (_, k, future) in enumerate(batch):
+            future.timings = timings
+            future.tokens = {key: round(count * estimates[row] / total) for key, count in tokens.items()}
+            future.set_result((
+                np.array(qvecs[row]),
+                distances[row][:k],
+                indices[row][:k]
+            ))
+
+    def get_stats(self):
+        """Batching statistics: average batch size shows how much coalescing happens"""
+        with self._lock:
+            stats = dict(self.stats)
+        batches = stats["batches"]
+        return {
+            **stats,
+            "avg_batch": round(stats["queries"] / batches, 2) if batches else 0.0,
+        }
@@ -2,16 +2,12 @@
 import numpy as np
 import pickle
 import faiss
-import os
-from openai import OpenAI
+from openai_client import get_client
+from rate_limiter import scheduler, estimate_tokens
 
 # Load API key from environment
 from dotenv import load_dotenv
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-# Initialize OpenAI client
-client = OpenAI(api_key=api_key)
 
 
 # ----------- Load FAISS Index + Metadata -----------
@@ -30,9 +26,13 @@ index, docs = load_index()
 
 def embed_text(text: str):
     """Generate embedding for text using OpenAI"""
-    resp = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
+    resp = scheduler.call(
+        "embeddings",
+        lambda: get_client().embeddings.create(
+            model="text-embedding-3-small",
+            input=text
+        ),
+        estimated_tokens=estimate_tokens(text)
     )
     return resp.data[0].embedding
 
@@ -75,10 +75,14 @@ def generate_answer(query: str, top_k=3):
     ]
 
     # Call OpenAI chat model
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        temperature=0.0
+    resp = scheduler.call(
+        "chat",
+        lambda: get_client().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.0
+        ),
+        estimated_tokens=estimate_tokens([m["content"] for m in messages])
     )
 
     answer = resp.choices[0].message.content
@@ -0,0 +1,229 @@
+# rate_limiter.py
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+import openai
+
+# Lower value = served first. Interactive /rag traffic always jumps queued indexing work.
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Errors worth waiting out; anything else is a real failure and is raised immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+class DeadlineExceeded(RuntimeError):
+    """A call ran out of its latency budget; ``sent`` when the request had reached the API"""
+
+    def __init__(self, message, sent=False):
+        super().__init__(message)
+        self.sent = sent
+
+
+def estimate_tokens(text) -> int:
+    """Cheap token estimate (~4 characters per token) used to reserve TPM capacity"""
+    if isinstance(text, (list, tuple)):
+        return sum(estimate_tokens(t) for t in text)
+    return len(text or "") // 4 + 1
+
+
+class TokenBucket:
+    """Continuously refilling bucket sized for one minute of quota"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.last = time.monotonic()
+
+    def refill(self, now, factor=1.0):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate * factor)
+        self.last = now
+
+    def wait_time(self, amount, factor=1.0):
+        """Seconds until ``amount`` is available (0 when it already is)"""
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / (self.rate * factor)
+
+
+class Lane:
+    """Requests/min and tokens/min budgets for one API (chat or embeddings)"""
+
+    def __init__(self, name, rpm, tpm):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        # Adaptive factor: halved on every 429, recovers slowly on success
+        self.factor = 1.0
+        self.waiters = []
+        self.stats = {"calls": 0, "queued": 0, "throttled": 0, "retries": 0, "failed": 0, "expired": 0,
+                      "wait_seconds": 0.0}
+
+    def wait_time(self, tokens):
+        now = time.monotonic()
+        self.requests.refill(now, self.factor)
+        self.tokens.refill(now, self.factor)
+        return max(self.requests.wait_time(1, self.factor), self.tokens.wait_time(tokens, self.factor))
+
+    def consume(self, tokens):
+        self.requests.tokens -= 1
+        self.tokens.tokens -= min(tokens, self.tokens.capacity)
+
+
+class RateLimitScheduler:
+    """Shared token-bucket scheduler for OpenAI calls.
+
+    Work that exceeds the current budget waits in a priority queue instead of
+    failing; throttled or transient errors are retried with jittered
+    exponential backoff and temporarily lower the lane's rate.
+    """
+
+    def __init__(self, limits, max_retries=6, base_delay=0.5, max_delay=30.0):
+        self.lanes = {name: Lane(name, rpm, tpm) for name, (rpm, tpm) in limits.items()}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls):
+        """Build the scheduler from OPENAI_* quota settings (defaults: usage tier 1)"""
+        return cls(
+            {
+                "chat": (
+                    int(os.getenv("OPENAI_CHAT_RPM", "500")),
+                    int(os.getenv("OPENAI_CHAT_TPM", "200000"))
+                ),
+                "embeddings": (
+                    int(os.getenv("OPENAI_EMBEDDINGS_RPM", "3000")),
+                    int(os.getenv("OPENAI_EMBEDDINGS_TPM", "1000000"))
+                ),
+            },
+            max_retries=int(os.getenv("OPENAI_SCHEDULER_MAX_RETRIES", "6")),
+            max_delay=float(os.getenv("OPENAI_SCHEDULER_MAX_DELAY", "30"))
+        )
+
+    def acquire(self, kind, tokens=0, priority=INTERACTIVE, deadline_at=None):
+        """Block until the lane has budget for one request of ``tokens`` tokens.
+
+        With ``deadline_at`` (a ``time.monotonic()`` time), raise DeadlineExceeded as soon as
+        the budget cannot be had before it, rather than waiting past it.
+        """
+        lane = self.lanes[kind]
+        ticket = (priority, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(lane.waiters, ticket)
+            queued = False
+            while True:
+                if lane.waiters[0] == ticket:
+                    wait = lane.wait_time(tokens)
+                    if wait <= 0:
+                        lane.consume(tokens)
+                        heapq.heappop(lane.waiters)
+                        self._cond.notify_all()
+                        break
+                else:
+                    wait = None  # woken when the head of the queue is served
+                if deadline_at is not None:
+                    left = deadline_at - time.monotonic()
+                    if left <= 0 or (wait is not None and wait > left):
+                        lane.waiters.remove(ticket)
+                        heapq.heapify(lane.waiters)
+                        lane.stats["expired"] += 1
+                        lane.stats["wait_seconds"] += time.monotonic() - start
+                        self._cond.notify_all()
+                        raise DeadlineExceeded("deadline would pass while queued for the rate limit")
+                    wait = left if wait is None else wait
+                if not queued:
+                    lane.stats["queued"] += 1
+                    queued = True
+                self._cond.wait(timeout=wait)
+            lane.stats["wait_seconds"] += time.monotonic() - start
+
+    def settle(self, kind, estimated, actual):
+        """Correct the token reservation once the response reports real usage"""
+        if actual is None:
+            return
+        with self._cond:
+            self.lanes[kind].tokens.tokens -= actual - estimated
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        # Full jitter keeps many retrying threads from re-synchronising
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, kind, fn, estimated_tokens=0, priority=INTERACTIVE, deadline_at=None):
+        """Run ``fn()`` within the ``kind`` lane's quota, retrying throttled calls.
+
+        ``deadline_at`` bounds queueing and retry backoff as in ``acquire``: a retry that
+        could only start after it raises DeadlineExceeded instead.
+        """
+        lane = self.lanes[kind]
+        for attempt in range(self.max_retries + 1):
+            self.acquire(kind, estimated_tokens, priority, deadline_at)
+            try:
+                result = fn()
+            except RETRYABLE_ERRORS as e:
+                if getattr(e, "code", None) == "insufficient_quota":
+                    # Billing problem, not a rate limit: waiting will not help
+                    raise
+                delay = self._backoff(attempt, e)
+                with self._cond:
+                    if isinstance(e, openai.RateLimitError):
+                        lane.stats["throttled"] += 1
+                        lane.factor = max(0.1, lane.factor * 0.5)
+                    if attempt == self.max_retries:
+                        lane.stats["failed"] += 1
+                        raise
+                    if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+                        lane.stats["expired"] += 1
+                        raise DeadlineExceeded(f"retrying in {delay:.1f}s would pass the deadline") from e
+                    lane.stats["retries"] += 1
+                time.sleep(delay)
+                continue
+
+            with self._cond:
+                lane.stats["calls"] += 1
+                lane.factor = min(1.0, lane.factor + 0.05)
+            usage = getattr(result, "usage", None)
+            self.settle(kind, estimated_tokens, getattr(usage, "total_tokens", None))
+            return result
+
+    def get_stats(self):
+        """Per-lane queueing, throttling and retry counters"""
+        with self._cond:
+            return {
+                name: {
+                    **lane.stats,
+                    "wait_seconds": round(lane.stats["wait_seconds"], 3),
+                    "rate_factor": round(lane.factor, 3),
+                    "waiting": len(lane.waiters)
+                }
+                for name, lane in self.lanes.items()
+            }
+
+
+# Global instance shared by the classifier, the RAG pipeline and the loaders
+scheduler = RateLimitScheduler.from_env()
@@ -0,0 +1,81 @@
+# score_gate.py
+import os
+import random
+
+import numpy as np
+
+from metrics import registry, Counter
+
+# Skip the chat completion when the best retrieval score is below a threshold calibrated
+# for each index build. RAG_SCORE_THRESHOLD fixes the threshold instead of calibrating.
+SCORE_GATING = os.getenv("RAG_SCORE_GATING", "true").lower() == "true"
+SCORE_THRESHOLD = float(os.getenv("RAG_SCORE_THRESHOLD")) if os.getenv("RAG_SCORE_THRESHOLD") else None
+CALIBRATION_QUERIES = int(os.getenv("RAG_CALIBRATION_QUERIES", "64"))
+# Share of in-domain probe queries the threshold may reject at most
+MAX_IN_DOMAIN_SKIP = float(os.getenv("RAG_MAX_IN_DOMAIN_SKIP", "0.1"))
+
+# Questions no Atlan document answers; their top scores form the "nothing relevant" distribution
+OFF_TOPIC_QUERIES = [
+    "What's the weather forecast for Paris this weekend?",
+    "Give me a recipe for banana bread",
+    "Who won the football world cup in 2018?",
+    "How do I change a flat tyre on my bike?",
+    "Recommend a good science fiction novel",
+    "What is the capital of Australia?",
+    "How many calories are in an avocado?",
+    "Translate 'good morning' into Japanese",
+    "How do I train my puppy to sit?",
+    "What time does the pharmacy close today?",
+    "Write a poem about the ocean",
+    "How tall is Mount Everest?",
+    "Best exercises for lower back pain",
+    "How do I get a refund for my flight?",
+    "What are the symptoms of the flu?",
+    "Explain the rules of chess",
+    "How do I grow tomatoes on a balcony?",
+    "Which phone has the best camera this year?",
+    "How long should I boil an egg?",
+    "Plan a three day trip to Rome",
+    "What's a good name for a cat?",
+    "How do I fix a leaking kitchen tap?",
+    "When is the next full moon?",
+    "Tips for running my first marathon",
+]
+
+score_gate_decisions = registry.register(Counter(
+    "rag_score_gate_total", "generate_answer decisions made by retrieval score gating", ["decision"]))
+
+
+def calibration_probes(documents, n=CALIBRATION_QUERIES, seed=13):
+    """In-domain probe queries: titles (or opening words) of a sample of indexed documents"""
+    sample = random.Random(seed).sample(documents, min(n, len(documents)))
+    probes = []
+    for doc in sample:
+        probe = doc.get("title") or " ".join((doc.get("content") or "").split()[:12])
+        if probe.strip():
+            probes.append(probe)
+    return probes
+
+
+def calibrate_threshold(in_domain_scores, off_topic_scores, max_in_domain_skip=MAX_IN_DOMAIN_SKIP):
+    """Threshold above nearly all off-topic top scores, capped so at most
+    ``max_in_domain_skip`` of in-domain probes would be skipped.
+
+    In-domain probes are document titles, which score higher than real user phrasing,
+    hence the cap rather than a midpoint between the two distributions.
+    """
+    in_domain = np.asarray(in_domain_scores, dtype="float64")
+    off_topic = np.asarray(off_topic_scores, dtype="float64")
+    off_topic_p95 = float(np.percentile(off_topic, 95))
+    in_domain_floor = float(np.percentile(in_domain, max_in_domain_skip * 100))
+    return {
+        "score_threshold": round(min(off_topic_p95, in_domain_floor), 4),
+        "score_calibration": {
+            "in_domain_p10": round(float(np.percentile(in_domain, 10)), 4),
+            "in_domain_p50": round(float(np.percentile(in_domain, 50)), 4),
+            "off_topic_p50": round(float(np.percentile(off_topic, 50)), 4),
+            "off_topic_p95": round(off_topic_p95, 4),
+            "in_domain_probes": len(in_domain),
+            "off_topic_probes": len(off_topic),
+        },
+    }
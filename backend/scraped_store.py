@@ -0,0 +1,86 @@
+# scraped_store.py
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator
+
+# orjson is optional: 2-5x faster parsing/serialization when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")
+
+# Storage formats for scraped pages, newest-preferred when several exist for the same crawl
+FORMATS = ("jsonl.gz", "jsonl", "json")
+
+
+def _use_orjson(backend=None):
+    backend = backend or JSON_BACKEND
+    if backend == "json":
+        return False
+    if backend == "orjson" and orjson is None:
+        raise ImportError("JSON_BACKEND=orjson but the orjson package is not installed")
+    return orjson is not None
+
+
+def dumps_line(record: Dict[str, Any], backend=None) -> bytes:
+    """Serialize one record as a compact JSON line"""
+    if _use_orjson(backend):
+        return orjson.dumps(record) + b"\n"
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def loads(data, backend=None):
+    if _use_orjson(backend):
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def write_records(path, records: Iterable[Dict[str, Any]], backend=None) -> Path:
+    """Write records as JSON lines (gzip-compressed when the path ends in .gz), atomically"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if path.name.endswith(".gz"):
+        f = gzip.open(tmp_path, "wb", compresslevel=6)
+    else:
+        f = open(tmp_path, "wb")
+    with f:
+        for record in records:
+            f.write(dumps_line(record, backend))
+    os.replace(tmp_path, path)
+    return path
+
+
+def iter_records(path, backend=None) -> Iterator[Dict[str, Any]]:
+    """Stream records from a .jsonl / .jsonl.gz file, or a legacy JSON array file"""
+    path = Path(path)
+    if path.name.endswith(".json"):
+        # Legacy pretty-printed array: has to be parsed whole
+        with open(path, "rb") as f:
+            yield from loads(f.read(), backend)
+        return
+    for line in iter_lines(path):
+        yield loads(line, backend)
+
+
+def iter_lines(path) -> Iterator[bytes]:
+    """Undecoded records of a .jsonl / .jsonl.gz file, one JSON line each"""
+    path = Path(path)
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def find_scraped_file(folder, stem: str):
+    """Most recently written file for a crawl (stem.jsonl.gz, stem.jsonl or stem.json), if any"""
+    folder = Path(folder)
+    candidates = [folder / f"{stem}.{fmt}" for fmt in FORMATS]
+    existing = [p for p in candidates if p.exists()]
+    if not existing:
+        return None
+    return max(existing, key=lambda p: p.stat().st_mtime_ns)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Multi-process server for the support copilot backend.
+
+The parent process owns indexing: it loads the vectorstore, builds it if it is
+missing (or when --rebuild is given) and publishes a version file. It then
+starts uvicorn workers with RAG_ROLE=worker. Workers memory-map the published
+FAISS index read-only, so index RAM stays constant as workers are added. They
+reload automatically when the version file changes, e.g. after bulk_index.py
+publishes a rebuild (guarded by a cross-process build lock). Workers never build
+themselves: /rebuild-index and /scrape-docs answer 409 on them. With --workers 1
+the indexer process serves requests itself instead.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 4 --rebuild
+    python serve.py --workers 4 --snapshot snapshots/index-<version>.tar.gz
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Add current directory to path
+sys.path.append(str(Path(__file__).parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index before starting workers")
+    parser.add_argument("--snapshot", help="install this prebuilt index snapshot instead of building")
+    args = parser.parse_args()
+    if args.snapshot:
+        os.environ["RAG_SNAPSHOT_PATH"] = args.snapshot
+
+    # Step 1: this process is the indexer
+    os.environ["RAG_ROLE"] = "indexer"
+    from enhanced_rag_pipeline import rag_pipeline
+    if args.rebuild:
+        rag_pipeline.build_index(force_rebuild=True)
+    if rag_pipeline.index is None:
+        print("❌ No index available; add documents or run setup_knowledge_base.py first")
+        return False
+    if rag_pipeline.index_version is None:
+        # Index predates version files: publish one so workers can track changes
+        rag_pipeline.publish_version()
+    if args.rebuild:
+        from faq_answers import precompute_faq_answers
+        precompute_faq_answers(rag_pipeline)
+    print(f"✅ Serving index version {rag_pipeline.index_version} ({len(rag_pipeline.docs)} documents)")
+
+    import uvicorn
+    if args.workers <= 1:
+        # uvicorn serves a single worker in this process, which keeps its index and its indexer role
+        uvicorn.run("main:app", host=args.host, port=args.port)
+        return True
+
+    # The supervisor does not serve queries; drop its copy so only the shared mapping remains
+    rag_pipeline.index, rag_pipeline.docs = None, None
+
+    # Step 2: start read-only workers (they inherit the environment)
+    os.environ["RAG_ROLE"] = "worker"
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -13,7 +13,6 @@ sys.path.append(str(Path(__file__).parent))
 
 from web_scraper import scrape_atlan_docs
 from enhanced_rag_pipeline import EnhancedRAGPipeline
-from enhanced_data_loader import EnhancedDataLoader
 
 def main():
     print("🚀 Setting up Atlan AI Knowledge Base...")
@@ -67,8 +66,8 @@ def main():
     # Step 4: Show data loader stats
     print("\n📊 Step 4: Data Sources Summary...")
     try:
-        data_loader = EnhancedDataLoader()
-        stats = data_loader.get_document_stats()
+        # Served from the document catalog written while indexing, no re-parsing
+        stats = rag_pipeline.data_loader.get_document_stats()
         
         print(f"   - Total documents: {stats['total_documents']}")
         print(f"   - Content length: {stats['total_content_length']:,} characters")
@@ -0,0 +1,17 @@
+# conftest.py
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Backend modules import each other by bare name (run from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Nothing under test may reach the real API
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("RAG_AUTO_BUILD", "false")
+
+
+def pytest_sessionstart(session):
+    # Modules create their state (vectorstore/, logs) relative to the working directory at import
+    os.chdir(tempfile.mkdtemp(prefix="rag-tests-"))
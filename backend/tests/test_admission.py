@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def make_controller(max_concurrent=1, class_limits=None, max_wait=None):
+    return AdmissionController(max_concurrent=max_concurrent, class_limits=class_limits or {},
+                               max_wait=max_wait or {"P0": 5, "P1": 5, "P2": 5}, enabled=True)
+
+
+def test_free_slot_is_granted_immediately():
+    async def run():
+        controller = make_controller(max_concurrent=2)
+        assert await controller.acquire("P2") == 0.0
+        assert controller.active["P2"] == 1
+        controller.release("P2")
+        assert controller.active["P2"] == 0
+
+    asyncio.run(run())
+
+
+def test_waiting_p0_is_served_before_earlier_p2():
+    async def run():
+        controller = make_controller()
+        await controller.acquire("P1")
+        order = []
+
+        async def request(priority):
+            async with controller.admit(priority):
+                order.append(priority)
+
+        p2 = asyncio.create_task(request("P2"))
+        await asyncio.sleep(0)
+        p0 = asyncio.create_task(request("P0"))
+        await asyncio.sleep(0)
+        assert [len(controller.queues[c]) for c in ("P0", "P1", "P2")] == [1, 0, 1]
+        controller.release("P1")
+        await asyncio.gather(p0, p2)
+        return order
+
+    assert asyncio.run(run()) == ["P0", "P2"]
+
+
+def test_class_limit_keeps_low_priority_from_taking_every_slot():
+    async def run():
+        controller = make_controller(max_concurrent=3, class_limits={"P2": 1}, max_wait={"P2": 0.05})
+        await controller.acquire("P2")
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire("P2")
+        # P0 still has room
+        assert await controller.acquire("P0") == 0.0
+        return shed.value
+
+    shed = asyncio.run(run())
+    assert shed.priority == "P2" and shed.reason == "queue deadline exceeded"
+
+
+def test_request_is_shed_up_front_when_expected_wait_exceeds_budget():
+    async def run():
+        controller = make_controller(max_wait={"P0": 30, "P2": 2})
+        await controller.acquire("P0")
+        controller.service_seconds = 3.0
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire("P2")
+        return controller, shed.value
+
+    controller, shed = asyncio.run(run())
+    assert shed.reason == "expected wait exceeds SLO"
+    assert shed.retry_after == 3.0
+    assert controller.stats["P2"]["shed"] == 1
+    assert controller.queues["P2"] == type(controller.queues["P2"])()
+
+
+def test_queued_request_times_out_at_its_deadline():
+    async def run():
+        controller = make_controller(max_wait={"P1": 0.05})
+        await controller.acquire("P0")
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire("P1")
+        return controller, shed.value
+
+    controller, shed = asyncio.run(run())
+    assert shed.reason == "queue deadline exceeded"
+    assert controller.stats["P1"]["timed_out"] == 1
+    assert not controller.queues["P1"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        controller = make_controller()
+        await controller.acquire("P0")
+        task = asyncio.create_task(controller.acquire("P2"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not controller.queues["P2"]
+        controller.release("P0")
+        assert sum(controller.active.values()) == 0
+
+    asyncio.run(run())
+
+
+def test_service_time_estimate_is_smoothed():
+    controller = make_controller(max_concurrent=4)
+    controller.active["P1"] = 2
+    controller.release("P1", service_seconds=1.0)
+    controller.release("P1", service_seconds=2.0)
+    assert controller.service_seconds == pytest.approx(0.8 * 1.0 + 0.2 * 2.0)
+
+
+def test_disabled_controller_admits_everything():
+    async def run():
+        controller = AdmissionController(max_concurrent=1, enabled=False)
+        for _ in range(5):
+            await controller.acquire("P2")
+        return controller
+
+    assert sum(asyncio.run(run()).active.values()) == 0
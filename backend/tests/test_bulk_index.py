@@ -0,0 +1,124 @@
+import random
+
+from bulk_index import parse_documents
+from chunking import chunk_document, chunk_records, embedding_batches, split_text
+from enhanced_data_loader import EnhancedDataLoader
+from enhanced_rag_pipeline import EnhancedRAGPipeline
+from rate_limiter import estimate_tokens
+from scraped_store import write_records
+
+# As long as the largest page in the real crawl
+LONG_PAGE = 78_700
+
+
+def long_text(chars, seed=0):
+    rng = random.Random(seed)
+    words = ["lineage", "connector", "snowflake", "glossary", "asset", "policy", "crawler", "column"]
+    paragraphs = []
+    while sum(len(p) + 2 for p in paragraphs) < chars:
+        paragraphs.append(" ".join(rng.choice(words) for _ in range(rng.randint(20, 120))))
+    return "\n\n".join(paragraphs)[:chars]
+
+
+def test_split_text_respects_the_token_limit_and_covers_the_text():
+    text = long_text(LONG_PAGE)
+    pieces = split_text(text, max_tokens=2000, overlap_tokens=200)
+    assert len(pieces) > 1
+    assert all(estimate_tokens(piece) <= 2000 for piece in pieces)
+    # Consecutive pieces overlap, and together they cover the whole text
+    position = 0
+    for piece in pieces:
+        start = text.index(piece, max(position - 4 * 200 - 1, 0))
+        assert start <= position
+        position = start + len(piece)
+    assert position == len(text)
+
+
+def test_split_text_prefers_paragraph_breaks():
+    paragraphs = [f"paragraph {i} " + "word " * 300 for i in range(20)]
+    pieces = split_text("\n\n".join(paragraphs), max_tokens=1000, overlap_tokens=0)
+    assert all(piece.endswith("\n\n") for piece in pieces[:-1])
+
+
+def test_split_text_handles_text_without_breaks():
+    pieces = split_text("x" * 50_000, max_tokens=1000, overlap_tokens=100)
+    assert all(estimate_tokens(piece) <= 1000 for piece in pieces)
+    assert sum(len(p) for p in pieces) >= 50_000
+
+
+def test_short_documents_are_one_chunk_and_long_ones_keep_their_title():
+    assert chunk_document({"title": "Short", "text": "Title: Short\n\nContent: hi"}) == ["Title: Short\n\nContent: hi"]
+    doc = {"title": "Snowflake setup", "text": "Title: Snowflake setup\n\nContent: " + long_text(LONG_PAGE)}
+    chunks = chunk_document(doc, max_tokens=2000)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 2000 for chunk in chunks)
+    assert all(chunk.startswith("Title: Snowflake setup\n\n") for chunk in chunks)
+
+
+def test_chunk_records_keep_source_metadata_and_list_duplicates_once():
+    documents = [{"source": "product_docs/a", "title": "A", "type": "product_docs",
+                  "duplicates": ["product_docs/a2"], "chunks": ["one", "two"]}]
+    records = chunk_records(documents)
+    assert [(r["text"], r["chunk"], r["source"], r["title"]) for r in records] == [
+        ("one", 0, "product_docs/a", "A"), ("two", 1, "product_docs/a", "A")]
+    assert [r["duplicates"] for r in records] == [["product_docs/a2"], []]
+
+
+def test_embedding_batches_are_sized_by_estimated_tokens():
+    texts = [long_text(n, seed=n) for n in (8000, 8000, 30_000, 400, 400, 60_000)]
+    batches = list(embedding_batches(texts, max_tokens=12_000))
+    assert [text for batch in batches for text in batch] == texts
+    assert all(estimate_tokens(batch) <= 12_000 for batch in batches if len(batch) > 1)
+    assert list(embedding_batches(["a"] * 10, max_tokens=1_000, max_inputs=4)) == [["a"] * 4, ["a"] * 4, ["a"] * 2]
+
+
+def test_parallel_parse_matches_the_loader_in_order(tmp_path):
+    product = tmp_path / "scraped_data" / "product_docs"
+    product.mkdir(parents=True)
+    pages = [{"url": f"https://docs.atlan.com/page-{i}", "title": f"Page {i}",
+              "content": long_text(LONG_PAGE if i == 3 else 500, seed=i)} for i in range(40)]
+    write_records(product / "atlan_product_docs.jsonl.gz", pages)
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "notes.txt").write_text("Uploaded notes about glossary terms")
+    loader = EnhancedDataLoader(data_dir=tmp_path / "data", scraped_dir=tmp_path / "scraped_data",
+                                uploads_dir=tmp_path / "uploads")
+
+    documents = parse_documents(loader, workers=2, batch_size=7)
+    expected = list(loader.iter_documents(executor="thread"))
+    assert [doc["text"] for doc in documents] == [doc["text"] for doc in expected]
+    assert [len(doc["chunks"]) for doc in documents if len(doc["chunks"]) > 1] == [len(documents[3]["chunks"])]
+    assert all(estimate_tokens(chunk) <= 2000 for doc in documents for chunk in doc["chunks"])
+
+
+def test_regular_build_splits_long_pages_and_skips_only_failing_chunks(tmp_path, monkeypatch):
+    documents = [
+        {"source": "product_docs/long", "title": "Long", "content": long_text(LONG_PAGE),
+         "text": "Title: Long\n\nContent: " + long_text(LONG_PAGE)},
+        {"source": "product_docs/bad", "title": "Bad", "content": "bad page", "text": "Title: Bad\n\nContent: bad"},
+        {"source": "product_docs/short", "title": "Short", "content": "short page", "text": "Title: Short\n\nContent: hi"},
+    ]
+    pipeline = EnhancedRAGPipeline(vectorstore_dir=tmp_path, query_batching=False)
+    monkeypatch.setattr(pipeline.data_loader, "iter_documents", lambda: iter(documents))
+    requests = []
+
+    def embed_texts(texts, *args, **kwargs):
+        requests.append(texts)
+        assert all(estimate_tokens(text) <= 2000 for text in texts)
+        if any("Content: bad" in text for text in texts):
+            raise RuntimeError("rejected")
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(pipeline, "embed_texts", embed_texts)
+    installed = {}
+    monkeypatch.setattr(pipeline, "install_index",
+                        lambda documents, metadata, embeddings: installed.update(docs=metadata, vectors=embeddings))
+    pipeline._build_index()
+
+    docs = installed["docs"]
+    assert [doc["source"] for doc in docs].count("product_docs/long") > 1
+    assert "product_docs/bad" not in {doc["source"] for doc in docs}
+    assert docs[-1]["source"] == "product_docs/short"
+    assert [doc["index"] for doc in docs] == list(range(len(docs)))
+    assert installed["vectors"] == [[float(len(doc["text"]))] for doc in docs]
+    # The long page's chunks went out together, not one request per chunk
+    assert len(requests[0]) == len(docs) + 1
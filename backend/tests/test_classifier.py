@@ -0,0 +1,41 @@
+import pytest
+
+from classifier import URGENT_PATTERN, classification_cache, pre_classify_priority
+
+
+@pytest.mark.parametrize("text", [
+    "How do I connect to BigQuery",
+    "How do I grant the Snowflake connector the permissions it needs?",
+    "How do I set up a prod connection to Snowflake?",
+    "Which downstream assets are blocked by this policy?",
+    "Where is the lineage tab for this dbt model?",
+    "Is there a way to mark columns as critical?",
+])
+def test_everyday_questions_are_not_urgent(text):
+    assert not URGENT_PATTERN.search(text)
+    assert pre_classify_priority(text) != "P0"
+
+
+@pytest.mark.parametrize("text", [
+    "URGENT: lineage disappeared for every table",
+    "Production is down and nobody can log in",
+    "Atlan is down for our whole team",
+    "Our prod instance went down after the upgrade",
+    "We are completely blocked on the migration",
+    "sev1 - data loss after the last sync",
+])
+def test_explicit_urgency_is_p0(text):
+    assert pre_classify_priority(text) == "P0"
+
+
+def test_statements_without_a_question_default_to_p1():
+    assert pre_classify_priority("The Snowflake crawler fails with a permissions error") == "P1"
+
+
+def test_cached_classification_wins_over_keywords():
+    text = "Production is down for our test tenant only"
+    classification_cache.get_or_compute(text, lambda _: {"topic": "Product", "sentiment": "Neutral", "priority": "P2"})
+    try:
+        assert pre_classify_priority(text) == "P2"
+    finally:
+        classification_cache.clear()
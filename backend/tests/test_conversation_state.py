@@ -0,0 +1,115 @@
+import pytest
+
+import conversation_state
+from conversation_state import ConversationStore
+
+FIRST = "How do I set up lineage for BigQuery?"
+ANALYSIS = {"topic": "Lineage", "sentiment": "Neutral", "priority": "P2"}
+CHUNKS = ([{"text": "BigQuery lineage setup", "source": "product_docs/bigquery-lineage"}], [0.8])
+
+
+class StubPipeline:
+    index_version = "v1"
+
+    def __init__(self):
+        self.queries = []
+
+    def retrieve(self, query, top_k=3):
+        self.queries.append(query)
+        return [{"text": f"chunk for {query}", "source": "product_docs/new"}], [0.7]
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(conversation_state, "FOLLOWUP_REWRITE", "heuristic")
+    return ConversationStore()
+
+
+def answered(store, text=FIRST):
+    session = store.get("s1")
+    store.update(session, text, text, "Open the BigQuery connector and ...", ANALYSIS, "v1", CHUNKS)
+    return session
+
+
+@pytest.mark.parametrize("text", [
+    "How do I connect to BigQuery",
+    "How do I grant the Snowflake connector the permissions it needs?",
+    "Where is the lineage tab for this dbt model?",
+    "Snowflake SSO?",
+])
+def test_turns_naming_new_things_are_handled_as_new_questions(store, text):
+    session = answered(store)
+    pipeline = StubPipeline()
+    assert store.rewrite(session, text) == (text, False)
+    assert store.reuse_classification(session, text) is None
+    assert store.retrieve(pipeline, session, text, text) != CHUNKS
+    assert pipeline.queries == [text]
+    assert store.stats["classification_reused"] == store.stats["retrieval_reused"] == 0
+
+
+@pytest.mark.parametrize("text", ["Can you explain that in more detail?", "why?", "Thanks, any examples?", FIRST])
+def test_continuations_reuse_classification_and_chunks(store, text):
+    session = answered(store)
+    pipeline = StubPipeline()
+    standalone, follow_up = store.rewrite(session, text)
+    assert follow_up and FIRST in standalone
+    assert store.reuse_classification(session, text) == ANALYSIS
+    assert store.retrieve(pipeline, session, text, standalone) == CHUNKS
+    assert pipeline.queries == []
+
+
+@pytest.mark.parametrize("text", ["What about Snowflake?", "Why does the Snowflake crawler fail with a timeout?"])
+def test_follow_up_opener_with_new_terms_is_searched_on_its_own(store, text):
+    session = answered(store)
+    pipeline = StubPipeline()
+    standalone, follow_up = store.rewrite(session, text)
+    # The previous topic would pull the search back to BigQuery
+    assert follow_up and standalone == text
+    assert store.reuse_classification(session, text) is None
+    store.retrieve(pipeline, session, text, standalone)
+    assert pipeline.queries == [text]
+    assert store.stats["rewritten"] == 0
+    # The new subject becomes the topic later continuations refer to
+    store.update(session, text, standalone, "...", ANALYSIS, "v1", CHUNKS)
+    assert session.topic == text
+
+
+def test_first_turn_and_urgent_continuations_are_classified(store):
+    session = store.get("s1")
+    assert store.rewrite(session, "more details") == ("more details", False)
+    session = answered(store)
+    assert store.reuse_classification(session, "ASAP please") is None
+
+
+def test_chunks_from_another_index_version_are_not_reused(store):
+    session = answered(store)
+    pipeline = StubPipeline()
+    pipeline.index_version = "v2"
+    store.retrieve(pipeline, session, "more details", "more details")
+    assert len(pipeline.queries) == 1
+
+
+def test_idle_sessions_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conversation_state.time, "monotonic", lambda: now[0])
+    store = ConversationStore(idle_seconds=60)
+    first = store.get("a")
+    now[0] += 30
+    store.get("b")
+    now[0] += 45
+    assert store.get("b") is not None and len(store) == 1
+    assert store.get("a") is not first
+    assert store.stats["evicted_idle"] == 1
+
+
+def test_least_recently_used_sessions_are_evicted_over_the_memory_cap():
+    store = ConversationStore(max_bytes=20_000)
+    for name in ("a", "b", "c"):
+        session = store.get(name)
+        store.update(session, FIRST, FIRST, "x" * 5000, ANALYSIS, "v1", CHUNKS)
+    store.get("a")  # most recently used now
+    session = store.get("d")
+    store.update(session, FIRST, FIRST, "x" * 5000, ANALYSIS, "v1", CHUNKS)
+    assert store.get_stats()["bytes"] <= 20_000
+    assert store.stats["evicted_memory"] >= 1
+    assert "b" not in store._sessions and "a" in store._sessions and "d" in store._sessions
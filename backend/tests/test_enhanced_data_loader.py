@@ -0,0 +1,66 @@
+import threading
+
+from enhanced_data_loader import EnhancedDataLoader
+from scraped_store import write_records
+
+
+def make_corpus(root, pages=5):
+    (root / "scraped_data" / "product_docs").mkdir(parents=True)
+    write_records(root / "scraped_data" / "product_docs" / "atlan_product_docs.jsonl", [
+        {"url": f"https://docs.atlan.com/page-{i}", "title": f"Page {i}", "content": f"Content of page {i}"}
+        for i in range(pages)
+    ])
+
+
+def make_loader(root, **kwargs):
+    return EnhancedDataLoader(data_dir=root / "data", scraped_dir=root / "scraped_data",
+                              uploads_dir=root / "uploads", **kwargs)
+
+
+def test_loader_without_catalog_writes_nothing_next_to_sources(tmp_path):
+    make_corpus(tmp_path)
+    loader = make_loader(tmp_path)
+    documents = list(loader.iter_documents())
+    assert len(documents) == 5
+    assert all(doc["text"].startswith("Title: Page") for doc in documents)
+    assert loader.get_document_stats()["total_documents"] == 5
+    assert not any(p.name.endswith(".json") or p.name.endswith(".tmp")
+                   for p in (tmp_path / "scraped_data").iterdir())
+
+
+def test_catalog_serves_stats_without_reparsing(tmp_path, monkeypatch):
+    make_corpus(tmp_path)
+    catalog_path = tmp_path / "vectorstore" / ".doc_catalog.json"
+    loader = make_loader(tmp_path, catalog_path=catalog_path)
+    list(loader.iter_documents())
+    assert catalog_path.exists()
+
+    def fail(task):
+        raise AssertionError(f"re-parsed {task}")
+
+    monkeypatch.setattr(loader, "load_source", fail)
+    stats = loader.get_document_stats()
+    assert stats["total_documents"] == 5
+    assert stats["by_type"] == {"product_docs": 5}
+
+
+def test_concurrent_catalog_writers_do_not_collide(tmp_path):
+    make_corpus(tmp_path)
+    catalog_path = tmp_path / "vectorstore" / ".doc_catalog.json"
+    loaders = [make_loader(tmp_path, catalog_path=catalog_path) for _ in range(8)]
+    errors = []
+
+    def run(loader):
+        try:
+            for _ in range(20):
+                loader._write_catalog({"n": 1})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(loader,)) for loader in loaders]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert [p.name for p in catalog_path.parent.iterdir()] == [".doc_catalog.json"]
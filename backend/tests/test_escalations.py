@@ -0,0 +1,26 @@
+from escalations import EscalationLog
+
+
+def test_escalations_are_recorded_and_listed_newest_first(tmp_path):
+    log = EscalationLog(tmp_path / "escalations.jsonl")
+    assert log.record("Production is down", "shed", {"priority": "P0"})
+    assert log.record("Data loss after sync", "p0")
+    recent = log.recent()
+    assert [(e["text"], e["reason"]) for e in recent] == [("Data loss after sync", "p0"), ("Production is down", "shed")]
+    assert log.get_stats() == {"recorded": 2, "failed": 0}
+
+
+def test_escalation_log_is_rotated_and_bounded(tmp_path):
+    log = EscalationLog(tmp_path / "escalations.jsonl", max_bytes=300)
+    for i in range(20):
+        log.record(f"ticket {i}", "p0")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["escalations.jsonl", "escalations.jsonl.1"]
+    assert log.recent(1)[0]["text"] == "ticket 19"
+
+
+def test_unwritable_log_reports_failure(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    log = EscalationLog(blocker / "escalations.jsonl")
+    assert not log.record("Production is down", "shed")
+    assert log.get_stats()["failed"] == 1
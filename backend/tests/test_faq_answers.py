@@ -0,0 +1,66 @@
+import threading
+
+from faq_answers import FAQStore
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault("log_questions", True)
+    return FAQStore(vectorstore_dir=tmp_path, **kwargs)
+
+
+def test_question_log_is_opt_in(tmp_path):
+    store = make_store(tmp_path, log_questions=False)
+    store.record_question("How do I set up SSO with Okta?")
+    assert not store.log_path.exists()
+    assert store.mine_questions(min_count=1) == []
+
+
+def test_frequent_questions_are_mined_with_one_phrasing(tmp_path):
+    store = make_store(tmp_path)
+    for text in ["How do I set up SSO?", "how do I set up SSO", "How do I set up SSO?", "What is lineage?"]:
+        store.record_question(text)
+    assert store.mine_questions(min_count=3) == ["How do I set up SSO?"]
+    assert store.mine_questions(min_count=1) == ["How do I set up SSO?", "What is lineage?"]
+
+
+def test_log_rotates_at_size_limit_and_mining_reads_both_files(tmp_path):
+    store = make_store(tmp_path, log_max_bytes=200)
+    for _ in range(10):
+        store.record_question("How do I connect Snowflake?")
+    assert store.rotated_log_path.exists()
+    assert store.log_path.stat().st_size < 200 + 100
+    assert store.stats["rotations"] >= 1
+    # Only the current and one previous file are kept
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["question_log.jsonl", "question_log.jsonl.1"]
+    rotated_lines = len(store.rotated_log_path.read_text().splitlines())
+    current_lines = len(store.log_path.read_text().splitlines())
+    assert store.mine_questions(min_count=rotated_lines + current_lines) == ["How do I connect Snowflake?"]
+
+
+def test_exact_and_near_lookups_only_serve_the_matching_index_version(tmp_path):
+    store = make_store(tmp_path)
+    entry = {"question": "How does Atlan connect with Snowflake?", "analysis": {}, "answer": "...", "sources": []}
+    store.save([entry], index_version="v1")
+
+    assert store.lookup("how does atlan connect with snowflake", "v1") == entry
+    assert store.lookup("How does Atlan connect to Snowflake?", "v1") == entry
+    assert store.lookup("How does Atlan connect with Snowflake?", "v2") is None
+    assert store.lookup("What is a glossary term?", "v1") is None
+    stats = store.get_stats()
+    assert (stats["exact_hits"], stats["near_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_stats_are_safe_under_concurrent_lookups(tmp_path):
+    store = make_store(tmp_path)
+    store.save([{"question": "What is lineage?", "analysis": {}, "answer": "...", "sources": []}], "v1")
+
+    def run():
+        for _ in range(2000):
+            store.lookup("What is lineage?", "v1")
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.get_stats()["exact_hits"] == 16000
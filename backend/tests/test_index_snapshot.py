@@ -0,0 +1,114 @@
+import gzip
+import io
+import tarfile
+
+import faiss
+import numpy as np
+import pytest
+
+from enhanced_rag_pipeline import EMBEDDING_MODEL, EnhancedRAGPipeline
+from index_snapshot import (SnapshotError, checksum_path, export_snapshot, import_snapshot, read_manifest,
+                            verify_snapshot)
+
+
+def make_pipeline(path, documents=20):
+    pipeline = EnhancedRAGPipeline(vectorstore_dir=path, query_batching=False)
+    vectors = np.random.default_rng(0).normal(size=(documents, 16)).astype("float32")
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(16)
+    index.add(vectors)
+    pipeline.save_index(index, [{"text": f"doc {i}", "source": f"product_docs/{i}"} for i in range(documents)])
+    return pipeline
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    source = make_pipeline(tmp_path / "source")
+    path = tmp_path / "index.tar.gz"
+    manifest = export_snapshot(source, path)
+    return source, path, manifest
+
+
+def rewrite_member(path, name, data):
+    """Copy of the archive with one member's contents replaced, manifest untouched"""
+    out = io.BytesIO()
+    with tarfile.open(path, "r:gz") as src, tarfile.open(fileobj=out, mode="w:gz") as dst:
+        for member in src:
+            content = src.extractfile(member).read()
+            if member.name == name:
+                content = data
+            member.size = len(content)
+            dst.addfile(member, io.BytesIO(content))
+    path.write_bytes(out.getvalue())
+
+
+def test_exported_snapshot_verifies_and_imports(snapshot, tmp_path):
+    source, path, manifest = snapshot
+    assert checksum_path(path).exists()
+    assert read_manifest(path)["index_version"] == source.read_version()
+    assert verify_snapshot(path, EMBEDDING_MODEL)["count"] == 20
+
+    replica = EnhancedRAGPipeline(vectorstore_dir=tmp_path / "replica", query_batching=False)
+    assert import_snapshot(replica, path)
+    assert replica.index_version == source.read_version()
+    assert replica.index.ntotal == 20 and replica.docs[3]["source"] == "product_docs/3"
+    # Same version again is a no-op unless forced
+    assert not import_snapshot(replica, path)
+    assert import_snapshot(replica, path, force=True)
+    assert not (tmp_path / "replica" / ".snapshot_import").exists()
+
+
+def test_tampered_member_is_rejected(snapshot):
+    _, path, _ = snapshot
+    checksum_path(path).unlink()
+    rewrite_member(path, "meta.pkl", b"not the metadata")
+    with pytest.raises(SnapshotError, match="Checksum mismatch for meta.pkl"):
+        verify_snapshot(path, EMBEDDING_MODEL)
+
+
+def test_archive_not_matching_its_checksum_file_is_rejected(snapshot):
+    _, path, _ = snapshot
+    rewrite_member(path, "index.faiss", path.read_bytes()[:10])
+    with pytest.raises(SnapshotError, match="does not match its checksum file"):
+        verify_snapshot(path, EMBEDDING_MODEL)
+
+
+def test_truncated_archive_is_rejected(snapshot):
+    _, path, _ = snapshot
+    checksum_path(path).unlink()
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    with pytest.raises(SnapshotError):
+        verify_snapshot(path, EMBEDDING_MODEL)
+
+
+def test_snapshot_from_another_embedding_model_is_rejected(snapshot):
+    _, path, _ = snapshot
+    with pytest.raises(SnapshotError, match="built with"):
+        verify_snapshot(path, "some-other-embedding-model")
+
+
+def test_failed_import_keeps_the_installed_index(snapshot, tmp_path):
+    _, path, _ = snapshot
+    replica = make_pipeline(tmp_path / "replica", documents=5)
+    version = replica.read_version()
+    checksum_path(path).unlink()
+    rewrite_member(path, "index.faiss", b"garbage")
+    with pytest.raises(SnapshotError):
+        import_snapshot(replica, path)
+    assert replica.read_version() == version
+    replica.load_index()
+    assert replica.index.ntotal == 5
+    assert not (tmp_path / "replica" / ".snapshot_import").exists()
+
+
+def test_archive_without_manifest_is_rejected(tmp_path):
+    path = tmp_path / "index.tar.gz"
+    with tarfile.open(path, "w:gz") as tar:
+        info = tarfile.TarInfo("index.faiss")
+        tar.addfile(info, io.BytesIO(b""))
+    with pytest.raises(SnapshotError, match="no manifest"):
+        read_manifest(path)
+    path.write_bytes(gzip.compress(b"not a tar"))
+    with pytest.raises(SnapshotError):
+        read_manifest(path)
@@ -0,0 +1,174 @@
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import enhanced_rag_pipeline
+import model_router
+from enhanced_rag_pipeline import TRUNCATED_ANSWER, EnhancedRAGPipeline
+from model_router import (DEFAULT_ROUTE, ROUTES, DeadlineExceeded, RouteStats, choose_route, estimate_abandoned_cost,
+                          estimate_cost, fallback_route, primary_budget, with_deadline)
+from rate_limiter import INTERACTIVE, BACKGROUND, RateLimitScheduler
+
+SHORT = "How do I add a README to an asset?"
+P2 = {"topic": "Product", "priority": "P2"}
+
+
+@pytest.mark.parametrize("query, analysis, score, threshold, expected", [
+    (SHORT, P2, 0.60, 0.40, "fast"),
+    (SHORT, P2, 0.45, 0.40, "standard"),           # too close to the gating threshold
+    (SHORT, P2, 0.55, None, "fast"),               # gating off: absolute score
+    (SHORT, P2, 0.45, None, "standard"),
+    (SHORT, P2, None, None, "standard"),
+    (SHORT, {"topic": "Product", "priority": "P1"}, 0.9, 0.4, "standard"),
+    (SHORT, {"topic": "API/SDK", "priority": "P1"}, 0.9, 0.4, "deep"),
+    (" ".join(["word"] * 60), P2, 0.9, 0.4, "deep"),
+    (" ".join(["word"] * 20), P2, 0.9, 0.4, "standard"),
+])
+def test_choose_route(query, analysis, score, threshold, expected, monkeypatch):
+    monkeypatch.setattr(model_router, "ROUTING_ENABLED", True)
+    assert choose_route(query, analysis, score, threshold)["name"] == expected
+
+
+def test_routing_disabled_uses_the_default_route(monkeypatch):
+    monkeypatch.setattr(model_router, "ROUTING_ENABLED", False)
+    assert choose_route(" ".join(["word"] * 60), {"topic": "API/SDK", "priority": "P1"}, 0.9) is DEFAULT_ROUTE
+
+
+def test_fallback_route_is_fast_and_short():
+    fallback = fallback_route(ROUTES["deep"])
+    assert fallback["name"] == "deep_fallback"
+    assert fallback["model"] == ROUTES["fast"]["model"]
+    assert fallback["max_tokens"] == min(model_router.FALLBACK_MAX_TOKENS, ROUTES["deep"]["max_tokens"])
+
+
+def test_primary_budget_keeps_a_reserve_for_the_fallback():
+    assert primary_budget(None) is None
+    assert primary_budget(20) == pytest.approx(20 * (1 - model_router.FALLBACK_RESERVE))
+    # Short deadlines keep at least MIN_FALLBACK_SECONDS, but never more than half
+    assert primary_budget(2) == pytest.approx(1.0)
+    assert primary_budget(1.5) == pytest.approx(0.75)
+
+
+def test_cost_estimates():
+    usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=200,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=400))
+    assert estimate_cost("gpt-4o-mini", usage) == pytest.approx((600 * 0.15 + 400 * 0.075 + 200 * 0.60) / 1e6)
+    assert estimate_cost("unknown-model", usage) is None
+    assert estimate_cost("gpt-4o", None) is None
+    assert estimate_abandoned_cost("gpt-4o", 1000, 1500) == pytest.approx((1000 * 2.50 + 1500 * 10.00) / 1e6)
+
+
+def test_with_deadline_passes_the_time_left_after_queueing():
+    now = [100.0]
+    seen = []
+    call = with_deadline(lambda timeout: seen.append(timeout) or "ok", deadline_at=110.0, clock=lambda: now[0])
+    now[0] = 104.0  # four seconds in the rate-limit queue
+    assert call() == "ok" and seen == [6.0]
+    assert with_deadline(lambda timeout: timeout, None, lambda: 0.0)() is None
+
+
+def test_with_deadline_raises_when_queued_past_the_deadline_without_sending():
+    sent = []
+    call = with_deadline(lambda timeout: sent.append(timeout), deadline_at=10.0, clock=lambda: 12.0)
+    with pytest.raises(DeadlineExceeded) as exc:
+        call()
+    assert not exc.value.sent and sent == []
+
+
+def test_with_deadline_turns_sdk_timeouts_into_deadline_exceeded():
+    def create(timeout):
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+    with pytest.raises(DeadlineExceeded) as exc:
+        with_deadline(create, deadline_at=10.0, clock=lambda: 0.0)()
+    assert exc.value.sent
+
+
+def response(text, prompt=500, completion=100):
+    usage = SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, prompt_tokens_details=None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    pipeline = EnhancedRAGPipeline(vectorstore_dir=tmp_path, query_batching=False)
+    monkeypatch.setattr(enhanced_rag_pipeline, "route_stats", RouteStats())
+    return pipeline
+
+
+def stub_chat(monkeypatch, pipeline, *outcomes):
+    calls = []
+
+    def chat(messages, route, deadline_at, priority):
+        calls.append((route["name"], route["max_tokens"], deadline_at))
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(pipeline, "_chat", chat)
+    return calls
+
+
+MESSAGES = [{"role": "user", "content": "x" * 4000}]
+
+
+def test_primary_answer_within_its_budget(pipeline, monkeypatch):
+    calls = stub_chat(monkeypatch, pipeline, response("answer"))
+    assert pipeline._generate_routed(MESSAGES, ROUTES["standard"], INTERACTIVE) == ("answer", "ok")
+    assert calls[0][0] == "standard" and calls[0][2] is not None
+    stats = enhanced_rag_pipeline.route_stats.get_stats()["stats"]["standard"]
+    assert stats["ok"] == 1 and stats["cost_usd"] == pytest.approx(estimate_cost("gpt-4o-mini", response("").usage))
+
+
+def test_timed_out_primary_falls_back_and_is_still_costed(pipeline, monkeypatch):
+    calls = stub_chat(monkeypatch, pipeline, DeadlineExceeded("timeout", sent=True), response("short answer"))
+    route = ROUTES["deep"]
+    assert pipeline._generate_routed(MESSAGES, route, INTERACTIVE) == ("short answer", "fallback")
+    assert [c[0] for c in calls] == ["deep", "deep_fallback"]
+    assert calls[1][2] > calls[0][2]  # the fallback gets the reserve on top of the primary budget
+    stats = enhanced_rag_pipeline.route_stats.get_stats()["stats"]["deep"]
+    prompt = enhanced_rag_pipeline.estimate_tokens([MESSAGES[0]["content"]])
+    expected = (estimate_abandoned_cost(route["model"], prompt, route["max_tokens"])
+                + estimate_cost(ROUTES["fast"]["model"], response("").usage))
+    assert stats["fallback"] == 1 and stats["cost_usd"] == pytest.approx(expected, abs=1e-6)
+
+
+def test_calls_that_never_left_the_queue_cost_nothing(pipeline, monkeypatch):
+    stub_chat(monkeypatch, pipeline, DeadlineExceeded("queued"), DeadlineExceeded("queued"))
+    assert pipeline._generate_routed(MESSAGES, ROUTES["fast"], INTERACTIVE) == (None, "truncated")
+    stats = enhanced_rag_pipeline.route_stats.get_stats()["stats"]["fast"]
+    assert stats["truncated"] == 1 and stats["cost_usd"] == 0
+
+
+def test_answers_stuck_behind_the_rate_limit_are_truncated_at_the_deadline(pipeline, monkeypatch):
+    # Real scheduler with an exhausted chat lane: the next slot frees long after the deadline
+    scheduler = RateLimitScheduler({"chat": (1, 1_000_000)})
+    scheduler.lanes["chat"].requests.tokens = 0
+    monkeypatch.setattr(enhanced_rag_pipeline, "scheduler", scheduler)
+    monkeypatch.setattr(enhanced_rag_pipeline, "get_client", lambda: pytest.fail("request sent"))
+    route = {**ROUTES["standard"], "deadline": 2.0}
+    start = time.monotonic()
+    assert pipeline._generate_routed(MESSAGES, route, INTERACTIVE) == (None, "truncated")
+    assert time.monotonic() - start < 0.5
+    assert scheduler.lanes["chat"].stats["expired"] == 2
+    assert enhanced_rag_pipeline.route_stats.get_stats()["stats"]["standard"]["cost_usd"] == 0
+
+
+def test_background_generation_has_no_deadline(pipeline, monkeypatch):
+    calls = stub_chat(monkeypatch, pipeline, response("answer"))
+    pipeline._generate_routed(MESSAGES, ROUTES["fast"], BACKGROUND)
+    assert calls[0][2] is None
+
+
+def test_out_of_time_answer_lists_the_sources(pipeline, monkeypatch):
+    stub_chat(monkeypatch, pipeline, DeadlineExceeded("timeout", sent=True), DeadlineExceeded("timeout", sent=True))
+    monkeypatch.setattr(pipeline, "maybe_reload", lambda: None)
+    pipeline.index, pipeline.docs = object(), []
+    retrieved = [{"text": "Add a README from the asset profile", "source": "product_docs/readme", "index": 0}]
+    result = pipeline.generate_answer(SHORT, retrieval=(retrieved, [0.3]), analysis=P2)
+    assert result["degraded"] == "truncated"
+    assert result["answer"] == TRUNCATED_ANSWER + "\n- product_docs/readme"
@@ -0,0 +1,91 @@
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+from enhanced_data_loader import EnhancedDataLoader
+from near_duplicates import SIMHASH_BITS, SimHashIndex, collapse_near_duplicates, hamming, simhash
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def flip_bits(fingerprint, count, rng):
+    for bit in rng.sample(range(SIMHASH_BITS), count):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def test_texts_without_words_have_no_fingerprint():
+    assert simhash("") is None
+    assert simhash("  --- !!! ") is None
+    assert simhash("one") is not None
+
+
+def test_wordless_documents_are_never_merged():
+    documents = [{"source": f"page-{i}", "content": text} for i, text in enumerate(["", " ", "...", ""])]
+    kept, collapsed = collapse_near_duplicates(documents, 3, text_key="content")
+    assert collapsed == 0
+    assert [doc["source"] for doc in kept] == ["page-0", "page-1", "page-2", "page-3"]
+
+
+def test_index_finds_fingerprints_within_max_distance_only():
+    rng = random.Random(3)
+    index = SimHashIndex(max_distance=3)
+    fingerprints = [rng.getrandbits(SIMHASH_BITS) for _ in range(200)]
+    for key, fingerprint in enumerate(fingerprints):
+        index.add(key, fingerprint)
+    assert len(index) == 200
+
+    for key, fingerprint in enumerate(fingerprints[:50]):
+        for distance in range(4):
+            assert index.find(flip_bits(fingerprint, distance, rng)) == key
+        # Random 64-bit fingerprints are ~32 bits apart, so 8 flips match nothing
+        assert index.find(flip_bits(fingerprint, 8, rng)) is None
+
+
+def test_index_banding_matches_a_pairwise_scan():
+    rng = random.Random(5)
+    index = SimHashIndex(max_distance=4)
+    base = rng.getrandbits(SIMHASH_BITS)
+    stored = [flip_bits(base, rng.randint(3, 12), rng) for _ in range(300)]
+    for key, fingerprint in enumerate(stored):
+        index.add(key, fingerprint)
+    for _ in range(200):
+        probe = flip_bits(base, rng.randint(0, 10), rng)
+        expected = any(hamming(probe, fingerprint) <= 4 for fingerprint in stored)
+        match = index.find(probe)
+        assert (match is not None) == expected
+        if match is not None:
+            assert hamming(probe, stored[match]) <= 4
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """The scraped Atlan pages shipped with the repo"""
+    tmp = tmp_path_factory.mktemp("loader")
+    loader = EnhancedDataLoader(data_dir=tmp / "data", scraped_dir=BACKEND_DIR / "scraped_data", uploads_dir=tmp / "uploads")
+    documents = [doc for doc in loader.iter_documents() if doc["type"] != "existing_data"]
+    if not documents:
+        pytest.skip("no scraped corpus in the checkout")
+    return documents
+
+
+def test_distinct_pages_sharing_navigation_are_kept(corpus):
+    # Every page repeats the site navigation; the closest distinct pages are still >3 bits apart
+    kept, collapsed = collapse_near_duplicates([dict(doc) for doc in corpus], 3, text_key="content")
+    assert collapsed == 0
+
+
+def test_redated_copies_of_real_pages_collapse_into_their_original(corpus):
+    # A re-published or versioned copy: same page, different "last updated" dates
+    documents = []
+    for doc in corpus:
+        documents.append(dict(doc))
+        documents.append({**doc, "source": doc["source"] + "?v=2",
+                          "content": re.sub(r"\d{4}-\d{2}-\d{2}", "2026-01-01", doc["content"])})
+    kept, collapsed = collapse_near_duplicates(documents, 3, text_key="content")
+
+    assert collapsed >= 0.9 * len(corpus)
+    for doc in kept:
+        assert doc.get("duplicates", []) in ([], [doc["source"] + "?v=2"])
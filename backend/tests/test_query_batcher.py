@@ -0,0 +1,100 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from metrics import rag_stage_seconds, record_usage
+from query_batcher import QueryBatcher
+
+
+def embed_batch(texts):
+    record_usage("embeddings", SimpleNamespace(prompt_tokens=10 * len(texts), completion_tokens=None))
+    vecs = np.ones((len(texts), 4), dtype="float32")
+    return vecs / 2
+
+
+def search_batch(qvecs, k):
+    n = len(qvecs)
+    return np.zeros((n, k), dtype="float32"), np.tile(np.arange(k), (n, 1))
+
+
+def stage_count(stage):
+    series = rag_stage_seconds._series.get((stage,))
+    return series[-1] if series else 0
+
+
+def test_concurrent_queries_share_one_batch():
+    batcher = QueryBatcher(embed_batch, search_batch, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit(f"question {i}", top_k=2) for i in range(4)]
+    results = [f.result(timeout=2) for f in futures]
+    batcher.close()
+
+    assert batcher.stats["batches"] == 1
+    assert batcher.stats["max_batch"] == 4
+    for qvec, distances, indices in results:
+        assert qvec.shape == (4,)
+        assert list(indices) == [0, 1]
+
+
+def test_stage_histograms_are_observed_once_per_batch():
+    before = stage_count("embed")
+    batcher = QueryBatcher(embed_batch, search_batch, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit(f"q{i}") for i in range(5)]
+    for f in futures:
+        f.result(timeout=2)
+    batcher.close()
+    assert stage_count("embed") - before == batcher.stats["batches"] == 1
+
+
+def test_embedding_tokens_are_split_across_the_batch():
+    batcher = QueryBatcher(embed_batch, search_batch, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit("same length a"), batcher.submit("same length b")]
+    for f in futures:
+        f.result(timeout=2)
+    batcher.close()
+    assert [f.tokens for f in futures] == [{"embeddings_prompt": 10}, {"embeddings_prompt": 10}]
+
+
+def test_errors_reach_every_caller():
+    def failing(texts):
+        raise RuntimeError("embeddings down")
+
+    batcher = QueryBatcher(failing, search_batch, max_wait_ms=20)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    for f in futures:
+        assert isinstance(f.exception(timeout=2), RuntimeError)
+    batcher.close()
+
+
+def test_only_the_bad_query_of_a_failed_batch_fails():
+    def embed_unless_oversized(texts):
+        if any(len(text) > 100 for text in texts):
+            raise ValueError("input too long")
+        return embed_batch(texts)
+
+    batcher = QueryBatcher(embed_unless_oversized, search_batch, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit("fine"), batcher.submit("x" * 500), batcher.submit("also fine")]
+    assert isinstance(futures[1].exception(timeout=2), ValueError)
+    assert futures[0].result(timeout=2)[2].tolist() == [0, 1, 2]
+    assert futures[2].result(timeout=2) is not None
+    batcher.close()
+    assert batcher.get_stats()["split"] == 1
+
+
+def test_batches_are_embedded_concurrently():
+    in_flight = threading.Semaphore(0)
+    release = threading.Event()
+
+    def slow_embed(texts):
+        in_flight.release()
+        assert release.wait(timeout=2)
+        return embed_batch(texts)
+
+    batcher = QueryBatcher(slow_embed, search_batch, max_batch_size=1, max_wait_ms=0, max_in_flight=2)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+    # Both batches reach the embeddings call before either finishes
+    assert in_flight.acquire(timeout=2) and in_flight.acquire(timeout=2)
+    release.set()
+    for f in futures:
+        f.result(timeout=2)
+    batcher.close()
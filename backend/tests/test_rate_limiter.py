@@ -0,0 +1,183 @@
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from rate_limiter import RateLimitScheduler, DeadlineExceeded, INTERACTIVE, BACKGROUND, estimate_tokens
+
+
+def make_error(cls, status, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, request=request, headers=headers or {})
+    return cls("error", response=response, body=None)
+
+
+def fast_scheduler(**kwargs):
+    kwargs.setdefault("max_retries", 3)
+    kwargs.setdefault("base_delay", 0.001)
+    kwargs.setdefault("max_delay", 0.01)
+    return RateLimitScheduler({"chat": (6000, 1_000_000)}, **kwargs)
+
+
+def test_estimate_tokens_sums_lists():
+    assert estimate_tokens("a" * 40) == 11
+    assert estimate_tokens(["a" * 40, "b" * 8]) == 11 + 3
+
+
+def test_interactive_work_is_served_before_queued_background_work():
+    # 600 requests/min: an empty bucket frees one slot every 0.1s
+    scheduler = RateLimitScheduler({"chat": (600, 1_000_000)})
+    scheduler.lanes["chat"].requests.tokens = 0
+    order = []
+
+    def worker(name, priority):
+        scheduler.acquire("chat", priority=priority)
+        order.append(name)
+
+    background = threading.Thread(target=worker, args=("background", BACKGROUND))
+    interactive = threading.Thread(target=worker, args=("interactive", INTERACTIVE))
+    background.start()
+    time.sleep(0.02)
+    interactive.start()
+    background.join(2)
+    interactive.join(2)
+
+    assert order == ["interactive", "background"]
+    assert scheduler.lanes["chat"].stats["queued"] == 2
+
+
+def test_acquire_waits_for_token_budget():
+    scheduler = RateLimitScheduler({"embeddings": (6000, 6000)})  # 100 tokens/s
+    scheduler.lanes["embeddings"].tokens.tokens = 0
+    start = time.monotonic()
+    scheduler.acquire("embeddings", tokens=20)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_acquire_gives_up_at_once_when_the_budget_frees_after_the_deadline():
+    scheduler = RateLimitScheduler({"chat": (60, 1_000_000)})  # one slot per second
+    scheduler.lanes["chat"].requests.tokens = 0
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as exc:
+        scheduler.call("chat", lambda: pytest.fail("sent after the deadline"), deadline_at=start + 0.2)
+    assert not exc.value.sent
+    assert time.monotonic() - start < 0.1
+    lane = scheduler.lanes["chat"]
+    assert lane.stats["expired"] == 1 and lane.waiters == []
+
+
+def test_queued_behind_other_work_until_the_deadline():
+    # 120 requests/min: the head of the queue waits 0.5s for its slot
+    scheduler = RateLimitScheduler({"chat": (120, 1_000_000)})
+    scheduler.lanes["chat"].requests.tokens = 0
+    head = threading.Thread(target=scheduler.acquire, args=("chat",))
+    head.start()
+    time.sleep(0.02)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire("chat", priority=BACKGROUND, deadline_at=start + 0.15)
+    assert 0.1 <= time.monotonic() - start < 0.4
+    assert len(scheduler.lanes["chat"].waiters) == 1
+    head.join(2)
+    assert not head.is_alive() and scheduler.lanes["chat"].waiters == []
+
+
+def test_no_retry_when_the_backoff_would_pass_the_deadline():
+    scheduler = fast_scheduler()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise make_error(openai.RateLimitError, 429, headers={"retry-after": "7"})
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as exc:
+        scheduler.call("chat", fn, deadline_at=start + 1.0)
+    assert not exc.value.sent
+    assert len(calls) == 1 and time.monotonic() - start < 0.5
+    assert scheduler.lanes["chat"].stats["expired"] == 1
+    assert scheduler.lanes["chat"].stats["retries"] == 0
+
+
+def test_rate_limited_calls_are_retried_and_slow_the_lane():
+    scheduler = fast_scheduler()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) < 3:
+            raise make_error(openai.RateLimitError, 429)
+        return "ok"
+
+    assert scheduler.call("chat", fn) == "ok"
+    lane = scheduler.lanes["chat"]
+    assert len(calls) == 3
+    assert lane.stats["throttled"] == 2
+    assert lane.stats["retries"] == 2
+    # Halved twice, then recovered a little by the success
+    assert lane.factor == pytest.approx(0.25 + 0.05)
+
+
+def test_retries_give_up_after_max_retries():
+    scheduler = fast_scheduler(max_retries=2)
+
+    def fn():
+        raise make_error(openai.InternalServerError, 500)
+
+    with pytest.raises(openai.InternalServerError):
+        scheduler.call("chat", fn)
+    assert scheduler.lanes["chat"].stats["retries"] == 2
+    assert scheduler.lanes["chat"].stats["failed"] == 1
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    scheduler = fast_scheduler()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise make_error(openai.BadRequestError, 400)
+
+    with pytest.raises(openai.BadRequestError):
+        scheduler.call("chat", fn)
+    assert len(calls) == 1
+
+
+def test_insufficient_quota_is_not_retried():
+    scheduler = fast_scheduler()
+    error = make_error(openai.RateLimitError, 429)
+    error.code = "insufficient_quota"
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise error
+
+    with pytest.raises(openai.RateLimitError):
+        scheduler.call("chat", fn)
+    assert len(calls) == 1
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    scheduler = RateLimitScheduler({"chat": (60, 1000)}, base_delay=0.5, max_delay=4.0)
+    error = make_error(openai.RateLimitError, 429)
+    for attempt in range(8):
+        delay = scheduler._backoff(attempt, error)
+        assert 0 <= delay <= min(4.0, 0.5 * 2 ** attempt)
+
+
+def test_backoff_honours_retry_after():
+    scheduler = RateLimitScheduler({"chat": (60, 1000)}, base_delay=0.01, max_delay=0.1)
+    error = make_error(openai.RateLimitError, 429, headers={"retry-after": "7"})
+    assert scheduler._backoff(0, error) == 7.0
+
+
+def test_settle_corrects_token_reservation():
+    scheduler = RateLimitScheduler({"chat": (60, 6000)})
+    lane = scheduler.lanes["chat"]
+    scheduler.acquire("chat", tokens=1000)
+    reserved = lane.tokens.tokens
+    scheduler.settle("chat", estimated=1000, actual=400)
+    assert lane.tokens.tokens == pytest.approx(reserved + 600)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import enhanced_rag_pipeline
+from enhanced_rag_pipeline import EnhancedRAGPipeline
+from score_gate import OFF_TOPIC_QUERIES, calibrate_threshold, calibration_probes
+from vector_index import create_faiss_index
+
+
+def test_threshold_sits_above_off_topic_scores_when_distributions_separate():
+    in_domain = np.linspace(0.6, 0.9, 50)
+    off_topic = np.linspace(0.1, 0.3, 20)
+    calibration = calibrate_threshold(in_domain, off_topic, max_in_domain_skip=0.1)
+    assert calibration["score_threshold"] == pytest.approx(np.percentile(off_topic, 95), abs=1e-4)
+    assert (in_domain >= calibration["score_threshold"]).all()
+    assert calibration["score_calibration"]["in_domain_probes"] == 50
+    assert calibration["score_calibration"]["off_topic_probes"] == 20
+
+
+def test_threshold_is_capped_by_in_domain_skip_budget_when_distributions_overlap():
+    in_domain = np.linspace(0.3, 0.8, 100)
+    off_topic = np.linspace(0.2, 0.7, 100)
+    calibration = calibrate_threshold(in_domain, off_topic, max_in_domain_skip=0.1)
+    skipped = (in_domain < calibration["score_threshold"]).mean()
+    assert skipped <= 0.1
+    assert calibration["score_threshold"] < calibration["score_calibration"]["off_topic_p95"]
+
+
+def test_probes_use_titles_or_opening_words_and_are_reproducible():
+    documents = [{"title": f"Doc {i}", "content": "body"} for i in range(10)]
+    documents += [{"title": "", "content": "one two three " * 10}, {"title": "", "content": "  "}]
+    probes = calibration_probes(documents, n=12)
+    assert probes == calibration_probes(documents, n=12)
+    assert len(probes) == 11
+    assert "one two three one two three one two three one two three" in probes
+
+
+def test_calibration_scores_probes_through_the_serving_search_path(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 32)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    documents = [{"title": f"Doc {i}", "content": "body"} for i in range(len(vectors))]
+    probes = calibration_probes(documents)
+    queries = rng.normal(size=(len(probes) + len(OFF_TOPIC_QUERIES), 32)).astype("float32")
+
+    pipeline = EnhancedRAGPipeline(vectorstore_dir=tmp_path, query_batching=False)
+    pipeline.index = create_faiss_index(vectors, "sq8")
+    pipeline.full_vectors = vectors
+    pipeline.rescore_factor = 1  # serve straight from the compressed index
+    monkeypatch.setattr(pipeline, "embed_texts", lambda texts, **kwargs: queries[:len(texts)])
+    seen = {}
+
+    def record(in_domain, off_topic):
+        seen["scores"] = np.concatenate([in_domain, off_topic])
+        return {"score_threshold": 0.0, "score_calibration": {}}
+
+    monkeypatch.setattr(enhanced_rag_pipeline, "calibrate_threshold", record)
+    pipeline._calibrate_score_gate(documents)
+
+    qvecs = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    served = pipeline.search_vectors(qvecs, 1)[0][:, 0]
+    exact = (qvecs @ vectors.T).max(axis=1)
+    np.testing.assert_allclose(seen["scores"], served, rtol=1e-5)
+    assert not np.allclose(seen["scores"], exact, rtol=1e-5, atol=0)
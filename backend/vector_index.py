@@ -0,0 +1,78 @@
+# vector_index.py
+import faiss
+import numpy as np
+
+# Index types for RAG_INDEX_TYPE. Bytes per vector at d=1536:
+#   flat  6144 (float32, exact)      fp16  3072 (half precision)
+#   sq8   1536 (8-bit scalar quant)  pq    m bytes (product quantization, m subquantizers)
+INDEX_TYPES = ("flat", "fp16", "sq8", "pq")
+
+# IP metric fill value FAISS uses for missing results
+EMPTY_SCORE = float(np.finfo("float32").min)
+
+
+def _pq_subquantizers(dim, requested):
+    """Largest divisor of dim that is <= requested (PQ needs dim % m == 0)"""
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def create_faiss_index(vectors, index_type="flat", pq_m=64):
+    """Build an inner-product index of the requested type over normalized vectors"""
+    dim = vectors.shape[1]
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "pq":
+        if len(vectors) < 256:
+            # 8-bit PQ trains 256 centroids per subquantizer; fewer points cannot train it
+            print(f"Only {len(vectors)} vectors, too few to train PQ; using sq8 instead")
+            return create_faiss_index(vectors, "sq8")
+        index = faiss.IndexPQ(dim, _pq_subquantizers(dim, pq_m), 8, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def rescore_search(index, vectors, qvecs, top_k, factor):
+    """Search ``top_k * factor`` candidates in a compressed index, then rerank them exactly.
+
+    ``vectors`` holds the full-precision vectors (typically a read-only np.memmap), so only
+    the candidates' rows are touched.
+    """
+    _, candidates = index.search(qvecs, top_k * factor)
+    distances = np.full((len(qvecs), top_k), EMPTY_SCORE, dtype="float32")
+    indices = np.full((len(qvecs), top_k), -1, dtype="int64")
+    for row, cand in enumerate(candidates):
+        # Sorted row ids keep memmap reads sequential
+        cand = np.sort(cand[cand >= 0])
+        if len(cand) == 0:
+            continue
+        exact = np.asarray(vectors[cand]) @ qvecs[row]
+        order = np.argsort(-exact)[:top_k]
+        distances[row, :len(order)] = exact[order]
+        indices[row, :len(order)] = cand[order]
+    return distances, indices
+
+
+def describe_index_type(index):
+    """Map a FAISS index back to its RAG_INDEX_TYPE name"""
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat"
+
+
+def index_nbytes(index):
+    """Serialized size of an index, a close proxy for its in-memory footprint"""
+    return int(faiss.serialize_index(index).nbytes)
@@ -1,5 +1,6 @@
 import requests
 from bs4 import BeautifulSoup
+import gzip
 import os
 import time
 from pathlib import Path
@@ -7,13 +8,29 @@ import json
 from urllib.parse import urljoin, urlparse
 import re
 
+from datetime import datetime, timezone
+
+from crawl_frontier import CrawlFrontier, parse_sitemap
+from near_duplicates import NEAR_DUPLICATE_DISTANCE, SimHashIndex, simhash
+from scraped_store import find_scraped_file, iter_records, write_records
+
+# Scraped page storage: jsonl.gz (compact, streamable), jsonl, or the legacy indented json
+SCRAPE_FORMAT = os.getenv("SCRAPE_FORMAT", "jsonl.gz")
+# Also write a human-readable .txt dump next to the data file
+SCRAPE_TEXT_DUMP = os.getenv("SCRAPE_TEXT_DUMP", "false").lower() == "true"
+
 class AtlanDocsScraper:
-    def __init__(self, base_url, output_dir="scraped_data"):
+    def __init__(self, base_url, output_dir="scraped_data", dedup_distance=NEAR_DUPLICATE_DISTANCE):
         self.base_url = base_url
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         self.visited_urls = set()
         self.scraped_content = []
+        # URL -> lastmod/crawl time from previous runs, used to rank changed pages first
+        self.state_path = self.output_dir / ".crawl_state.json"
+        # Near-duplicate pages (versioned copies, listings) are kept once; url -> canonical url
+        self.dedup_index = SimHashIndex(dedup_distance) if dedup_distance >= 0 else None
+        self.duplicates = {}
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -56,6 +73,13 @@ class AtlanDocsScraper:
             'links': []
         }
         
+        # rel=canonical pointing elsewhere marks this page as a copy
+        canonical_elem = soup.find('link', rel='canonical', href=True)
+        if canonical_elem:
+            canonical = urljoin(url, canonical_elem['href'])
+            if canonical.rstrip('/') != url.rstrip('/') and self.is_valid_url(canonical):
+                content['canonical'] = canonical
+        
         # Extract title
         title_elem = soup.find('title') or soup.find('h1')
         if title_elem:
@@ -129,6 +153,11 @@ class AtlanDocsScraper:
             content = self.extract_content(soup, url)
             
             self.visited_urls.add(url)
+            original = content.get('canonical') or self.find_duplicate(content)
+            if original:
+                # Still returned so its links are followed, but not stored
+                self.duplicates[url] = original
+                return content
             self.scraped_content.append(content)
             
             return content
@@ -137,6 +166,21 @@ class AtlanDocsScraper:
             print(f"Error scraping {url}: {str(e)}")
             return None
     
+    def find_duplicate(self, content):
+        """URL of an already scraped page with near-identical text, if any"""
+        if self.dedup_index is None:
+            return None
+        fingerprint = simhash(content['content'])
+        if fingerprint is None:
+            return None
+        match = self.dedup_index.find(fingerprint)
+        if match is None:
+            self.dedup_index.add(len(self.scraped_content), fingerprint)
+            return None
+        original = self.scraped_content[match]
+        original.setdefault('duplicates', []).append(content['url'])
+        return original['url']
+    
     def find_all_links(self, soup, base_url):
         """Find all internal links on the page"""
         links = []
@@ -147,12 +191,74 @@ class AtlanDocsScraper:
                 links.append(full_url)
         return links
     
-    def scrape_site(self, max_pages=50, delay=1):
-        """Scrape the entire site starting from base URL"""
-        urls_to_visit = [self.base_url]
+    def discover_sitemaps(self):
+        """Sitemap URLs from robots.txt, falling back to /sitemap.xml"""
+        sitemaps = []
+        try:
+            response = self.session.get(urljoin(self.base_url, '/robots.txt'), timeout=10)
+            if response.ok:
+                for line in response.text.splitlines():
+                    if line.lower().startswith('sitemap:'):
+                        sitemaps.append(line.split(':', 1)[1].strip())
+        except Exception as e:
+            print(f"Error reading robots.txt: {str(e)}")
+        return sitemaps or [urljoin(self.base_url, '/sitemap.xml')]
+    
+    def fetch_sitemap_urls(self, max_sitemaps=50):
+        """Pages listed in the site's sitemaps (following sitemap indexes), with lastmod"""
+        pending, fetched, pages = self.discover_sitemaps(), set(), []
+        while pending and len(fetched) < max_sitemaps:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+            try:
+                response = self.session.get(sitemap_url, timeout=10)
+                response.raise_for_status()
+                body = response.content
+                if sitemap_url.endswith('.gz'):
+                    body = gzip.decompress(body)
+                found, children = parse_sitemap(body)
+            except Exception as e:
+                print(f"Error reading sitemap {sitemap_url}: {str(e)}")
+                continue
+            pending.extend(children)
+            pages.extend(page for page in found if self.is_valid_url(page['url']))
+        print(f"Found {len(pages)} pages in {len(fetched)} sitemap(s)")
+        return pages
+    
+    def load_crawl_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_crawl_state(self, state):
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+    
+    def scrape_site(self, max_pages=50, delay=1, use_sitemap=True, previous_file=None):
+        """Scrape the site, spending the page budget on the highest-priority URLs first.
         
-        while urls_to_visit and len(self.visited_urls) < max_pages:
-            current_url = urls_to_visit.pop(0)
+        URLs come from the sitemap and from links on fetched pages. They are ranked
+        by path depth, sitemap lastmod and whether they changed since the last crawl.
+        Pages from ``previous_file`` (an earlier crawl's output) that were not
+        refetched this time are carried over, so a small budget refreshes the
+        corpus instead of shrinking it.
+        """
+        state = self.load_crawl_state()
+        frontier = CrawlFrontier(state)
+        if use_sitemap:
+            for page in self.fetch_sitemap_urls():
+                frontier.push(page['url'], page['lastmod'], in_sitemap=True)
+        # Link discovery starts at the homepage (the whole crawl when there is no sitemap)
+        frontier.push(self.base_url)
+        
+        while frontier and len(self.visited_urls) < max_pages:
+            current_url = frontier.pop()
             
             if current_url in self.visited_urls:
                 continue
@@ -161,38 +267,61 @@ class AtlanDocsScraper:
             
             if content:
                 # Add new links to visit
-                new_links = [link['url'] for link in content['links']]
-                for link in new_links:
-                    if link not in self.visited_urls and link not in urls_to_visit:
-                        urls_to_visit.append(link)
+                if content.get('canonical'):
+                    frontier.push(content['canonical'])
+                for link in content['links']:
+                    frontier.push(link['url'])
             
             # Be respectful - add delay between requests
             time.sleep(delay)
         
+        if self.duplicates:
+            print(f"Skipped {len(self.duplicates)} near-duplicate pages")
+        
+        crawled_at = datetime.now(timezone.utc).isoformat()
+        for url in self.visited_urls:
+            state[url] = {'lastmod': frontier.lastmod.get(url), 'crawled_at': crawled_at}
+        self.save_crawl_state(state)
+        
+        if previous_file and Path(previous_file).exists():
+            carried = 0
+            for record in iter_records(previous_file):
+                # With a sitemap, pages no longer listed or linked are treated as removed
+                still_listed = record['url'] in frontier.seen or not frontier.sitemap_urls
+                if record['url'] not in self.visited_urls and still_listed:
+                    self.scraped_content.append(record)
+                    carried += 1
+            print(f"Fetched {len(self.visited_urls)} pages, kept {carried} unchanged pages from {previous_file}")
+        
         return self.scraped_content
     
-    def save_content(self, filename=None):
-        """Save scraped content to files"""
+    def save_content(self, filename=None, fmt=SCRAPE_FORMAT, text_dump=SCRAPE_TEXT_DUMP):
+        """Save scraped content as one JSON record per line (optionally gzipped)"""
         if not filename:
             domain = urlparse(self.base_url).netloc.replace('.', '_')
             filename = f"{domain}_scraped_content.json"
+        # The filename names the crawl; fmt decides the extension
+        stem = filename.split('.')[0]
+        output_file = self.output_dir / f"{stem}.{fmt}"
         
-        output_file = self.output_dir / filename
-        
-        # Save as JSON
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(self.scraped_content, f, indent=2, ensure_ascii=False)
+        if fmt == 'json':
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(self.scraped_content, f, indent=2, ensure_ascii=False)
+        else:
+            write_records(output_file, self.scraped_content)
         
-        # Save as text file for easy reading
-        text_file = self.output_dir / f"{filename.replace('.json', '.txt')}"
-        with open(text_file, 'w', encoding='utf-8') as f:
-            for content in self.scraped_content:
-                f.write(f"URL: {content['url']}\n")
-                f.write(f"Title: {content['title']}\n")
-                f.write(f"Content: {content['content']}\n")
-                f.write("-" * 80 + "\n\n")
+        if text_dump:
+            # Save as text file for easy reading
+            text_file = self.output_dir / f"{stem}.txt"
+            with open(text_file, 'w', encoding='utf-8') as f:
+                for content in self.scraped_content:
+                    f.write(f"URL: {content['url']}\n")
+                    f.write(f"Title: {content['title']}\n")
+                    f.write(f"Content: {content['content']}\n")
+                    f.write("-" * 80 + "\n\n")
+            print(f"Text dump saved to {text_file}")
         
-        print(f"Content saved to {output_file} and {text_file}")
+        print(f"Content saved to {output_file}")
         return output_file
 
 def scrape_atlan_docs():
@@ -201,13 +330,17 @@ def scrape_atlan_docs():
     # Scrape Product docs
     print("Scraping Atlan Product Documentation...")
     product_scraper = AtlanDocsScraper("https://docs.atlan.com/", "scraped_data/product_docs")
-    product_content = product_scraper.scrape_site(max_pages=30, delay=1)
+    product_content = product_scraper.scrape_site(
+        max_pages=30, delay=1, previous_file=find_scraped_file(product_scraper.output_dir, "atlan_product_docs")
+    )
     product_file = product_scraper.save_content("atlan_product_docs.json")
     
     # Scrape API/SDK docs
     print("Scraping Atlan API/SDK Documentation...")
     api_scraper = AtlanDocsScraper("https://developer.atlan.com/", "scraped_data/api_docs")
-    api_content = api_scraper.scrape_site(max_pages=30, delay=1)
+    api_content = api_scraper.scrape_site(
+        max_pages=30, delay=1, previous_file=find_scraped_file(api_scraper.output_dir, "atlan_api_docs")
+    )
     api_file = api_scraper.save_content("atlan_api_docs.json")
     
     print(f"Scraping completed!")
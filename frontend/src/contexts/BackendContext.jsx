@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, useCallback } from 'react';
+import React, { createContext, useContext, useState, useCallback, useRef } from 'react';
 import { apiService } from '../services/api';
 import { useTickets } from './TicketContext';
 
@@ -24,6 +24,10 @@ export const BackendProvider = ({ children }) => {
   ]);
   const [isProcessing, setIsProcessing] = useState(false);
   const [lastResponse, setLastResponse] = useState(null);
+  // One conversation per page load; the backend keeps its state under this ID
+  const sessionId = useRef(
+    typeof crypto !== 'undefined' && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`
+  );
   const { createTicket } = useTickets();
 
   const addLog = useCallback((message, level = 'INFO', type = 'api') => {
@@ -51,7 +55,7 @@ export const BackendProvider = ({ children }) => {
 
       // Add RAG processing log
       addLog('Generating RAG response...', 'INFO', 'system');
-      const response = await apiService.getRAGResponse(query);
+      const response = await apiService.getRAGResponse(query, sessionId.current);
       addLog(`RAG response generated successfully`, 'INFO', 'system');
 
       // Log the response details
@@ -55,10 +55,10 @@ export const apiService = {
     }
   },
 
-  // Get RAG response
-  async getRAGResponse(text) {
+  // Get RAG response (sessionId lets follow-up questions reuse the conversation's state)
+  async getRAGResponse(text, sessionId) {
     try {
-      const response = await api.post('/rag', { text });
+      const response = await api.post('/rag', sessionId ? { text, session_id: sessionId } : { text });
       return response.data;
     } catch (error) {
       throw new Error(`RAG response failed: ${error.message}`);